@@ -3,11 +3,26 @@ import sublime
 # Import the plugin logger to initialize on plugin load
 from RTags.rtags_modules import main_logger
 
+# Import the monitor of rdm's indexing, to check on plugin load
+from RTags.rtags_modules.rc_call import RCCall
+from RTags.rtags_modules.rdm_readiness import RdmReadiness
+
 # Import all RTags functionality commands
 from RTags.rtags_commands.follow_location import FollowLocationCommand
-from RTags.rtags_commands.find_references import FindReferencesCommand, PublishResultsToPanelCommand
+from RTags.rtags_commands.find_references import FindReferencesCommand, PublishResultsToPanelCommand, ShowMoreReferencesCommand, OpenReferenceCommand
 from RTags.rtags_commands.find_references_virtual_methods import FindReferencesForVirtualMethodOverridesCommand
 from RTags.rtags_commands.load_compile_commands import LoadCompileCommandsCommand
+from RTags.rtags_commands.show_performance_stats import ShowPerformanceStatsCommand
+from RTags.rtags_commands.go_to_symbol import GoToSymbolInProjectCommand
+from RTags.rtags_commands.call_hierarchy import CallHierarchyCommand, ExpandCallHierarchyCommand, RenderCallHierarchyCommand
+from RTags.rtags_commands.rename_symbol import RenameSymbolCommand, ApplyRenameEditsCommand
+
+# Import all RTags event listeners
+from RTags.rtags_listeners.result_cache_invalidation import ResultCacheInvalidationListener
+from RTags.rtags_listeners.definition_prefetch import DefinitionPrefetchListener
+from RTags.rtags_listeners.rdm_sync import RdmSyncListener
+from RTags.rtags_listeners.symbol_hover import SymbolHoverListener
+from RTags.rtags_listeners.references_preview import ReferencesPreviewListener
 
 
 def plugin_loaded():
@@ -17,3 +32,12 @@ def plugin_loaded():
     # Re-initialize the logger on settings change
     sublime.load_settings("RTags.sublime-settings").add_on_change(
         "reinitialize-logger", main_logger.ReinitializeMainLogger)
+
+    # rdm instances might still be indexing since before the plugin was loaded
+    for window in sublime.windows():
+        RdmReadiness.check(RCCall.socket_file_for(window=window))
+
+
+def plugin_unloaded():
+    # Write pending log records, and stop the logging thread
+    main_logger.ShutdownMainLogger()
@@ -5,9 +5,17 @@ find_references: presents output panel of all references to symbol under cursor
 find_references_virtual_methods:
     presents output panel of all overrides of virtual method under cursor
 load_compile_commands: Finds and loads the compile_commands.json file into rdm
+show_performance_stats: presents latency statistics of rc calls
+go_to_symbol: navigates to a symbol of the project chosen by its name
+call_hierarchy: presents output panel of the callers of function under cursor
+rename_symbol: renames symbol under cursor along with all of its references
 """
 __all__ = [
     "follow_location",
     "find_references",
-    "find_references_virtual_methods"
-    "load_compile_commands"]
+    "find_references_virtual_methods",
+    "load_compile_commands",
+    "show_performance_stats",
+    "go_to_symbol",
+    "call_hierarchy",
+    "rename_symbol"]
@@ -0,0 +1,410 @@
+import sublime
+import sublime_plugin
+
+import collections  # To group references, and queue functions to resolve
+import functools    # To bind resolved functions to rc call callbacks
+
+from RTags.rtags_commands.find_references import iter_references
+from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.rc_call import RCCall
+from RTags.rtags_modules.request_scheduler import RequestScheduler
+from RTags.rtags_modules.progress_indicator import ProgressIndicator
+from RTags.rtags_modules.cursor_manipulations import CursorLocationHelper
+
+
+class CallHierarchyCommand(sublime_plugin.TextCommand):
+    """ Presents the callers of the symbol under cursor, and the callers of
+    those, as a tree in a results panel.
+
+    The tree is expanded level by level, up to "call_hierarchy_depth"
+    levels, and any other node is expanded on demand (see
+    `ExpandCallHierarchyCommand`).
+    """
+
+    """ Class Constants """
+    RESULTS_PANEL_NAME = "RTags - Call Hierarchy"
+
+    # Default amount of levels expanded at once
+    _DEFAULT_DEPTH = 2
+
+    def run(self, edit):
+        logger.info("The functional command '%s' has been triggered.",
+            self.__class__.__name__)
+
+        # Get current cursor location, and assure it is single
+        location = CursorLocationHelper.extract_single_location(
+            view=self.view, avoid_word_end=True)
+        if not location:
+            self.view.window().status_message(
+                "RTags: Cannot present call hierarchy for multiple cursors.")
+            return
+
+        name = self.view.substr(self.view.word(self.view.sel()[0].a))
+        results_view = self._create_results_panel()
+        hierarchy = _CallHierarchy(
+            self.view, results_view, _CallHierarchyNode(name, location))
+        _hierarchies_by_window[self.view.window().id()] = hierarchy
+
+        hierarchy.render()
+        self.view.window().run_command(
+            "show_panel", {"panel": "output." + self.RESULTS_PANEL_NAME})
+        hierarchy.expand([hierarchy.root], self._get_depth())
+
+    def _create_results_panel(self):
+        """ Create an empty call hierarchy panel, and return its view.
+        """
+        results_view = self.view.window().create_output_panel(
+            self.RESULTS_PANEL_NAME)
+        # Every node ends with the location of its function
+        results_view.settings().set(
+            "result_file_regex", '\t(.+):([0-9]+):([0-9]+)$')
+        results_view.settings().set("result_base_dir", '')
+        results_view.settings().set("word_wrap", False)
+        results_view.settings().set("line_numbers", False)
+        results_view.settings().set("gutter", False)
+        results_view.settings().set("scroll_past_end", False)
+        results_view.settings().set("highlight_line", True)
+        results_view.settings().set("rtags_call_hierarchy", True)
+        results_view.set_read_only(True)
+        return results_view
+
+    def _get_depth(self):
+        """ Return the amount of levels expanded at once.
+        """
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return max(1, rtags_settings.get(
+            "call_hierarchy_depth", self._DEFAULT_DEPTH))
+
+
+class ExpandCallHierarchyCommand(sublime_plugin.TextCommand):
+    """ Expand (or collapse) the node under cursor within the call hierarchy
+    panel.
+    """
+
+    def run(self, edit):
+        logger.info("The functional command '%s' has been triggered.",
+            self.__class__.__name__)
+
+        hierarchy = _hierarchies_by_window.get(self.view.window().id())
+        if hierarchy is None or hierarchy.results_view != self.view:
+            return
+
+        row, _ = self.view.rowcol(self.view.sel()[0].b)
+        hierarchy.toggle(row)
+
+    def is_enabled(self):
+        return bool(self.view.settings().get("rtags_call_hierarchy"))
+
+
+class RenderCallHierarchyCommand(sublime_plugin.TextCommand):
+    """ Replace the contents of the call hierarchy panel, keeping the cursor
+    at the same row.
+    """
+
+    def run(self, edit, text):
+        logger.debug("The helper command '%s' has been triggered.",
+            self.__class__.__name__)
+
+        selection = self.view.sel()
+        row = self.view.rowcol(selection[0].b)[0] if len(selection) else 0
+
+        self.view.set_read_only(False)
+        self.view.replace(edit, sublime.Region(0, self.view.size()), text)
+        self.view.set_read_only(True)
+
+        selection.clear()
+        selection.add(self.view.text_point(row, 0))
+
+
+# Call hierarchy presented in the panel, by window id
+_hierarchies_by_window = {}
+
+
+class _CallHierarchyNode(object):
+    """ A function within the call hierarchy, along with its callers.
+    """
+
+    def __init__(self, name, location, parent=None, call_sites=0):
+        """ Params:
+                name       - Name of the function
+                location   - Location of the function ({file}:{row}:{col})
+                parent     - Node of the function it calls, if any
+                call_sites - Amount of calls it makes to its parent
+        """
+        self.name = name
+        self.location = location
+        self.parent = parent
+        self.call_sites = call_sites
+        # Caller nodes, or None in case they were not resolved yet
+        self.children = None
+        self.expanded = False
+        # Whether the function calls one of its ancestors, hence its callers
+        # are already presented
+        self.recursive = any(
+            ancestor.location == location for ancestor in self.ancestors())
+
+    def ancestors(self):
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    @property
+    def depth(self):
+        return sum(1 for _ in self.ancestors())
+
+
+class _CallHierarchy(object):
+    """ State of a call hierarchy presented in a results panel.
+
+    Callers are resolved by a single rc call per function, no matter how many
+    nodes stand for it. Functions are queued, and only as many rc calls are
+    in flight at once as rdm has call slots, so expanding a wide level
+    doesn't start a thread per function. Queued functions of a superseded
+    hierarchy are dropped.
+
+    Note:
+        All methods are expected to be called from Sublime's main thread.
+    """
+
+    """ Class Constants """
+    # Maximal amount of nodes of a level expanded at once
+    _MAX_NODES_PER_LEVEL = 200
+
+    # Every node is presented as a line with a marker of its state
+    _EXPANDED_MARKER = "-"
+    _COLLAPSED_MARKER = "+"
+    _LEAF_MARKER = " "
+    _RECURSIVE_MARKER = "@"
+
+    def __init__(self, source_view, results_view, root):
+        """ Public members """
+        self.results_view = results_view
+        self.root = root
+
+        """ Private members """
+        self._source_view = source_view
+        # Callers of every resolved function by its location, as a list of
+        # (name, location, amount of call sites) tuples
+        self._callers = {}
+        # Callbacks waiting for the callers of a function, by its location
+        self._waiters = {}
+        # Locations of functions waiting for an rc call, in order
+        self._queued_locations = collections.deque()
+        # Amount of rc calls in flight
+        self._running_calls = 0
+        # Nodes by their row in the panel
+        self._rows = []
+        self._progress_indicator = None
+
+    def expand(self, nodes, depth):
+        """ Expand `nodes`, and their callers down to `depth` levels.
+        """
+        for node in nodes:
+            node.expanded = True
+
+        # Every function is resolved once, and the next level is only
+        # expanded once all functions of this level are resolved
+        locations = set(node.location for node in nodes)
+        pending_locations = [len(locations)]
+
+        def _on_resolved(location):
+            pending_locations[0] -= 1
+            if pending_locations[0]:
+                return
+
+            callers = []
+            for node in nodes:
+                if node.location not in self._callers:
+                    # Failed to resolve, so left collapsed for another try
+                    node.expanded = False
+                    continue
+                if node.children is None:
+                    node.children = [
+                        _CallHierarchyNode(
+                            name, caller_location, node, call_sites)
+                        for name, caller_location, call_sites in
+                        self._callers[node.location]]
+                callers.extend(
+                    child for child in node.children if not child.recursive)
+            self.render()
+
+            if depth > 1 and callers:
+                if len(callers) > self._MAX_NODES_PER_LEVEL:
+                    logger.debug(
+                        "Not expanding %s callers at once.", len(callers))
+                    return
+                self.expand(callers, depth - 1)
+
+        for location in locations:
+            self._resolve(location, _on_resolved)
+
+    def toggle(self, row):
+        """ Expand the node at `row` in case it is collapsed, or collapse it
+            otherwise.
+        """
+        if not 0 <= row < len(self._rows):
+            return
+
+        node = self._rows[row]
+        if node.recursive:
+            return
+        if node.expanded:
+            node.expanded = False
+            self.render()
+        else:
+            self.expand([node], 1)
+
+    def render(self):
+        """ Present the expanded part of the hierarchy in the panel.
+        """
+        if self._is_superseded():
+            return
+
+        lines = []
+        self._rows = []
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            lines.append(self._format_node(node))
+            self._rows.append(node)
+            if node.expanded and node.children:
+                nodes.extend(reversed(node.children))
+
+        self.results_view.run_command(
+            "render_call_hierarchy", {"text": "\n".join(lines) + "\n"})
+
+    def _format_node(self, node):
+        """ Return the line presenting `node` in the panel.
+        """
+        if node.recursive:
+            marker = self._RECURSIVE_MARKER
+        elif node.children == []:
+            marker = self._LEAF_MARKER
+        elif node.expanded and node.children is not None:
+            marker = self._EXPANDED_MARKER
+        else:
+            marker = self._COLLAPSED_MARKER
+
+        call_sites = ""
+        if node.call_sites > 1:
+            call_sites = " ({} calls)".format(node.call_sites)
+
+        return "{}{} {}{}\t{}".format(
+            "  " * node.depth, marker, node.name, call_sites, node.location)
+
+    def _resolve(self, location, on_resolved):
+        """ Call `on_resolved` with `location` once the callers of the
+            function at `location` are resolved.
+        """
+        if location in self._callers:
+            on_resolved(location)
+            return
+
+        waiters = self._waiters.get(location)
+        if waiters is not None:
+            # Callers of the function are already being resolved
+            waiters.append(on_resolved)
+            return
+
+        self._waiters[location] = [on_resolved]
+        if self._progress_indicator is None:
+            self._progress_indicator = ProgressIndicator(
+                self._source_view, "Resolving callers")
+            self._progress_indicator.start()
+
+        self._queued_locations.append(location)
+        self._start_queued_calls()
+
+    def _start_queued_calls(self):
+        """ Resolve the callers of queued functions, as far as rdm's call
+            slots allow.
+        """
+        if self._is_superseded():
+            while self._queued_locations:
+                del self._waiters[self._queued_locations.popleft()]
+            self._stop_progress_indicator()
+            return
+
+        while (self._queued_locations and
+               self._running_calls < RequestScheduler.max_concurrent_calls()):
+            location = self._queued_locations.popleft()
+            self._running_calls += 1
+
+            rc_params = (
+                "--no-context --containing-function "
+                "--containing-function-location --references {}".format(
+                    location))
+            rc_thread = RCCall(self._source_view.file_name(), silent=True)
+            rc_thread.execute_rc_async(
+                functools.partial(self._on_callers_received, location),
+                rc_params)
+
+    def _on_callers_received(self, location, rc_thread):
+        """ Memoize the callers of the function at `location` returned by the
+            completed `rc_thread`, and notify the waiting callbacks.
+        """
+        self._running_calls -= 1
+        self._start_queued_calls()
+
+        if rc_thread.rc_returned_successfully:
+            with rc_thread.timings.measure("parse"):
+                self._callers[location] = self._parse_callers(
+                    rc_thread.received_output.splitlines())
+        else:
+            # Not memoized, so expanding the node again queries rdm again
+            logger.debug("Failed to resolve callers of \"%s\".", location)
+
+        waiters = self._waiters.pop(location)
+        self._stop_progress_indicator()
+
+        for on_resolved in waiters:
+            on_resolved(location)
+
+    def _stop_progress_indicator(self):
+        """ Stop presenting progress, in case no callers are awaited.
+        """
+        if not self._waiters and self._progress_indicator is not None:
+            self._progress_indicator.stop()
+            self._progress_indicator = None
+
+    def _is_superseded(self):
+        """ Whether the panel presents another hierarchy by now.
+        """
+        window = self.results_view.window()
+        return (
+            window is None or
+            _hierarchies_by_window.get(window.id()) is not self)
+
+    @staticmethod
+    def _parse_callers(lines):
+        """ Return the calling functions of references output `lines`
+            received from "rc", as (name, location, amount of call sites)
+            tuples.
+
+        Assuming every line is of the format:
+            "{file}:{row}:{col}:\t...\tfunction: {name}\t
+             functionlocation: {file}:{row}:{col}:"
+        References outside of any function (e.g. declarations) are skipped.
+        """
+        names = {}
+        call_sites = collections.OrderedDict()
+        for _, _, _, fields in iter_references(lines):
+            name = None
+            function_location = None
+            for field in fields.split('\t'):
+                key, _, value = field.partition(': ')
+                if key.lower() == "function":
+                    name = value
+                elif key.lower() == "functionlocation":
+                    function_location = value.rstrip(':')
+            if not function_location:
+                continue
+
+            names[function_location] = name or function_location
+            call_sites[function_location] = (
+                call_sites.get(function_location, 0) + 1)
+
+        return [
+            (names[function_location], function_location, count)
+            for function_location, count in call_sites.items()]
@@ -1,14 +1,45 @@
 import sublime
 import sublime_plugin
 
+import bisect  # To tell which file heading a result is under
+import collections  # To hold references hidden from the results panel
+import functools  # To bind the search state to rc call callbacks
 import json  # To get symbol length out of symbol information
+import re  # To parse results out of the results panel
 
+from RTags.rtags_modules.context_lines import ContextLines
 from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.performance_stats import PhaseTimings
+from RTags.rtags_modules.persistent_cache import PersistentCache
 from RTags.rtags_modules.rc_call import RCCall
+from RTags.rtags_modules.request_scheduler import RequestScheduler
+from RTags.rtags_modules.result_cache import (
+    SYMBOL_INFO_PARAMS_FORMAT, symbol_info_cache)
 from RTags.rtags_modules.cursor_manipulations import CursorLocationHelper
 
 
 class FindReferencesCommand(sublime_plugin.TextCommand):
+    """ Presents all references of the symbol under cursor in a results panel.
+
+    References are streamed from rc, and appended to the panel in batches as
+    they arrive. Only a limited amount of references is presented at first,
+    and the rest are presented on demand by `ShowMoreReferencesCommand`.
+
+    In case the "references_local_context" setting is enabled, references
+    are queried without their lines of context, which are read locally
+    instead (see `ContextLines`) on Sublime's async thread.
+
+    While rdm is indexing, references found in former sessions are presented
+    at once, as long as they are still valid (see `PersistentCache`), and
+    are replaced by the ones rdm finds once it is done.
+    """
+
+    """ Class Constants """
+    RESULTS_PANEL_NAME = "RTags - References"
+
+    # Default amount of references presented at once
+    _DEFAULT_RESULTS_LIMIT = 5000
+
     def __init__(self, *args):
         super().__init__(*args)
         # Flags that will be given to rc call, as a format
@@ -17,8 +48,8 @@ class FindReferencesCommand(sublime_plugin.TextCommand):
         self._highlight_results = True
 
     def run(self, edit):
-        logger.info("The functional command '{}' has been triggered.".format(
-            self.__class__.__name__))
+        logger.info("The functional command '%s' has been triggered.",
+            self.__class__.__name__)
 
         # Get current cursor location, and assure it is single
         location = CursorLocationHelper.extract_single_location(
@@ -28,204 +59,825 @@ class FindReferencesCommand(sublime_plugin.TextCommand):
                 "RTags: Cannot find references for multiple cursors.")
             return
 
-        # Execute rc command
+        PersistentCache.get_async(
+            self._rc_params_format, location, self.view,
+            functools.partial(self._on_persisted_references, location))
+
+    def _on_persisted_references(self, location, persisted_references):
+        """ Present `persisted_references` in case references of the symbol
+            at `location` were found in a former session, and find them.
+        """
+        if not self.view.is_valid():
+            return
+
+        persisted_search = None
+        if persisted_references is not None:
+            logger.debug("Presenting references from persistent cache.")
+            persisted_references = json.loads(persisted_references)
+            results_view, formatter = self._start_search(
+                persisted_references["symbol_length"])
+            timings = PhaseTimings()
+            self._on_references_received(
+                results_view, formatter, timings,
+                persisted_references["lines"])
+            self._present_summary(formatter, results_view, timings)
+            persisted_search = (results_view, formatter)
+
+        # rdm is indexing, so references are found once it is done, and
+        # replace the persisted ones
+        self._resolve_symbol(location, persisted_search)
+
+    def _resolve_symbol(self, location, persisted_search=None):
+        """ Find references of the symbol at `location`, once its length is
+            resolved.
+
+        See `_find_references()` for `persisted_search`.
+        """
+        if not self._highlight_results:
+            self._find_references(
+                location, symbol_length=0, persisted_search=persisted_search)
+            return
+
+        # All references share the same symbol, so its length is resolved
+        # once (instead of once per reference), before references are streamed
+        cache_key = (location, self.view.change_count())
+        cached_symbol_info = symbol_info_cache.get(cache_key)
+        if cached_symbol_info is not None:
+            self._find_references(
+                location,
+                self._get_symbol_length(location, cached_symbol_info),
+                persisted_search)
+            return
+
+        def _on_symbol_info_received(rc_thread):
+            symbol_info = None
+            if rc_thread.rc_returned_successfully:
+                symbol_info = rc_thread.received_output
+                symbol_info_cache.put(
+                    cache_key, symbol_info,
+                    related_files=(self.view.file_name(),))
+            else:
+                logger.debug("Failed to get referenced symbol information.")
+
+            with rc_thread.timings.measure("parse"):
+                symbol_length = self._get_symbol_length(location, symbol_info)
+            self._find_references(location, symbol_length, persisted_search)
+
+        rc_params = SYMBOL_INFO_PARAMS_FORMAT.format(location=location)
+        rc_thread = RCCall(self.view.file_name())
+        RequestScheduler.execute(
+            rc_thread, self.__class__.__name__, self.view,
+            _on_symbol_info_received, rc_params,
+            progress_view=self.view,
+            progress_message="Resolving symbol")
+
+    def _find_references(self, location, symbol_length,
+                         persisted_search=None):
+        """ Stream references of the symbol at `location` to the results panel.
+
+        In case references were presented from persistent cache, their
+        (results view, formatter) `persisted_search` is kept presented until
+        the first references are found, which replace them in place.
+        """
+        if persisted_search is None:
+            results_view, formatter = self._start_search(symbol_length)
+        else:
+            results_view, formatter = persisted_search
+
         rc_params = self._rc_params_format.format(location=location)
         rc_thread = RCCall(self.view.file_name())
-        rc_thread.execute_rc(rc_params)
-        rc_thread.join()
 
-        if rc_thread.rc_returned_successfully:
-            # Parse rc command output
-            find_results, symbol_occurences, num_of_results, num_of_files = (
-                self._parse_output(rc_thread.received_output))
+        # Results with local context are presented after rc_thread completes
+        # (and its timings are recorded), so they are timed on their own
+        is_context_local = self._is_context_local()
+        timings = PhaseTimings() if is_context_local else rc_thread.timings
+
+        # A search of another view may supersede this one within the results
+        # panel, after which results of this one are dropped
+        on_done = functools.partial(
+            self._on_references_done, formatter, results_view, timings)
+        on_output_lines = functools.partial(
+            self._on_references_received, results_view, formatter, timings)
+        if persisted_search is not None:
+            on_done, on_output_lines = self._replacing_persisted(
+                formatter, results_view, symbol_length, on_done,
+                on_output_lines)
+
+        window = self.view.window()
+        on_done, on_output_lines = self._with_persistence(
+            location, symbol_length,
+            _if_search_current(window, formatter, on_done),
+            _if_search_current(window, formatter, on_output_lines))
+
+        if is_context_local:
+            rc_params = "--no-context " + rc_params
+            on_done, on_output_lines = self._with_local_context(
+                formatter, timings, on_done, on_output_lines)
+
+        # Execute rc command, without blocking the main thread
+        RequestScheduler.execute(
+            rc_thread, self.__class__.__name__, self.view, on_done,
+            rc_params,
+            progress_view=self.view,
+            progress_message="Finding references",
+            on_output_lines=on_output_lines)
+
+    def _start_search(self, symbol_length):
+        """ Create an empty results panel for a new search, and return it
+            along with the formatter of the search.
+        """
+        results_view = self._create_results_panel()
+        formatter = _ReferencesFormatter(
+            symbol_length, self._get_results_limit(), self.view.window())
+
+        # Hidden references of this search may be presented later on
+        _searches_by_window[self.view.window().id()] = (
+            formatter, results_view)
+        return results_view, formatter
+
+    @staticmethod
+    def _replacing_persisted(formatter, results_view, symbol_length, on_done,
+                             on_output_lines):
+        """ Wrap `on_done` and `on_output_lines` callbacks of a references
+            search, so the references presented from persistent cache by
+            `formatter` in `results_view` are replaced by the first ones
+            found (or by none, once the search succeeds).
+
+        The results panel is left as the user left it meanwhile, neither
+        presented nor focused again.
+        """
+        is_replaced = False
+
+        def _replace():
+            nonlocal is_replaced
+            if not is_replaced:
+                is_replaced = True
+                # Hidden references of the persisted search may have been
+                # presented meanwhile, so the formatter is only restarted now
+                formatter.restart(symbol_length)
+
+        def _on_output_lines(lines):
+            _replace()
+            on_output_lines(lines)
+
+        def _on_done(rc_thread):
+            if rc_thread.rc_returned_successfully:
+                _replace()
+                if not formatter.number_of_shown_results:
+                    results_view.run_command("publish_results_to_panel", {
+                        "results_panel_name":
+                            FindReferencesCommand.RESULTS_PANEL_NAME,
+                        "results": "",
+                        "symbol_occurences": [],
+                        "replace": True})
+            on_done(rc_thread)
+
+        return _on_done, _on_output_lines
+
+    def _with_persistence(self, location, symbol_length, on_done,
+                          on_output_lines):
+        """ Wrap `on_done` and `on_output_lines` callbacks of a references
+            search of the symbol at `location`, so all output lines are
+            cached persistently once the search succeeds.
+
+        Searches of more references than presented at once are not cached.
+        """
+        if not PersistentCache.is_applicable(self.view):
+            # Output lines are not kept for nothing
+            return on_done, on_output_lines
+
+        lines = []
+        max_lines = self._get_results_limit()
+        view = self.view
+
+        def _on_output_lines(output_lines):
+            nonlocal lines
+            if lines is not None:
+                lines.extend(output_lines)
+                if len(lines) > max_lines:
+                    lines = None
+            on_output_lines(output_lines)
+
+        def _put():
+            related_files = set(
+                target_filename
+                for target_filename, _, _, _ in iter_references(lines))
+            PersistentCache.put_async(
+                self._rc_params_format, location, view,
+                json.dumps({"symbol_length": symbol_length, "lines": lines}),
+                related_files)
+
+        def _on_done(rc_thread):
+            on_done(rc_thread)
+            if rc_thread.rc_returned_successfully and lines is not None:
+                sublime.set_timeout_async(_put, 0)
+
+        return _on_done, _on_output_lines
+
+    def _with_local_context(self, formatter, timings, on_done,
+                            on_output_lines):
+        """ Wrap `on_done` and `on_output_lines` callbacks of a references
+            search without context, so the context of every reference is
+            filled locally before the output lines are passed on.
+
+        Context is filled on Sublime's async thread, and the wrapped
+        callbacks are passed on to the main thread in the order they were
+        called. Results of a search superseded meanwhile (by `formatter`'s
+        search) are dropped.
+
+        Filling context is accounted as parsing to `timings`, which are
+        recorded (as timings of the rc call) once the search completes.
+        """
+        window = self.view.window()
+        context_lines = ContextLines(window)
+
+        def _on_output_lines(lines):
+            def _fill():
+                if not _is_current(window, formatter):
+                    return
+                fill_timings = PhaseTimings()
+                with fill_timings.measure("parse"):
+                    filled_lines = list(_fill_context(lines, context_lines))
+                sublime.set_timeout(
+                    functools.partial(_publish, filled_lines, fill_timings),
+                    0)
+
+            def _publish(filled_lines, fill_timings):
+                if _is_current(window, formatter):
+                    # Timings are only accumulated on the main thread
+                    timings.merge(fill_timings)
+                    on_output_lines(filled_lines)
+
+            sublime.set_timeout_async(_fill, 0)
+
+        def _on_done(rc_thread):
+            def _close():
+                context_lines.close()
+                sublime.set_timeout(functools.partial(_notify, rc_thread), 0)
+
+            def _notify(rc_thread):
+                if _is_current(window, formatter):
+                    try:
+                        on_done(rc_thread)
+                    finally:
+                        timings.commit(rc_thread.command_type)
+
+            sublime.set_timeout_async(_close, 0)
+
+        return _on_done, _on_output_lines
+
+    @staticmethod
+    def _on_references_received(results_view, formatter, timings, lines):
+        """ Append a batch of references output `lines` to `results_view`,
+            accounting the time spent to `timings`.
+        """
+        # Results of a former search (if any) are replaced by the first ones
+        replace = not formatter.number_of_shown_results
+        regions_key = "symbol_{}".format(formatter.number_of_shown_results)
+        with timings.measure("parse"):
+            find_results, symbol_occurences = formatter.format(
+                iter_references(lines))
+
+        if not find_results:
+            return
 
-            # Publish results to the user
-            self._create_results_panel(find_results, symbol_occurences)
-            self.view.window().status_message(
-                "RTags: Found {} references across {} files.".format(
-                    num_of_results, num_of_files))
-        else:
+        with timings.measure("render"):
+            results_view.run_command("publish_results_to_panel", {
+                "results_panel_name": FindReferencesCommand.RESULTS_PANEL_NAME,
+                "results": find_results,
+                "symbol_occurences": symbol_occurences,
+                "regions_key": regions_key,
+                "replace": replace})
+
+    def _on_references_done(self, formatter, results_view, timings,
+                            rc_thread):
+        """ Notify the user about the results of the completed `rc_thread`,
+            accounting the time spent to `timings`.
+        """
+        if not rc_thread.rc_returned_successfully:
             self.view.window().status_message(
                 "RTags: Failed to find references of symbol under cursor.")
+            return
 
-    def _parse_output(self, output):
-        """ Parse `output` received from "rc" to a useful form.
+        self._present_summary(formatter, results_view, timings)
 
-        Returns:
-         - String containing the results in a format matching the appropriate
-           syntax definition (See `_create_results_panel()`)
-         - Occurences list of the referenced symbol (row, col_start, col_end)
-         - Statistics about the results (number of references, number of files)
+    def _present_summary(self, formatter, results_view, timings):
+        """ Notify the user about the references presented by `formatter`,
+            accounting the time spent to `timings`.
+        """
+        status_message = "RTags: Found {} references across {} files.".format(
+            formatter.number_of_results, formatter.number_of_files)
+
+        if formatter.number_of_hidden_results:
+            # Let the user know how to present the hidden references
+            with timings.measure("render"):
+                results_view.run_command("publish_results_to_panel", {
+                    "results_panel_name": self.RESULTS_PANEL_NAME,
+                    "results": "",
+                    "symbol_occurences": [],
+                    "trailer": formatter.hidden_results_trailer()})
+            status_message += " Showing the first {}.".format(
+                formatter.number_of_shown_results)
+
+        self.view.window().status_message(status_message)
+
+    @staticmethod
+    def _get_symbol_length(symbol_location, symbol_info_output):
+        """ Figure out the length of the symbol at `symbol_location`, out of
+            its JSON symbol information received from "rc".
+
+        Returns 0 in case the length could not be determined, meaning that
+        the symbol should not be highlighted.
+        """
+        if not symbol_info_output:
+            logger.debug("No symbol information, skipping highlight.")
+            return 0
+
+        try:
+            symbol_info = json.loads(symbol_info_output)
+        except ValueError:
+            logger.debug(
+                "Symbol information is not a valid JSON, skipping highlight.")
+            return 0
+
+        if "symbolLength" in symbol_info:
+            return symbol_info["symbolLength"]
+
+        if symbol_info.get("endLine") != symbol_info.get("startLine"):
+            logger.debug(
+                "Symbol at \"%s\" is spread over multiple lines, "
+                "skipping highlight.", symbol_location)
+            return 0
+
+        return symbol_info["endColumn"] - symbol_info["startColumn"]
+
+    def _create_results_panel(self):
+        """ Create an empty Find Results panel, and return its view.
+        """
+        logger.debug("Preparing results panel.")
 
-        Assuming output is multiple lines of the format:
-            "{target_filename}:{row}:{col}:{line_content}"
+        syntax = "Packages/RTags/Find References Results.hidden-tmLanguage"
+        file_regex = _RESULT_FILE_REGEX
+        line_regex = _RESULT_LINE_REGEX
+        working_dir = ''
+
+        results_view = self.view.window().create_output_panel(
+            self.RESULTS_PANEL_NAME)
+        results_view.settings().set("result_file_regex", file_regex)
+        results_view.settings().set("result_line_regex", line_regex)
+        results_view.settings().set("result_base_dir", working_dir)
+        results_view.settings().set("word_wrap", False)
+        results_view.settings().set("line_numbers", False)
+        results_view.settings().set("gutter", True)
+        results_view.settings().set("scroll_past_end", False)
+        results_view.settings().set("rulers", [])
+        results_view.settings().set("translate_tabs_to_spaces", False)
+        results_view.settings().set("highlight_line", True)
+        results_view.settings().set("fold_buttons", True)
+        results_view.settings().set("fade_fold_buttons", False)
+        results_view.settings().set("rtags_references", True)
+        results_view.assign_syntax(syntax)
+
+        return results_view
 
-        The output is converted to match Sublime Text's "Find Results" syntax:
-            {target_filename}:
-             {row}: {line_content}
+    @staticmethod
+    def _is_context_local():
+        """ Return whether lines of context are read locally, instead of
+            being received from rdm.
         """
-        def _get_symbol_column_range(symbol_location):
-            """Figure out the start and end columns of the referenced symbol.
-            """
-            rc_params = "--json --symbol-info {}".format(symbol_location)
-            rc_thread = RCCall(self.view.file_name())
-            rc_thread.execute_rc(rc_params)
-            rc_thread.join()
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return rtags_settings.get("references_local_context", False)
 
-            if not rc_thread.rc_returned_successfully:
-                raise RuntimeError(
-                    "Failed to get referenced symbol information")
+    def _get_results_limit(self):
+        """ Return the amount of references presented at once.
+        """
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return max(1, rtags_settings.get(
+            "references_panel_limit", self._DEFAULT_RESULTS_LIMIT))
 
-            output_without_whitesapces = ''.join(
-                rc_thread.received_output.split())
-            output_as_dict = json.loads(output_without_whitesapces)
 
-            if output_as_dict["endLine"] != output_as_dict["startLine"]:
-                logger.debug(
-                    "Symbol at \"{}\" is spread over multiple lines, "
-                    "skipping highlight.".format(symbol_location))
-                return (0, 0)
+class ShowMoreReferencesCommand(sublime_plugin.WindowCommand):
+    """ Present the next batch of references that were hidden from the results
+    panel of the last references search in the window.
+    """
 
-            return output_as_dict["startColumn"], output_as_dict["endColumn"]
+    def run(self):
+        logger.info("The functional command '%s' has been triggered.",
+            self.__class__.__name__)
 
-        logger.debug("Parsing output returned from rc call.")
+        formatter, results_view = _searches_by_window[self.window.id()]
+        regions_key = "symbol_{}".format(formatter.number_of_shown_results)
+        find_results, symbol_occurences = formatter.format_hidden()
 
-        # Will contain the result of the parse
-        find_results = ''
+        results_view.run_command("publish_results_to_panel", {
+            "results_panel_name": FindReferencesCommand.RESULTS_PANEL_NAME,
+            "results": find_results,
+            "symbol_occurences": symbol_occurences,
+            "regions_key": regions_key,
+            "trailer": formatter.hidden_results_trailer()})
 
-        # Will contain statistics about the find results
-        number_of_results = 0
-        number_of_files = 0
+        self.window.status_message(
+            "RTags: Showing {} out of {} references.".format(
+                formatter.number_of_shown_results,
+                formatter.number_of_results))
 
-        # List of (row, col_start, col_end) tuples of the referenced symbol
-        # occurences. note: row and col are zero based
-        symbol_occurences = []
+    def is_enabled(self):
+        search = _searches_by_window.get(self.window.id())
+        return bool(search and search[0].number_of_hidden_results)
 
-        # Every file name should be mentioned once, so duplications are removed
-        previous_target_filename = ''
-        previous_row = 0
-        line_number = 0
-        for line in output.splitlines():
-            # Split output line to target file name, row, col and context
-            delimiter = ':'
+
+class OpenReferenceCommand(sublime_plugin.TextCommand):
+    """ Open the file of the result under cursor within the references results
+    panel, at the row of the result, for editing.
+    """
+
+    def run(self, edit):
+        logger.info("The functional command '%s' has been triggered.",
+            self.__class__.__name__)
+
+        selection = self.view.sel()
+        reference = reference_at(self.view, selection[0].b) if len(
+            selection) else None
+        if reference is None:
+            return
+
+        # A transient view of the file (if previewed) is opened for good
+        window = self.view.window()
+        target_view = window.open_file(
+            "{}:{}:1".format(*reference), sublime.ENCODED_POSITION)
+        window.focus_view(target_view)
+
+    def is_enabled(self):
+        return bool(self.view.settings().get("rtags_references"))
+
+
+# Formatter and results view of the last references search, by window id
+_searches_by_window = {}
+
+# Patterns of file headings and of results within the results panel
+_RESULT_FILE_REGEX = '^([^ \t].*):$'
+_RESULT_LINE_REGEX = '^ +([0-9]+):'
+_RESULT_LINE_PATTERN = re.compile(_RESULT_LINE_REGEX)
+
+# (change count, offsets of file headings, file names) of results panels, by
+# view id
+_headings_by_view = {}
+
+
+def reference_at(results_view, point):
+    """ Return the (file name, row) of the result presented at `point` of
+        `results_view`, or None in case there is no result there.
+    """
+    match = _RESULT_LINE_PATTERN.match(
+        results_view.substr(results_view.line(point)))
+    if not match:
+        return None
+
+    _, offsets, file_names = _get_headings(results_view)
+    index = bisect.bisect_right(offsets, point) - 1
+    if index < 0:
+        return None
+    return file_names[index], int(match.group(1))
+
+
+def reference_files_after(results_view, point, amount):
+    """ Return the file names of up to `amount` files presented after the
+        file `point` of `results_view` is within.
+    """
+    _, offsets, file_names = _get_headings(results_view)
+    index = bisect.bisect_right(offsets, point)
+    return file_names[index:index + amount]
+
+
+def _get_headings(results_view):
+    """ Return the file headings of `results_view`, as found once per
+        modification of it.
+    """
+    headings = _headings_by_view.get(results_view.id())
+    if headings is not None and headings[0] == results_view.change_count():
+        return headings
+
+    if headings is None:
+        # Headings of former results panels are no longer needed
+        _headings_by_view.clear()
+
+    regions = results_view.find_all(_RESULT_FILE_REGEX)
+    headings = (
+        results_view.change_count(),
+        [region.begin() for region in regions],
+        # File headings end with a colon
+        [results_view.substr(region)[:-1] for region in regions])
+    _headings_by_view[results_view.id()] = headings
+    return headings
+
+
+def _is_current(window, formatter):
+    """ Return whether the search of `formatter` is the last references search
+        in `window`.
+    """
+    search = _searches_by_window.get(window.id())
+    return search is not None and search[0] is formatter
+
+
+def _if_search_current(window, formatter, callback):
+    """ Wrap `callback`, so it is only called as long as the search of
+        `formatter` is the last references search in `window`.
+    """
+    def _callback(*args):
+        if _is_current(window, formatter):
+            callback(*args)
+        else:
+            logger.debug("Dropping results of a superseded search.")
+    return _callback
+
+
+def iter_references(lines):
+    """ Generate (target_filename, row, col, context) tuples out of references
+        output lines received from "rc".
+
+    Assuming every line is of the format:
+        "{target_filename}:{row}:{col}:{line_content}"
+    """
+    delimiter = ':'
+    for line in lines:
+        try:
             target_filename, row, col, context = line.split(
                 delimiter, maxsplit=3)
+        except ValueError:
+            target_filename, row, col, context = '', '', '', ''
 
-            # Whether current result belongs to a different file (against prev)
-            if target_filename != previous_target_filename:
-                # Bind future results to current target file name
-                find_results += target_filename + ':\n'
+        if not row.isdigit() or not col.isdigit():
+            logger.debug("Skipping unexpected rc output line: \"%s\"",
+                line)
+            continue
 
-                # Append current result line
-                find_results += ' ' + row + ':' + context + '\n'
+        yield target_filename, row, col, context
 
-                previous_row = row
-                previous_target_filename = target_filename
-                number_of_files += 1
-                line_number += 1
-            elif row != previous_row:
-                # No need to print multiple results for the same line number
-                # Append current result line
-                find_results += ' ' + row + ':' + context + '\n'
-                previous_row = row
-            else:
-                # Cancel line number increase from previous iteration
-                line_number -= 1
 
-            # Calculate the column offset for the referenced symbol occurence
-            # The offset considers: " {row}:<tabstop>"
-            offset = 1 + len(row) + 1
+def _fill_context(lines, context_lines):
+    """ Generate references output `lines` received from "rc" without
+        context, along with their lines of context read from `context_lines`.
 
-            if self._highlight_results:
-                # Used to calculate the end column of the referenced symbol
-                symbol_location = ':'.join((target_filename, row, col))
-                col_start, col_end = _get_symbol_column_range(symbol_location)
-                col_start += offset
-                col_end += offset
+    Assuming every line is of the format:
+        "{target_filename}:{row}:{col}:"
+    """
+    delimiter = ':'
+    for line in lines:
+        try:
+            target_filename, row, _ = line.split(delimiter, maxsplit=2)
+            context = context_lines.get(target_filename, int(row))
+        except ValueError:
+            # Left for `iter_references()` to skip
+            yield line
+        else:
+            # Context is separated from the location by a tab, as rc does
+            yield line + '\t' + context
+
+
+class _ReferencesFormatter(object):
+    """ Incrementally converts references to Sublime Text's "Find Results"
+    syntax:
+        {target_filename}:
+         {row}: {line_content}
+
+    Consecutive batches of references are formatted as a continuation of one
+    another, so the results of every batch can be appended to the results of
+    the previous ones. Once `limit` references were formatted, the following
+    references are kept hidden until `format_hidden()` is called.
+    """
+
+    def __init__(self, symbol_length, limit, window=None):
+        """ Params:
+                symbol_length - Length of the referenced symbol. Occurences are
+                                only calculated if it is nonzero, since every
+                                reference is assumed to span `symbol_length`
+                                columns from its reported column.
+                limit         - Amount of references formatted at once
+                window        - sublime.Window whose project paths the file
+                                names are presented with, so opening a result
+                                opens the same view as the project does (see
+                                `CursorLocationHelper.to_project_path()`)
+        """
+        """ Public members """
+        # Statistics about the find results
+        self.number_of_results = 0
+        self.number_of_files = 0
+        self.number_of_shown_results = 0
+
+        """ Private members """
+        self._symbol_length = symbol_length
+        self._limit_step = limit
+        self._limit = limit
+        self._window = window
+
+        # References not formatted yet, due to the limit
+        self._hidden_references = collections.deque()
 
-                # Add the referenced symbol occurence to the list
-                symbol_occurences.append((line_number, col_start, col_end))
+        # Every file name should be mentioned once, so duplications are removed
+        self._previous_target_filename = ''
+        self._previous_row = ''
+
+        # Offsets (within all formatted results) of the last formatted line,
+        # and of the end of the formatted results
+        self._previous_line_start = 0
+        self._end_offset = 0
+
+        # Last file name counted in the statistics
+        self._previous_counted_filename = ''
+
+    @property
+    def number_of_hidden_results(self):
+        return len(self._hidden_references)
+
+    def restart(self, symbol_length):
+        """ Forget all references formatted so far, and format the following
+            ones as references of a symbol of `symbol_length`.
+        """
+        self.__init__(symbol_length, self._limit_step, self._window)
 
-            number_of_results += 1
-            line_number += 1
+    def format(self, references):
+        """ Format `references` generated by `iter_references()`, up to the
+            limit. References beyond the limit are kept hidden.
 
+        Returns:
+         - String containing the results in a format matching the appropriate
+           syntax definition (See `_create_results_panel()`)
+         - Occurences list of the referenced symbol, as (begin, end) offsets
+           within all results formatted so far
+        """
+        shown_references = []
+        room_left = self._limit - self.number_of_shown_results
+        for reference in references:
+            self.number_of_results += 1
+            if reference[0] != self._previous_counted_filename:
+                self._previous_counted_filename = reference[0]
+                self.number_of_files += 1
+
+            # Hidden references must be presented first, to keep the order
+            if room_left > 0 and not self._hidden_references:
+                shown_references.append(reference)
+                room_left -= 1
+            else:
+                self._hidden_references.append(reference)
+
+        return self._format_shown(shown_references)
+
+    def format_hidden(self):
+        """ Format the next hidden references, up to the limit.
+
+        Returns the same as `format()`.
+        """
+        self._limit += self._limit_step
+        amount = min(self._limit_step, len(self._hidden_references))
+        popleft = self._hidden_references.popleft
+        return self._format_shown([popleft() for _ in range(amount)])
+
+    def hidden_results_trailer(self):
+        """ Return a line noting the amount of hidden references, to be placed
+            after the formatted results.
+        """
+        if not self._hidden_references:
+            return ''
         return (
-            find_results,
-            symbol_occurences,
-            number_of_results,
-            number_of_files)
+            "\n... {} more references are hidden. "
+            "Run \"RTags: Show More References\" to present them.\n".format(
+                len(self._hidden_references)))
 
-    def _create_results_panel(self, find_results, symbol_occurences):
-        """ Create a Find Results panel, fill it with `find_results`, and
-        highlight all `symbol_occurences`.
+    def _format_shown(self, references):
+        """ Format all `references` in a single pass.
         """
-        logger.debug("Preparing results panel.")
+        # Group references by file, and then by row:
+        # [(target_filename, [(row, context, [col, ...]), ...]), ...]
+        files = []
+        for target_filename, row, col, context in references:
+            if not files or files[-1][0] != target_filename:
+                files.append((target_filename, []))
+            rows = files[-1][1]
+            if rows and rows[-1][0] == row:
+                rows[-1][2].append(col)
+            else:
+                rows.append((row, context, [col]))
 
-        syntax = "Packages/RTags/Find References Results.hidden-tmLanguage"
-        file_regex = '^([^ \t].*):$'
-        line_regex = '^ +([0-9]+):'
-        working_dir = ''
-        results_panel_name = "RTags - References"
+        # Will contain the result of the parse
+        find_results = []
 
-        results_view = self.view.window().create_output_panel(
-            results_panel_name)
-        results_view.settings().set("result_file_regex", file_regex)
-        results_view.settings().set("result_line_regex", line_regex)
-        results_view.settings().set("result_base_dir", working_dir)
-        results_view.settings().set("word_wrap", False)
-        results_view.settings().set("line_numbers", False)
-        results_view.settings().set("gutter", True)
-        results_view.settings().set("scroll_past_end", False)
-        results_view.settings().set("rulers", [])
-        results_view.settings().set("translate_tabs_to_spaces", False)
-        results_view.settings().set("highlight_line", True)
-        results_view.settings().set("fold_buttons", True)
-        results_view.settings().set("fade_fold_buttons", False)
-        results_view.assign_syntax(syntax)
+        # List of (begin, end) offsets of the referenced symbol occurences
+        symbol_occurences = []
 
-        results_view.run_command("publish_results_to_panel", {
-            "results_panel_name": results_panel_name,
-            "results": find_results,
-            "symbol_occurences": symbol_occurences})
+        offset = self._end_offset
+        for target_filename, rows in files:
+            if target_filename != self._previous_target_filename:
+                # Bind future results to current target file name
+                header = CursorLocationHelper.to_project_path(
+                    self._window, target_filename) + ':\n'
+                find_results.append(header)
+                offset += len(header)
+                self._previous_target_filename = target_filename
+                self._previous_row = ''
+
+            for row, context, cols in rows:
+                # No need to print multiple results for the same line number
+                if row != self._previous_row:
+                    result_line = ' ' + row + ':' + context + '\n'
+                    find_results.append(result_line)
+                    self._previous_line_start = offset
+                    self._previous_row = row
+                    offset += len(result_line)
+
+                if self._symbol_length:
+                    # The offset considers: " {row}:<tabstop>"
+                    context_offset = self._previous_line_start + len(row) + 2
+                    for col in cols:
+                        begin = context_offset + int(col)
+                        symbol_occurences.append(
+                            (begin, begin + self._symbol_length))
+
+        self._end_offset = offset
+        self.number_of_shown_results += len(references)
+
+        return ''.join(find_results), symbol_occurences
 
 
 class PublishResultsToPanelCommand(sublime_plugin.TextCommand):
-    """ Fill accepted view with given results, focus the view, and highlight
-    all symbol occurences.
+    """ Append given results to accepted view, and highlight all symbol
+    occurences. The view is presented and focused along with its first
+    results.
+
+    A trailer may be placed after the results. It is removed before the next
+    results are appended.
+
+    Previous results may be replaced instead, in which case the view is
+    neither presented nor focused again.
     """
 
-    def run(self, edit, results_panel_name, results, symbol_occurences):
-        logger.debug("The helper command '{}' has been triggered.".format(
-            self.__class__.__name__))
+    """ Class Constants """
+    _TRAILER_REGION_KEY = "rtags_results_trailer"
+    # View setting holding the keys of the highlighted regions
+    _REGIONS_KEYS_SETTING = "rtags_results_regions_keys"
+
+    def run(self, edit, results_panel_name, results, symbol_occurences,
+            regions_key="symbol", trailer="", replace=False):
+        """ Params:
+                results_panel_name - Name of the output panel of the view
+                results            - Text to append to the view
+                symbol_occurences  - List of (begin, end) offsets to highlight
+                regions_key        - Key of the highlighted regions
+                trailer            - Text to place after the results
+                replace            - Whether previous results are replaced
+        """
+        logger.debug("The helper command '%s' has been triggered.",
+            self.__class__.__name__)
+
+        is_first_results = self.view.size() == 0
 
-        # Fill the view with the results
-        self.view.insert(edit, 0, results)
+        settings = self.view.settings()
+        if replace:
+            self.view.erase(edit, sublime.Region(0, self.view.size()))
+            for previous_regions_key in settings.get(
+                    self._REGIONS_KEYS_SETTING, []):
+                self.view.erase_regions(previous_regions_key)
+            settings.erase(self._REGIONS_KEYS_SETTING)
 
-        # Assure results navigation (if configured) starts from the beggining
-        self.view.sel().clear()
+        # Remove the trailer of previous results
+        for trailer_region in self.view.get_regions(self._TRAILER_REGION_KEY):
+            self.view.erase(edit, trailer_region)
+        self.view.erase_regions(self._TRAILER_REGION_KEY)
+
+        # Append the results to the view
+        self.view.insert(edit, self.view.size(), results)
 
         # In case there are occurences which we would like to highlight
         if symbol_occurences:
-            # Convert symbol occurences to regions
-            regions_to_highlight = [
-                sublime.Region(
-                    self.view.text_point(row, col_start),
-                    self.view.text_point(row, col_end))
-                for row, col_start, col_end in symbol_occurences]
-
-            # Highlight all symbol occurences
+            # Highlight all symbol occurences at once
             flags = (
                 sublime.DRAW_STIPPLED_UNDERLINE |
                 sublime.DRAW_NO_FILL |
                 sublime.DRAW_NO_OUTLINE)
 
             self.view.add_regions(
-                "symbol",
-                regions_to_highlight,
+                regions_key,
+                [sublime.Region(begin, end)
+                 for begin, end in symbol_occurences],
                 scope="storage.type",
                 flags=flags)
+            settings.set(
+                self._REGIONS_KEYS_SETTING,
+                settings.get(self._REGIONS_KEYS_SETTING, []) + [regions_key])
 
-        # Present the results panel to the user
-        sublime.active_window().run_command(
-            "show_panel", {"panel": "output." + results_panel_name})
-        sublime.active_window().focus_view(self.view)
+        if trailer:
+            trailer_start = self.view.size()
+            self.view.insert(edit, trailer_start, trailer)
+            self.view.add_regions(
+                self._TRAILER_REGION_KEY,
+                [sublime.Region(trailer_start, self.view.size())],
+                flags=sublime.HIDDEN)
+
+        if is_first_results:
+            # Assure results navigation (if configured) starts from the
+            # beggining
+            self.view.sel().clear()
+
+            # Present the results panel to the user
+            sublime.active_window().run_command(
+                "show_panel", {"panel": "output." + results_panel_name})
+            sublime.active_window().focus_view(self.view)
@@ -1,53 +1,278 @@
+import sublime
 import sublime_plugin
 
+import functools  # To bind the cache key to rc call callbacks
+
 from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.performance_stats import PhaseTimings
+from RTags.rtags_modules.persistent_cache import PersistentCache
 from RTags.rtags_modules.rc_call import RCCall
+from RTags.rtags_modules.request_scheduler import RequestScheduler
+from RTags.rtags_modules.result_cache import follow_location_cache
 from RTags.rtags_modules.cursor_manipulations import CursorLocationHelper
 
 
 class FollowLocationCommand(sublime_plugin.TextCommand):
+    """ Navigates to the definition/declaration of the symbol under cursor.
+
+    In case of multiple cursors, the locations of all of them are followed
+    concurrently, and their targets are presented together: either in a
+    quick panel, or opened in tabs (by the
+    "follow_location_batch_presentation" setting).
+    """
+
+    """ Class Constants """
+    # Maximal amount of cursors whose locations are followed at once
+    _MAX_BATCH_LOCATIONS = 64
+
     def __init__(self, *args):
         super().__init__(*args)
         # Flags that will be given to rc call, as a format
         self._rc_params_format = "--no-context --follow-location {location}"
 
     def run(self, edit):
-        logger.info("The functional command '{}' has been triggered.".format(
-            self.__class__.__name__))
+        logger.info("The functional command '%s' has been triggered.",
+            self.__class__.__name__)
 
-        # Get current cursor location, and assure it is single
+        if len(self.view.sel()) > 1:
+            self._follow_locations()
+            return
+
+        # Get current cursor location, and assure it is not a selection
         location = CursorLocationHelper.extract_single_location(
             view=self.view, avoid_word_end=True)
         if not location:
             self.view.window().status_message(
-                "RTags: Can't follow location for multiple cursors/selection.")
+                "RTags: Can't follow location of a selection.")
+            return
+
+        # Locations that were already followed are answered from cache
+        cache_key = (location, self.view.change_count())
+        cached_output = follow_location_cache.get(cache_key)
+        if cached_output is not None:
+            logger.debug("Following location from cache.")
+            self._navigate(cached_output)
             return
 
-        # Execute rc command
+        # Locations followed in former sessions are answered while rdm is
+        # indexing
+        PersistentCache.get_async(
+            self.__class__.__name__, location, self.view,
+            functools.partial(self._on_persisted_output, cache_key))
+
+    def _on_persisted_output(self, cache_key, persisted_output):
+        """ Navigate to `persisted_output` in case the location was followed
+            in a former session, and query it.
+        """
+        location, change_count = cache_key
+        if (not self.view.is_valid() or
+                self.view.change_count() != change_count):
+            return
+
+        if persisted_output is not None:
+            logger.debug("Following location from persistent cache.")
+            self._navigate(persisted_output)
+
+        # Execute rc command, without blocking the main thread. In case the
+        # persisted output was navigated to, rdm is indexing, so the query
+        # is answered once it is done.
         rc_params = self._rc_params_format.format(location=location)
         rc_thread = RCCall(self.view.file_name())
-        rc_thread.execute_rc(rc_params)
-        rc_thread.join()
+        RequestScheduler.execute(
+            rc_thread, self.__class__.__name__, self.view,
+            functools.partial(self._on_rc_done, cache_key, persisted_output),
+            rc_params,
+            progress_view=self.view,
+            progress_message="Following location")
 
+    def _on_rc_done(self, cache_key, persisted_output, rc_thread):
+        """ Navigate to the location returned by the completed `rc_thread`
+            (unless `persisted_output` was already navigated to), and cache it
+            under `cache_key` (persistently as well).
+        """
         if rc_thread.rc_returned_successfully:
             if not rc_thread.received_output:
                 # Ignore empty output
                 logger.info("rc returned with an empty output, ignoring...")
                 return
 
-            # Parse rc command output
-            file_name, row, col = self._parse_output(rc_thread.received_output)
-
-            # Navigate to the result
-            CursorLocationHelper.set_cursor_location(
-                self.view, file_name, row, col)
-        else:
+            if persisted_output is None:
+                file_name = self._navigate(
+                    rc_thread.received_output, rc_thread.timings)
+            else:
+                # The user may have moved on since the persisted output was
+                # navigated to, so it is only refreshed
+                with rc_thread.timings.measure("parse"):
+                    file_name, _, _ = self._parse_output(
+                        rc_thread.received_output)
+                if rc_thread.received_output != persisted_output:
+                    self.view.window().status_message(
+                        "RTags: The followed location was outdated, follow "
+                        "it again to get to its current target.")
+            follow_location_cache.put(
+                cache_key,
+                rc_thread.received_output,
+                related_files=(self.view.file_name(), file_name))
+            PersistentCache.put_async(
+                self.__class__.__name__, cache_key[0], self.view,
+                rc_thread.received_output, related_files=(file_name,))
+        elif persisted_output is None:
             self.view.window().status_message(
                 "RTags: Failed to follow location of symbol under cursor.")
             # # Fall back to Sublime's go-to definition.
             # # It will notify the user in case of failure
             # self.view.window().run_command('goto_definition')
 
+    def _follow_locations(self):
+        """ Follow the locations of all cursors concurrently, and present
+            their targets together.
+        """
+        locations = CursorLocationHelper.extract_locations(
+            view=self.view, avoid_word_end=True)
+        if not locations:
+            self.view.window().status_message(
+                "RTags: Can't follow location of a selection.")
+            return
+        if len(locations) > self._MAX_BATCH_LOCATIONS:
+            self.view.window().status_message(
+                "RTags: Can't follow locations of more than {} cursors at "
+                "once.".format(self._MAX_BATCH_LOCATIONS))
+            return
+
+        # Locations that were already followed are answered from cache
+        change_count = self.view.change_count()
+        outputs = {}
+        rc_calls = []
+        for location in locations:
+            cached_output = follow_location_cache.get(
+                (location, change_count))
+            if cached_output is not None:
+                outputs[location] = cached_output
+                continue
+            rc_params = self._rc_params_format.format(location=location)
+            rc_calls.append((
+                location, RCCall(self.view.file_name(), silent=True),
+                rc_params))
+
+        if not rc_calls:
+            logger.debug("Following all locations from cache.")
+            self._present_targets(locations, outputs)
+            return
+
+        # All locations are followed concurrently, as far as rdm allows
+        RequestScheduler.execute_batch(
+            [(rc_thread, rc_params) for _, rc_thread, rc_params in rc_calls],
+            self.__class__.__name__, self.view,
+            functools.partial(
+                self._on_batch_done, locations, outputs, change_count,
+                [location for location, _, _ in rc_calls]),
+            progress_message="Following {} locations".format(
+                len(locations)))
+
+    def _on_batch_done(self, locations, outputs, change_count,
+                       queried_locations, rc_threads):
+        """ Cache the outputs of the completed `rc_threads` (one per location
+            of `queried_locations`), and present the targets of all
+            `locations`.
+        """
+        for location, rc_thread in zip(queried_locations, rc_threads):
+            if not rc_thread.rc_returned_successfully:
+                continue
+            if not rc_thread.received_output:
+                continue
+
+            outputs[location] = rc_thread.received_output
+            with rc_thread.timings.measure("parse"):
+                file_name, _, _ = self._parse_output(
+                    rc_thread.received_output)
+            follow_location_cache.put(
+                (location, change_count),
+                rc_thread.received_output,
+                related_files=(self.view.file_name(), file_name))
+
+        self._present_targets(locations, outputs)
+
+    def _present_targets(self, locations, outputs):
+        """ Present the targets within `outputs` of all `locations` together.
+
+        Params:
+            locations - Followed locations, in the order of the cursors
+            outputs   - Dict of output received from "rc" by location, for
+                        locations that were followed successfully
+        """
+        targets = []
+        labels = []
+        for location in locations:
+            if location not in outputs:
+                continue
+            target = self._parse_output(outputs[location])
+            if target not in targets:
+                targets.append(target)
+                labels.append(self._get_symbol_name(location))
+
+        if not targets:
+            self.view.window().status_message(
+                "RTags: Failed to follow locations of symbols under cursors.")
+            return
+
+        if len(targets) == 1:
+            CursorLocationHelper.set_cursor_location(self.view, *targets[0])
+            return
+
+        if self._get_batch_presentation() == "tabs":
+            for target in targets:
+                CursorLocationHelper.set_cursor_location(self.view, *target)
+            self.view.window().status_message(
+                "RTags: Opened {} locations.".format(len(targets)))
+            return
+
+        def _on_select(index):
+            if index != -1:
+                CursorLocationHelper.set_cursor_location(
+                    self.view, *targets[index])
+
+        self.view.window().show_quick_panel(
+            [[label, "{}:{}:{}".format(
+                CursorLocationHelper.to_display_path(
+                    self.view.window(), file_name),
+                row, col)]
+             for label, (file_name, row, col) in zip(labels, targets)],
+            _on_select)
+
+    def _get_symbol_name(self, location):
+        """ Return the word at `location` within the view.
+        """
+        _, row, col = location.rsplit(':', 2)
+        point = self.view.text_point(int(row) - 1, int(col) - 1)
+        return self.view.substr(self.view.word(point))
+
+    @staticmethod
+    def _get_batch_presentation():
+        """ Return how the targets of multiple cursors are presented.
+        """
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return rtags_settings.get(
+            "follow_location_batch_presentation", "quick_panel")
+
+    def _navigate(self, output, timings=None):
+        """ Navigate to the location within `output` received from "rc", and
+            return its file name.
+
+        The time spent is accounted to `timings`, in case it is given.
+        """
+        timings = timings or PhaseTimings()
+
+        # Parse rc command output
+        with timings.measure("parse"):
+            file_name, row, col = self._parse_output(output)
+
+        # Navigate to the result
+        with timings.measure("render"):
+            CursorLocationHelper.set_cursor_location(
+                self.view, file_name, row, col)
+
+        return file_name
+
     def _parse_output(self, output):
         """ Parse `output` received from "rc" to a useful form.
 
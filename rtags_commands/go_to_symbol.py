@@ -0,0 +1,172 @@
+import sublime
+import sublime_plugin
+
+from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.rc_call import RCCall
+from RTags.rtags_modules.symbol_index import SymbolIndex
+from RTags.rtags_modules.cursor_manipulations import CursorLocationHelper
+
+
+class GoToSymbolInProjectCommand(sublime_plugin.TextCommand):
+    """ Presents all symbols of the project in a quick panel, and navigates to
+    the chosen one.
+
+    Symbol names are kept in a local index (see `SymbolIndex`), which is built
+    by a single rc call, and filtered by the quick panel itself. Only the
+    locations of the chosen symbol are queried.
+    """
+
+    def run(self, edit, rebuild=False):
+        logger.info("The functional command '%s' has been triggered.",
+            self.__class__.__name__)
+
+        # Every rdm instance has an index of its own
+        self._rdm_socket_file = RCCall.socket_file_for(self.view.file_name())
+
+        stale_files = SymbolIndex.take_stale_files(self._rdm_socket_file)
+        if (rebuild or not SymbolIndex.is_built(self._rdm_socket_file) or
+                len(stale_files) > SymbolIndex.MAX_INCREMENTAL_FILES):
+            self._build_index()
+        elif stale_files:
+            self._refresh_index(stale_files)
+        else:
+            self._show_symbols()
+
+    def _build_index(self):
+        """ Build the symbol index out of all symbols known to rdm, and
+            present it.
+        """
+        rc_thread = RCCall(
+            self.view.file_name(), rdm_socket_file=self._rdm_socket_file)
+        rc_thread.execute_rc_async(
+            self._on_index_listed, "--list-symbols",
+            progress_view=self.view,
+            progress_message="Indexing symbols")
+
+    def _on_index_listed(self, rc_thread):
+        if not rc_thread.rc_returned_successfully:
+            self.view.window().status_message(
+                "RTags: Failed to list the symbols of the project.")
+            return
+
+        # Sorting a large index should not block the main thread
+        def _build():
+            SymbolIndex.build(
+                rc_thread.rdm_socket_file, rc_thread.received_output)
+            sublime.set_timeout(self._show_symbols, 0)
+        sublime.set_timeout_async(_build, 0)
+
+    def _refresh_index(self, stale_files):
+        """ Merge the symbols of `stale_files` into the symbol index, and
+            present it.
+        """
+        logger.debug(
+            "Refreshing symbols of %s reindexed files.", len(stale_files))
+
+        rc_params = ' '.join(
+            ["--list-symbols"] +
+            ["--path-filter {}".format(stale_file)
+             for stale_file in sorted(stale_files)])
+        rc_thread = RCCall(
+            self.view.file_name(), rdm_socket_file=self._rdm_socket_file)
+        rc_thread.execute_rc_async(
+            lambda rc_thread: self._on_index_refreshed(stale_files, rc_thread),
+            rc_params,
+            progress_view=self.view,
+            progress_message="Refreshing symbols")
+
+    def _on_index_refreshed(self, stale_files, rc_thread):
+        if not rc_thread.rc_returned_successfully:
+            # Present the index as is, and try refreshing it next time
+            SymbolIndex.invalidate_files(
+                rc_thread.rdm_socket_file, stale_files)
+            self._show_symbols()
+            return
+
+        def _merge():
+            SymbolIndex.merge(
+                rc_thread.rdm_socket_file, rc_thread.received_output)
+            sublime.set_timeout(self._show_symbols, 0)
+        sublime.set_timeout_async(_merge, 0)
+
+    def _show_symbols(self):
+        """ Present the indexed symbols in a quick panel.
+        """
+        names = SymbolIndex.names(self._rdm_socket_file)
+        if not names:
+            self.view.window().status_message(
+                "RTags: No symbols were found in the project.")
+            return
+
+        def _on_select(index):
+            if index != -1:
+                self._find_symbol(names[index])
+
+        self.view.window().show_quick_panel(names, _on_select)
+
+    def _find_symbol(self, name):
+        """ Navigate to the location of the symbol named `name`, letting the
+            user choose in case there are several.
+        """
+        rc_params = "--no-context --find-symbols {}".format(name)
+        rc_thread = RCCall(
+            self.view.file_name(), rdm_socket_file=self._rdm_socket_file)
+        rc_thread.execute_rc_async(
+            lambda rc_thread: self._on_symbol_found(name, rc_thread),
+            rc_params,
+            progress_view=self.view,
+            progress_message="Finding symbol")
+
+    def _on_symbol_found(self, name, rc_thread):
+        if not rc_thread.rc_returned_successfully:
+            self.view.window().status_message(
+                "RTags: Failed to find symbol \"{}\".".format(name))
+            return
+
+        with rc_thread.timings.measure("parse"):
+            locations = self._parse_locations(rc_thread.received_output)
+
+        if not locations:
+            # Symbol was removed since the index was refreshed
+            sublime.set_timeout_async(
+                lambda: SymbolIndex.discard(rc_thread.rdm_socket_file, name),
+                0)
+            self.view.window().status_message(
+                "RTags: Symbol \"{}\" no longer exists.".format(name))
+            return
+
+        if len(locations) == 1:
+            with rc_thread.timings.measure("render"):
+                CursorLocationHelper.set_cursor_location(
+                    self.view, *locations[0])
+            return
+
+        def _on_select(index):
+            if index != -1:
+                CursorLocationHelper.set_cursor_location(
+                    self.view, *locations[index])
+
+        self.view.window().show_quick_panel(
+            [[name, "{}:{}:{}".format(
+                CursorLocationHelper.to_display_path(
+                    self.view.window(), file_name),
+                row, col)]
+             for file_name, row, col in locations],
+            _on_select)
+
+    @staticmethod
+    def _parse_locations(output):
+        """ Return (file_name, row, col) tuples out of `output` received from
+            "rc".
+
+        Assuming every line is of the format "{file_name}:{row}:{col}:".
+        """
+        locations = []
+        for line in output.splitlines():
+            try:
+                file_name, row, col = line.rstrip(':').rsplit(':', 2)
+                locations.append((file_name, int(row), int(col)))
+            except ValueError:
+                logger.debug("Skipping unexpected rc output line: \"%s\"",
+                    line)
+        return locations
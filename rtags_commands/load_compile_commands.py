@@ -3,46 +3,311 @@ import sublime_plugin
 
 from RTags.rtags_modules.main_logger import logger
 from RTags.rtags_modules.rc_call import RCCall
+from RTags.rtags_modules.rdm_readiness import RdmReadiness
+from RTags.rtags_modules.result_cache import ResultCache
+from RTags.rtags_modules.progress_indicator import ProgressIndicator
+from RTags.rtags_modules.symbol_index import SymbolIndex
+from RTags.rtags_modules.compile_commands_finder import CompileCommandsFinder
+from RTags.rtags_modules.compile_commands_fingerprint import (
+    CompileCommandsFingerprint)
 
 import os
 
 
 class LoadCompileCommandsCommand(sublime_plugin.WindowCommand):
-    def run(self):
-        logger.info("The functional command '{}' has been triggered.".format(
-            self.__class__.__name__))
+    """ Load the compilation database of the project into rdm.
 
-        # Find all "compile_commands.json" files located in open folders
-        compile_commands_file_path_results = [
-            os.path.join(folder, file)
-            for folder in self.window.folders()
-            for file in os.listdir(folder)
-            if file == "compile_commands.json"]
+    Reloading a database that was not modified since it was last loaded into
+    the same rdm instance is skipped, and in case only a few of its entries
+    were modified, only their sources are reindexed (unless `force` is
+    given). Both are only done while rdm still knows the project, as it
+    forgets it in case it is restarted with a fresh data directory.
+    """
 
-        logger.debug("Found compile_commands.json files at:\n  {}".format(
-            compile_commands_file_path_results))
+    """ Class Constants """
+    # Maximal amount of modified entries reindexed one by one, rather than
+    # reloading the whole database
+    _MAX_INCREMENTAL_CHANGES = 100
 
-        if not compile_commands_file_path_results:
+    # Outputs of "--is-indexed" for files of projects rdm knows
+    _KNOWN_FILE_STATES = ("indexed", "managed")
+
+    def run(self, force=False):
+        logger.info("The functional command '%s' has been triggered.",
+            self.__class__.__name__)
+
+        progress_indicator = None
+        if self.window.active_view():
+            progress_indicator = ProgressIndicator(
+                self.window.active_view(),
+                "Looking for compilation databases")
+            progress_indicator.start()
+
+        # Walking the project folders may take a while, so it is done
+        # without blocking the main thread
+        folders = self.window.folders()
+
+        def _find():
+            compile_commands_paths = CompileCommandsFinder.find(folders)
+            sublime.set_timeout(
+                lambda: self._on_found(
+                    progress_indicator, compile_commands_paths, force),
+                0)
+
+        sublime.set_timeout_async(_find, 0)
+
+    def _on_found(self, progress_indicator, compile_commands_paths, force):
+        """ Load the compilation database out of `compile_commands_paths`,
+            letting the user choose one in case there are several.
+        """
+        if progress_indicator:
+            progress_indicator.stop()
+
+        logger.debug("Found compile_commands.json files at:\n  %s",
+            compile_commands_paths)
+
+        if not compile_commands_paths:
             sublime.error_message(
                 "[RTags error]\n\n" +
                 "There is no compile_commands.json in your environment.")
             return
 
-        if len(compile_commands_file_path_results) > 1:
+        if len(compile_commands_paths) == 1:
+            self._load(compile_commands_paths[0], force)
+            return
+
+        # Most recently generated databases are the likeliest choices
+        compile_commands_paths = sorted(
+            compile_commands_paths, key=self._get_mtime, reverse=True)
+
+        def _on_select(index):
+            if index != -1:
+                self._load(compile_commands_paths[index], force)
+
+        self.window.show_quick_panel(
+            [[self._to_display_path(path), path]
+             for path in compile_commands_paths],
+            _on_select)
+
+    def _load(self, compile_commands_path, force):
+        """ Load the compilation database at `compile_commands_path` into rdm,
+            or only the modifications made to it since it was last loaded.
+        """
+        rdm_socket_file = self._get_rdm_socket_file()
+
+        # Hashing a large database takes a while, so it is done without
+        # blocking the main thread
+        sublime.set_timeout_async(
+            lambda: self._compare_to_last_loaded(
+                compile_commands_path, rdm_socket_file, force),
+            0)
+
+    def _compare_to_last_loaded(
+            self, compile_commands_path, rdm_socket_file, force):
+        """ Figure out how the database at `compile_commands_path` should be
+            loaded into the rdm instance listening on `rdm_socket_file`, by
+            comparing it to the one that was last loaded into it.
+
+        Note:
+            Executed on Sublime's async thread.
+        """
+        def _on_main_thread(callback, *args):
+            sublime.set_timeout(lambda: callback(*args), 0)
+
+        fingerprint = None
+        try:
+            fingerprint = CompileCommandsFingerprint.of_file(
+                rdm_socket_file, compile_commands_path)
+            last_fingerprint = (
+                None if force else
+                CompileCommandsFingerprint.last_loaded(
+                    rdm_socket_file, compile_commands_path))
+
+            if last_fingerprint:
+                changed_sources, removed_sources = [], []
+                if last_fingerprint.content_hash != fingerprint.content_hash:
+                    # Regenerated databases often differ only in formatting
+                    # or order of entries
+                    changed_sources, removed_sources = fingerprint.diff(
+                        last_fingerprint)
+
+                unchanged_sources = set(
+                    last_fingerprint.entry_fingerprints).difference(
+                        changed_sources, removed_sources)
+                if unchanged_sources and (
+                        (not changed_sources and not removed_sources) or
+                        self._can_reindex_incrementally(
+                            fingerprint, changed_sources, removed_sources)):
+                    _on_main_thread(
+                        self._load_if_unknown_to_rdm, compile_commands_path,
+                        fingerprint, last_fingerprint, unchanged_sources,
+                        changed_sources, removed_sources)
+                    return
+        except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug(
+                "Failed to compare compilation database to the last loaded "
+                "one: %s", e)
+            fingerprint = None
+
+        _on_main_thread(
+            self._load_fully, compile_commands_path, rdm_socket_file,
+            fingerprint)
+
+    def _load_if_unknown_to_rdm(
+            self, compile_commands_path, fingerprint, last_fingerprint,
+            unchanged_sources, changed_sources, removed_sources):
+        """ Load only the modifications of `fingerprint` since
+            `last_fingerprint` (`changed_sources` and `removed_sources`, if
+            any), in case rdm still knows one of `unchanged_sources`, or else
+            load the whole database at `compile_commands_path`.
+        """
+        def _on_rc_done(rc_thread):
+            if (not rc_thread.rc_returned_successfully or
+                    rc_thread.received_output.strip() not in
+                    self._KNOWN_FILE_STATES):
+                logger.debug(
+                    "rdm does not know the project of \"%s\", loading it "
+                    "anyway.", compile_commands_path)
+                self._load_fully(
+                    compile_commands_path, fingerprint.rdm_socket_file,
+                    fingerprint)
+            elif changed_sources or removed_sources:
+                self._reindex(fingerprint, changed_sources, removed_sources)
+            else:
+                if fingerprint.content_hash != last_fingerprint.content_hash:
+                    sublime.set_timeout_async(
+                        lambda: self._remember(fingerprint), 0)
+                self._on_unchanged()
+
+        # rdm forgets projects in case it is restarted with a fresh data
+        # directory
+        rc_thread = RCCall(
+            silent=True, rdm_socket_file=fingerprint.rdm_socket_file)
+        rc_thread.execute_rc_async(
+            _on_rc_done, "--is-indexed {}".format(min(unchanged_sources)))
+
+    def _can_reindex_incrementally(
+            self, fingerprint, changed_sources, removed_sources):
+        """ Return whether modified entries of `fingerprint` are few enough
+            to be reindexed one by one, and can be passed to rc as is.
+        """
+        if (len(changed_sources) + len(removed_sources) >
+                self._MAX_INCREMENTAL_CHANGES):
+            return False
+
+        # rc parameters are separated by whitespaces, so arguments can't
+        # contain any
+        return not any(
+            not argument or any(char.isspace() for char in argument)
+            for source in changed_sources
+            for argument in fingerprint.compile_arguments(source))
+
+    def _on_unchanged(self):
+        self.window.status_message(
+            "RTags: The compilation database is unchanged since it was "
+            "loaded. Use \"RTags: Reload Compilation Database\" to load it "
+            "anyway.")
+
+    def _load_fully(self, compile_commands_path, rdm_socket_file, fingerprint):
+        """ Load the whole compilation database at `compile_commands_path`
+            into the rdm instance listening on `rdm_socket_file`.
+        """
+        # Execute rc command, without blocking the main thread
+        rc_params = "--load-compile-commands {}".format(compile_commands_path)
+        rc_thread = RCCall(rdm_socket_file=rdm_socket_file)
+        rc_thread.execute_rc_async(
+            lambda rc_thread: self._on_rc_done(fingerprint, rc_thread),
+            rc_params,
+            progress_view=self.window.active_view(),
+            progress_message="Loading compilation database")
+
+    def _reindex(self, fingerprint, changed_sources, removed_sources):
+        """ Pass the modified entries of `fingerprint` to rdm one by one:
+            sources of `changed_sources` are compiled with their new
+            arguments, and `removed_sources` are removed from the project.
+        """
+        logger.debug("Reindexing %s changed sources, and removing %s.",
+            len(changed_sources), len(removed_sources))
+
+        progress_indicator = None
+        if self.window.active_view():
+            progress_indicator = ProgressIndicator(
+                self.window.active_view(), "Reindexing changed sources")
+            progress_indicator.start()
+
+        rdm_socket_file = fingerprint.rdm_socket_file
+        rc_calls = []
+        for source in removed_sources:
+            rc_calls.append((
+                RCCall(silent=True, rdm_socket_file=rdm_socket_file),
+                "--remove {}".format(source)))
+        for source in changed_sources:
+            directory = fingerprint.entries[source]["directory"]
+            rc_calls.append((
+                RCCall(silent=True, working_directory=directory,
+                       rdm_socket_file=rdm_socket_file),
+                "--compile {}".format(
+                    ' '.join(fingerprint.compile_arguments(source)))))
+
+        pending_rc_calls = [len(rc_calls)]
+        failed_rc_calls = []
+
+        def _on_rc_call_done(rc_thread):
+            pending_rc_calls[0] -= 1
+            if not rc_thread.rc_returned_successfully:
+                failed_rc_calls.append(rc_thread)
+            if pending_rc_calls[0]:
+                return
+
+            if progress_indicator:
+                progress_indicator.stop()
+            self._on_reindexed(
+                fingerprint, changed_sources + removed_sources,
+                failed_rc_calls)
+
+        for rc_thread, rc_params in rc_calls:
+            rc_thread.execute_rc_async(_on_rc_call_done, rc_params)
+
+    def _on_reindexed(self, fingerprint, modified_sources, failed_rc_calls):
+        """ Notify the user whether all `modified_sources` were reindexed.
+        """
+        for source in modified_sources:
+            ResultCache.invalidate_file_in_all_caches(source)
+        SymbolIndex.invalidate_files(
+            fingerprint.rdm_socket_file, modified_sources)
+
+        if failed_rc_calls:
+            # Next load should load the whole database again
+            sublime.set_timeout_async(
+                lambda: CompileCommandsFingerprint.forget(
+                    fingerprint.rdm_socket_file, fingerprint.path),
+                0)
             sublime.error_message(
                 "[RTags error]\n\n" +
-                "Multiple compile_commands.json files found in environment.\n"
-                "I don't know which one to load, so I'll leave it to you.")
+                "RC failed to reindex {} of the {} modified sources of the "
+                "compilation database.\n"
+                "Please reload it using "
+                "\"RTags: Reload Compilation Database\".".format(
+                    len(failed_rc_calls), len(modified_sources)))
             return
 
-        # Execute rc command
-        compile_commands_path = compile_commands_file_path_results[0]
-        rc_params = "--load-compile-commands {}".format(compile_commands_path)
-        rc_thread = RCCall()
-        rc_thread.execute_rc(rc_params)
-        rc_thread.join()
+        sublime.set_timeout_async(lambda: self._remember(fingerprint), 0)
+        RdmReadiness.check(fingerprint.rdm_socket_file)
+        self.window.status_message(
+            "RTags: Reindexing {} modified sources of the compilation "
+            "database.".format(len(modified_sources)))
 
+    def _on_rc_done(self, fingerprint, rc_thread):
+        """ Notify the user whether the compilation database was loaded.
+        """
         if rc_thread.rc_returned_successfully:
+            # rdm is about to reindex, so cached results are no longer valid
+            ResultCache.clear_all_caches()
+            SymbolIndex.clear(rc_thread.rdm_socket_file)
+            RdmReadiness.check(rc_thread.rdm_socket_file)
+            if fingerprint:
+                sublime.set_timeout_async(
+                    lambda: self._remember(fingerprint), 0)
             self.window.status_message(
                 "RTags: The compilation database was loaded successfully.")
         else:
@@ -51,3 +316,40 @@ class LoadCompileCommandsCommand(sublime_plugin.WindowCommand):
                 "RC failed to load the compilation database.\n"
                 "RTags can't work without it.\n"
                 "Please refer to @StavE.")
+
+    def _get_rdm_socket_file(self):
+        """ Return the socket file of the rdm instance serving the window's
+            project.
+        """
+        return RCCall.socket_file_for(window=self.window)
+
+    def _to_display_path(self, compile_commands_path):
+        """ Return the directory of `compile_commands_path`, relative to the
+            project folder containing it.
+        """
+        directory = os.path.dirname(compile_commands_path)
+        for folder in self.window.folders():
+            if directory == folder:
+                return os.path.basename(folder)
+            if directory.startswith(folder + os.sep):
+                return os.path.join(
+                    os.path.basename(folder),
+                    os.path.relpath(directory, folder))
+        return directory
+
+    @staticmethod
+    def _remember(fingerprint):
+        """ Remember `fingerprint` as the last loaded one of its database.
+        """
+        try:
+            CompileCommandsFingerprint.remember(fingerprint)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.debug(
+                "Failed to fingerprint compilation database: %s", e)
+
+    @staticmethod
+    def _get_mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
@@ -0,0 +1,300 @@
+import sublime
+import sublime_plugin
+
+import collections  # To group the renamed sites by file
+import functools  # To bind the renamed names to callbacks
+import os  # To tell whether files were modified while renamed
+import re  # To validate the new name
+
+from RTags.rtags_commands.find_references import (
+    FindReferencesCommand, iter_references)
+from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.rc_call import RCCall
+from RTags.rtags_modules.request_scheduler import RequestScheduler
+from RTags.rtags_modules.result_cache import ResultCache
+from RTags.rtags_modules.cursor_manipulations import CursorLocationHelper
+
+
+class RenameSymbolCommand(FindReferencesCommand):
+    """ Renames the symbol under cursor, along with all of its references
+    throughout the project.
+
+    The symbol is resolved and its references are found the same way
+    `FindReferencesCommand` finds them, and are then grouped by file:
+
+    - Files that are open in any window are edited through their views, by
+      a single edit per view (so renaming is undone at once), applied back
+      to front so that the offsets of the remaining sites stay valid.
+    - Any other file is read and written as a whole, once, on Sublime's
+      async thread. It is left untouched in case it is opened or modified
+      meanwhile, so a buffer is never overwritten behind its back.
+
+    Sites whose text is not the symbol's name (e.g. since rdm did not index
+    the latest modifications yet) are left as is.
+    """
+
+    """ Class Constants """
+    _IDENTIFIER_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        # Flags that will be given to rc call, as a format. Declarations and
+        # definitions (e.g. of constructors) are renamed as well.
+        self._rc_params_format = (
+            "--no-context --all-references --rename --references {location}")
+        # Current and new names of the symbol being renamed
+        self._names = None
+
+    def run(self, edit):
+        logger.info("The functional command '%s' has been triggered.",
+            self.__class__.__name__)
+
+        # Get current cursor location, and assure it is single
+        location = CursorLocationHelper.extract_single_location(
+            view=self.view, avoid_word_end=True)
+        if not location:
+            self.view.window().status_message(
+                "RTags: Cannot rename symbol for multiple cursors.")
+            return
+
+        name = self.view.substr(self.view.word(self.view.sel()[0].a))
+        if not self._IDENTIFIER_PATTERN.match(name):
+            self.view.window().status_message(
+                "RTags: No symbol to rename under cursor.")
+            return
+
+        self.view.window().show_input_panel(
+            "Rename '{}' to:".format(name), name,
+            functools.partial(self._on_new_name, location, name),
+            None, None)
+
+    def _on_new_name(self, location, name, new_name):
+        """ Rename the symbol `name` at `location` to `new_name`, as entered
+            by the user.
+        """
+        if not self.view.is_valid() or new_name == name:
+            return
+
+        if not self._IDENTIFIER_PATTERN.match(new_name):
+            self.view.window().status_message(
+                "RTags: \"{}\" is not a valid name.".format(new_name))
+            return
+
+        self._names = (name, new_name)
+        self._resolve_symbol(location)
+
+    def _find_references(self, location, symbol_length,
+                         persisted_search=None):
+        """ Find the references of the symbol at `location` to rename, once
+            its length is resolved.
+
+        References to rename are never presented from persistent cache, so
+        there is no `persisted_search`.
+        """
+        name, new_name = self._names
+        if symbol_length and symbol_length != len(name):
+            # The word under cursor is only a part of the symbol (e.g. of an
+            # operator), which is not renamed
+            self.view.window().status_message(
+                "RTags: Cannot rename symbol under cursor.")
+            return
+
+        rc_params = self._rc_params_format.format(location=location)
+        rc_thread = RCCall(self.view.file_name())
+        RequestScheduler.execute(
+            rc_thread, self.__class__.__name__, self.view,
+            functools.partial(self._on_references_found, name, new_name),
+            rc_params,
+            progress_view=self.view,
+            progress_message="Finding references to rename")
+
+    def _on_references_found(self, name, new_name, rc_thread):
+        """ Rename `name` to `new_name` at the references found by the
+            completed `rc_thread`.
+        """
+        window = self.view.window()
+        if not rc_thread.rc_returned_successfully:
+            window.status_message(
+                "RTags: Failed to find references of symbol under cursor.")
+            return
+
+        sites_by_file = collections.defaultdict(set)
+        for target_filename, row, col, _ in iter_references(
+                rc_thread.received_output.splitlines()):
+            sites_by_file[target_filename].add((int(row), int(col)))
+
+        if not sites_by_file:
+            window.status_message("RTags: No references to rename.")
+            return
+
+        number_of_sites = sum(len(sites) for sites in sites_by_file.values())
+        renamed = _RenameSummary(number_of_sites)
+
+        unopened_files = {}
+        for file_name, sites in sites_by_file.items():
+            view = _find_open_view(file_name)
+            if view is None:
+                unopened_files[file_name] = sites
+                continue
+            renamed.add(_rename_in_view(view, sites, name, new_name))
+
+        if not unopened_files:
+            window.status_message(renamed.status_message())
+            return
+
+        def _rename_in_unopened_files():
+            for file_name, sites in unopened_files.items():
+                try:
+                    if _find_open_view(file_name) is not None:
+                        raise _FileModifiedError("It was opened meanwhile.")
+                    renamed.add(
+                        _rename_in_file(file_name, sites, name, new_name))
+                except (IOError, OSError, UnicodeError,
+                        _FileModifiedError) as e:
+                    logger.warning(
+                        "Failed to rename in \"%s\": %s", file_name, e)
+                    renamed.fail()
+                else:
+                    ResultCache.invalidate_file_in_all_caches(file_name)
+
+            sublime.set_timeout(
+                lambda: window.status_message(renamed.status_message()), 0)
+
+        sublime.set_timeout_async(_rename_in_unopened_files, 0)
+
+
+class ApplyRenameEditsCommand(sublime_plugin.TextCommand):
+    """ Replace the text of regions of the view with a new name, within a
+    single edit.
+    """
+
+    def run(self, edit, regions, new_name):
+        """ Params:
+                regions  - List of [begin, end] points to replace, from the
+                           last to the first
+                new_name - Text to replace them with
+        """
+        logger.debug("The helper command '%s' has been triggered.",
+            self.__class__.__name__)
+
+        for begin, end in regions:
+            self.view.replace(edit, sublime.Region(begin, end), new_name)
+
+
+def _find_open_view(file_name):
+    """ Return the view `file_name` is open in within any window, or None in
+        case it is not open.
+    """
+    for window in sublime.windows():
+        # Views of project files are opened via their project paths
+        view = window.find_open_file(
+            CursorLocationHelper.to_project_path(window, file_name))
+        if view is not None:
+            return view
+    return None
+
+
+def _rename_in_view(view, sites, name, new_name):
+    """ Replace `name` with `new_name` at every site of `sites` ((row, col)
+        tuples, nonzero based) within `view`, and return the amount of sites
+        it was replaced at.
+    """
+    regions = []
+    # Applied back to front, so former replacements don't move later sites
+    for row, col in sorted(sites, reverse=True):
+        begin = view.text_point(row - 1, col - 1)
+        region = sublime.Region(begin, begin + len(name))
+        if view.substr(region) == name:
+            regions.append([region.begin(), region.end()])
+
+    if regions:
+        view.run_command("apply_rename_edits", {
+            "regions": regions, "new_name": new_name})
+    return len(regions)
+
+
+def _rename_in_file(file_name, sites, name, new_name):
+    """ Replace `name` with `new_name` at every site of `sites` ((row, col)
+        tuples, nonzero based) within `file_name`, and return the amount of
+        sites it was replaced at.
+
+    The file is read and written as a whole, and is left untouched in case
+    there is nothing to replace in it, or it was modified since it was read.
+
+    Raises:
+        IOError/OSError    - The file could not be read or written
+        UnicodeError       - The file is not UTF-8 encoded
+        _FileModifiedError - The file was modified since it was read
+    """
+    # Line endings are kept as they are, within the lines
+    with open(file_name, 'r', encoding='UTF-8', newline='') as source_file:
+        read_stat = os.fstat(source_file.fileno())
+        lines = source_file.read().split('\n')
+
+    renamed = 0
+    for row, col in sorted(sites, reverse=True):
+        if row > len(lines):
+            continue
+        line = lines[row - 1]
+        begin, end = col - 1, col - 1 + len(name)
+        if line[begin:end] == name:
+            lines[row - 1] = line[:begin] + new_name + line[end:]
+            renamed += 1
+
+    if renamed:
+        stat = os.stat(file_name)
+        if (stat.st_mtime_ns, stat.st_size) != (
+                read_stat.st_mtime_ns, read_stat.st_size):
+            raise _FileModifiedError("It was modified meanwhile.")
+        with open(file_name, 'w', encoding='UTF-8',
+                  newline='') as source_file:
+            source_file.write('\n'.join(lines))
+    return renamed
+
+
+class _FileModifiedError(Exception):
+    """ A file to rename within was opened or modified after its references
+    were found.
+    """
+    pass
+
+
+class _RenameSummary(object):
+    """ Counts the sites and files a symbol was renamed at, for notifying the
+    user once renaming completes.
+
+    Note:
+        Not thread safe, but every rename is counted by a single thread at a
+        time.
+    """
+
+    def __init__(self, number_of_sites):
+        self._number_of_sites = number_of_sites
+        self._renamed_sites = 0
+        self._renamed_files = 0
+        self._failed_files = 0
+
+    def add(self, renamed_sites):
+        """ Count a file `renamed_sites` were renamed within.
+        """
+        self._renamed_sites += renamed_sites
+        if renamed_sites:
+            self._renamed_files += 1
+
+    def fail(self):
+        """ Count a file that failed to be renamed within.
+        """
+        self._failed_files += 1
+
+    def status_message(self):
+        status_message = (
+            "RTags: Renamed {} references across {} files.".format(
+                self._renamed_sites, self._renamed_files))
+
+        if self._failed_files:
+            status_message += " Failed to rename within {} files.".format(
+                self._failed_files)
+        elif self._renamed_sites < self._number_of_sites:
+            status_message += " Skipped {} outdated references.".format(
+                self._number_of_sites - self._renamed_sites)
+        return status_message
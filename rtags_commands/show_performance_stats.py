@@ -0,0 +1,31 @@
+import sublime_plugin
+
+from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.performance_stats import PerformanceStats
+
+
+class ShowPerformanceStatsCommand(sublime_plugin.WindowCommand):
+    """ Present latency statistics of the rc calls made so far, by command
+    type and phase, along with their timeout and exit code counts.
+    """
+
+    """ Class Constants """
+    RESULTS_PANEL_NAME = "RTags - Performance Stats"
+
+    def run(self):
+        logger.info("The functional command '%s' has been triggered.",
+            self.__class__.__name__)
+
+        panel = self.window.create_output_panel(self.RESULTS_PANEL_NAME)
+        panel.settings().set("word_wrap", False)
+        panel.settings().set("line_numbers", False)
+        panel.settings().set("gutter", False)
+        panel.settings().set("scroll_past_end", False)
+
+        panel.set_read_only(False)
+        panel.run_command("append", {
+            "characters": PerformanceStats.format_report()})
+        panel.set_read_only(True)
+
+        self.window.run_command("show_panel", {
+            "panel": "output.{}".format(self.RESULTS_PANEL_NAME)})
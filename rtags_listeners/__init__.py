@@ -0,0 +1,16 @@
+"""RTags event listeners
+
+result_cache_invalidation:
+    invalidates cached rc results of modified and saved files
+definition_prefetch:
+    prefetches the definition of the symbol under a resting cursor
+rdm_sync:
+    reindexes saved and modified files, once they rest
+symbol_hover:
+    presents information of the symbol under the mouse in a popup
+references_preview:
+    previews the result under cursor within the references results panel
+"""
+__all__ = [
+    "result_cache_invalidation", "definition_prefetch", "rdm_sync",
+    "symbol_hover", "references_preview"]
@@ -0,0 +1,145 @@
+import sublime
+import sublime_plugin
+
+import functools  # To bind the prefetched location to rc call callbacks
+import time  # To rate limit prefetches
+
+from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.rc_call import RCCall
+from RTags.rtags_modules.rdm_readiness import RdmReadiness
+from RTags.rtags_modules.result_cache import follow_location_cache
+from RTags.rtags_modules.cursor_manipulations import CursorLocationHelper
+
+
+class DefinitionPrefetchListener(sublime_plugin.EventListener):
+    """ Prefetches the definition of the symbol under cursor once the cursor
+    rests on it, so a later `follow_location` finds it in the cache.
+
+    - Only a single prefetch is in flight at any time, and prefetches are
+      separated by a minimal interval.
+    - Prefetching backs off (exponentially) while rdm is indexing (see
+      `RdmReadiness`) or fails to answer.
+    """
+
+    """ Class Constants """
+    _SELECTOR = "source.c, source.c++"
+
+    # Default amount of milliseconds the cursor should rest before prefetching
+    _DEFAULT_IDLE_DELAY = 300
+
+    # Minimal amount of seconds between two prefetches
+    _MIN_INTERVAL = 1.0
+
+    # Minimal and maximal amount of seconds to back off for
+    _MIN_BACKOFF = 2.0
+    _MAX_BACKOFF = 60.0
+
+    def __init__(self):
+        super().__init__()
+        # Incremented on every cursor movement, to detect resting cursors
+        self._generation = 0
+
+        self._is_prefetching = False
+        self._last_prefetch_time = 0
+
+        self._backoff = 0
+        self._backoff_until = 0
+
+    def on_selection_modified_async(self, view):
+        if not self._is_enabled() or not self._is_relevant_view(view):
+            return
+
+        self._generation += 1
+        sublime.set_timeout_async(
+            functools.partial(self._on_idle, view, self._generation),
+            self._get_idle_delay())
+
+    def _on_idle(self, view, generation):
+        """ Prefetch the definition under cursor, in case the cursor rested
+            since `generation`.
+        """
+        if generation != self._generation or not view.is_valid():
+            return
+
+        now = time.time()
+        if (self._is_prefetching or
+                now < self._backoff_until or
+                now - self._last_prefetch_time < self._MIN_INTERVAL):
+            return
+
+        if RdmReadiness.is_indexing(RCCall.socket_file_for(view.file_name())):
+            # Don't load rdm with prefetches while it is busy indexing
+            logger.debug("rdm is busy, backing off from prefetching.")
+            self._back_off()
+            return
+
+        location = CursorLocationHelper.extract_single_location(
+            view=view, avoid_word_end=True)
+        if not location:
+            return
+
+        cache_key = (location, view.change_count())
+        if follow_location_cache.get(cache_key) is not None:
+            return
+
+        self._is_prefetching = True
+        self._last_prefetch_time = now
+        self._prefetch(view, location, cache_key)
+
+    def _prefetch(self, view, location, cache_key):
+        """ Query the definition at `location`, to be cached under `cache_key`.
+        """
+        logger.debug("Prefetching definition at \"%s\".", location)
+        rc_thread = RCCall(view.file_name(), silent=True)
+        rc_thread.execute_rc_async(
+            functools.partial(self._on_prefetched, view, cache_key),
+            "--no-context --follow-location {}".format(location))
+
+    def _on_prefetched(self, view, cache_key, rc_thread):
+        """ Cache the definition returned by the completed `rc_thread`.
+        """
+        self._is_prefetching = False
+
+        if not rc_thread.rc_returned_successfully:
+            self._back_off()
+            return
+        self._backoff = 0
+
+        output = rc_thread.received_output
+        if not output or not view.is_valid():
+            return
+
+        # Output format is "{target_filename}:{row}:{col}:"
+        target_filename = output.rsplit(':', 3)[0]
+        follow_location_cache.put(
+            cache_key, output,
+            related_files=(view.file_name(), target_filename))
+
+    def _back_off(self):
+        """ Stop prefetching for a while, longer on every consecutive call.
+        """
+        self._is_prefetching = False
+        self._backoff = min(
+            max(self._backoff * 2, self._MIN_BACKOFF), self._MAX_BACKOFF)
+        self._backoff_until = time.time() + self._backoff
+
+    @classmethod
+    def _is_relevant_view(cls, view):
+        """ Return whether `view` is a C/C++ file with a single cursor.
+        """
+        selection = view.sel()
+        return (
+            view.file_name() and
+            len(selection) == 1 and
+            view.score_selector(selection[0].b, cls._SELECTOR) > 0)
+
+    @staticmethod
+    def _is_enabled():
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return rtags_settings.get("prefetch_definitions", True)
+
+    @classmethod
+    def _get_idle_delay(cls):
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return rtags_settings.get(
+            "prefetch_idle_delay_ms", cls._DEFAULT_IDLE_DELAY)
@@ -0,0 +1,136 @@
+import sublime
+import sublime_plugin
+
+import functools  # To bind views and files to delayed callbacks
+
+from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.rc_call import RCCall
+from RTags.rtags_modules.rdm_readiness import RdmReadiness
+from RTags.rtags_modules.result_cache import ResultCache
+from RTags.rtags_modules.symbol_index import SymbolIndex
+
+
+class RdmSyncListener(sublime_plugin.EventListener):
+    """ Keeps rdm in sync with edits of C/C++ files, so navigation doesn't
+    return stale locations.
+
+    - Modifications and saves of a file are coalesced, and synced once the
+      file rests for a while.
+    - A modified (unsaved) file is reindexed with the contents of its buffer
+      ("--unsaved-file"), and a saved file is reindexed from disk.
+    - Only a single sync is in flight per file. Events arriving meanwhile
+      cause another sync once it completes.
+    - Once synced, cached results of the file are invalidated. Queries are
+      only held back while rdm reindexes a saved file (see `RdmReadiness`),
+      since unsaved files are synced on every pause in typing.
+
+    Note:
+        All state is only accessed from Sublime's async thread.
+    """
+
+    """ Class Constants """
+    _SELECTOR = "source.c, source.c++"
+
+    # Default amount of milliseconds a file should rest before it is synced
+    _DEFAULT_SYNC_DELAY = 500
+
+    def __init__(self):
+        super().__init__()
+        # Incremented on every event of a file, to detect resting files
+        self._generations = {}
+        # Generation of every file at the time its last sync started
+        self._synced_generations = {}
+        # Files having a sync in flight
+        self._syncing_files = set()
+        # Files to be synced again once their sync in flight completes
+        self._outdated_files = set()
+
+    def on_modified_async(self, view):
+        if self._get_setting("sync_unsaved_files", True):
+            self._schedule_sync(view)
+
+    def on_post_save_async(self, view):
+        if self._get_setting("reindex_on_save", True):
+            self._schedule_sync(view)
+
+    def _schedule_sync(self, view):
+        """ Sync the file of `view` once it rests.
+        """
+        file_name = view.file_name()
+        if not file_name or view.score_selector(0, self._SELECTOR) <= 0:
+            return
+
+        generation = self._generations.get(file_name, 0) + 1
+        self._generations[file_name] = generation
+        sublime.set_timeout_async(
+            functools.partial(self._on_idle, view, file_name, generation),
+            self._get_setting("sync_delay_ms", self._DEFAULT_SYNC_DELAY))
+
+    def _on_idle(self, view, file_name, generation):
+        """ Sync `file_name`, in case it rested since `generation`.
+        """
+        if (self._generations.get(file_name) != generation or
+                self._synced_generations.get(file_name, 0) >= generation):
+            # Superseded by a later event, or already synced meanwhile
+            return
+
+        if file_name in self._syncing_files:
+            self._outdated_files.add(file_name)
+            return
+
+        self._sync(view, file_name)
+
+    def _sync(self, view, file_name):
+        """ Reindex `file_name`, with the contents of `view` in case it is
+            modified.
+        """
+        if not view.is_valid():
+            self._generations.pop(file_name, None)
+            self._synced_generations.pop(file_name, None)
+            return
+
+        if view.is_dirty() and self._get_setting("sync_unsaved_files", True):
+            contents = view.substr(sublime.Region(0, view.size())).encode(
+                'UTF-8')
+            rc_params = "--reindex {0} --unsaved-file={0}:{1}".format(
+                file_name, len(contents))
+        else:
+            contents = None
+            rc_params = "--reindex {}".format(file_name)
+
+        logger.debug("Syncing \"%s\" with rdm (%s).",
+            file_name, "unsaved" if contents is not None else "saved")
+
+        self._syncing_files.add(file_name)
+        self._synced_generations[file_name] = self._generations[file_name]
+        rc_thread = RCCall(file_name, silent=True, input_data=contents)
+        rc_thread.execute_rc_async(
+            lambda rc_thread: sublime.set_timeout_async(
+                functools.partial(
+                    self._on_synced, view, file_name, contents is not None,
+                    rc_thread), 0),
+            rc_params)
+
+    def _on_synced(self, view, file_name, is_unsaved, rc_thread):
+        """ Sync `file_name` again, in case it was modified while the
+            completed `rc_thread` was in flight.
+        """
+        self._syncing_files.discard(file_name)
+
+        if rc_thread.rc_returned_successfully:
+            ResultCache.invalidate_file_in_all_caches(file_name)
+            SymbolIndex.invalidate_files(
+                rc_thread.rdm_socket_file, (file_name,))
+            if not is_unsaved:
+                RdmReadiness.check(rc_thread.rdm_socket_file)
+        else:
+            logger.debug("Failed to sync \"%s\" with rdm.", file_name)
+
+        if file_name in self._outdated_files:
+            self._outdated_files.discard(file_name)
+            self._sync(view, file_name)
+
+    @staticmethod
+    def _get_setting(key, default):
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return rtags_settings.get(key, default)
@@ -0,0 +1,145 @@
+import sublime
+import sublime_plugin
+
+import collections  # To remember which files were preloaded, in LRU order
+import functools  # To bind the selected result to delayed callbacks
+
+from RTags.rtags_commands.find_references import (
+    reference_at, reference_files_after)
+from RTags.rtags_modules.main_logger import logger
+
+
+class ReferencesPreviewListener(sublime_plugin.EventListener):
+    """ Previews the result under cursor within the references results panel,
+    as the cursor moves between results.
+
+    - While the panel is focused, the file of the result is opened as a
+      transient view at the result's row, and the focus is kept on the panel,
+      so results can be stepped through with the keyboard.
+    - The files of the next few results are read in the background, so they
+      load from the OS cache once they are previewed (or navigated to with
+      "next_result").
+
+    Note:
+        All state is only accessed from Sublime's main thread.
+    """
+
+    """ Class Constants """
+    # Amount of milliseconds the cursor should rest before previewing, so
+    # holding an arrow key doesn't open every file on the way
+    _PREVIEW_DELAY = 30
+
+    # Default amount of files read ahead of the result under cursor
+    _DEFAULT_PRELOADED_FILES = 5
+
+    # Maximal amount of preloaded files remembered, to avoid reading them again
+    _MAX_PRELOADED_FILES = 256
+
+    # Size of the chunks preloaded files are read by
+    _CHUNK_SIZE = 1 << 20
+
+    def __init__(self):
+        super().__init__()
+        # Incremented on every cursor movement, to detect resting cursors
+        self._generation = 0
+        # Id of the references results panel, in case it is focused
+        self._focused_view_id = None
+        # Preloaded file names, in LRU order
+        self._preloaded_files = collections.OrderedDict()
+
+    def on_activated(self, view):
+        if view.settings().get("rtags_references"):
+            self._focused_view_id = view.id()
+
+    def on_deactivated(self, view):
+        if view.id() == self._focused_view_id:
+            self._focused_view_id = None
+
+    def on_selection_modified(self, view):
+        if (not view.settings().get("rtags_references") or
+                not self._is_enabled()):
+            return
+
+        self._generation += 1
+        sublime.set_timeout(
+            functools.partial(self._on_idle, view, self._generation),
+            self._PREVIEW_DELAY)
+
+    def _on_idle(self, view, generation):
+        """ Preview the result under cursor in the results panel `view`, in
+            case the cursor rested since `generation`.
+        """
+        if generation != self._generation or not view.is_valid():
+            return
+
+        selection = view.sel()
+        if len(selection) != 1 or not selection[0].empty():
+            return
+
+        point = selection[0].b
+        reference = reference_at(view, point)
+        if reference is None:
+            return
+
+        self._preload(
+            reference_files_after(view, point, self._get_preloaded_files()))
+
+        # Results opened by other means (e.g. a double-click) focus their
+        # file, which should not be taken over by a preview
+        if view.id() == self._focused_view_id:
+            self._preview(view, *reference)
+
+    @staticmethod
+    def _preview(results_view, file_name, row):
+        """ Open `file_name` at `row` as a transient view, keeping the focus
+            on `results_view`.
+        """
+        logger.debug("Previewing \"%s:%s\".", file_name, row)
+        window = results_view.window()
+        window.open_file(
+            "{}:{}:1".format(file_name, row),
+            sublime.ENCODED_POSITION | sublime.TRANSIENT)
+        window.focus_view(results_view)
+
+    def _preload(self, file_names):
+        """ Read `file_names` that were not preloaded yet, on Sublime's async
+            thread.
+        """
+        preloaded_files = self._preloaded_files
+        unread_file_names = []
+        for file_name in file_names:
+            if file_name in preloaded_files:
+                preloaded_files.move_to_end(file_name)
+            else:
+                preloaded_files[file_name] = True
+                unread_file_names.append(file_name)
+
+        while len(preloaded_files) > self._MAX_PRELOADED_FILES:
+            preloaded_files.popitem(last=False)
+
+        if unread_file_names:
+            sublime.set_timeout_async(
+                functools.partial(self._read, unread_file_names), 0)
+
+    @classmethod
+    def _read(cls, file_names):
+        """ Read `file_names` through, so they are cached by the OS.
+        """
+        for file_name in file_names:
+            try:
+                with open(file_name, 'rb') as preloaded_file:
+                    while preloaded_file.read(cls._CHUNK_SIZE):
+                        pass
+            except (IOError, OSError) as e:
+                logger.debug("Failed to preload \"%s\": %s", file_name, e)
+
+    @staticmethod
+    def _is_enabled():
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return rtags_settings.get("references_preview", True)
+
+    @classmethod
+    def _get_preloaded_files(cls):
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return max(0, rtags_settings.get(
+            "references_preloaded_files", cls._DEFAULT_PRELOADED_FILES))
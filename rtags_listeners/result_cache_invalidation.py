@@ -0,0 +1,31 @@
+import sublime_plugin
+
+import os.path  # For extracting symbolic links of modified files
+
+from RTags.rtags_modules.result_cache import ResultCache
+
+
+class ResultCacheInvalidationListener(sublime_plugin.EventListener):
+    """ Invalidates cached rc results that were derived from a file, once that
+    file is modified or saved.
+    """
+
+    def on_modified_async(self, view):
+        self._invalidate(view.file_name())
+
+    def on_post_save_async(self, view):
+        self._invalidate(view.file_name())
+
+    @staticmethod
+    def _invalidate(file_name):
+        """ Invalidate cached results derived from `file_name`, by either its
+            own name or its real one.
+        """
+        if not file_name:
+            return
+
+        # rc reports locations of other files with symbolic links extracted
+        ResultCache.invalidate_file_in_all_caches(file_name)
+        real_file_name = os.path.realpath(file_name)
+        if real_file_name != file_name:
+            ResultCache.invalidate_file_in_all_caches(real_file_name)
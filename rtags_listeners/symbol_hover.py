@@ -0,0 +1,204 @@
+import sublime
+import sublime_plugin
+
+import functools  # To bind hovered locations to delayed callbacks
+import html  # To escape symbol information presented in popups
+import json  # To parse symbol information
+
+from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.rc_call import RCCall
+from RTags.rtags_modules.request_scheduler import RequestScheduler
+from RTags.rtags_modules.result_cache import (
+    SYMBOL_INFO_PARAMS_FORMAT, symbol_info_cache)
+from RTags.rtags_modules.cursor_manipulations import CursorLocationHelper
+
+
+class SymbolHoverListener(sublime_plugin.EventListener):
+    """ Presents information of the symbol under the mouse in a popup: its
+    kind, type and the location it is defined at.
+
+    - Symbol information is only queried once the mouse rests on a symbol,
+      and a query made obsolete by further mouse movement is cancelled.
+    - Symbol information is shared with references highlighting, through
+      `symbol_info_cache`.
+    - The popup is only presented once the information arrives.
+
+    Note:
+        All state is only accessed from Sublime's main thread.
+    """
+
+    """ Class Constants """
+    _SELECTOR = "source.c, source.c++"
+
+    # Default amount of milliseconds the mouse should rest before querying
+    _DEFAULT_HOVER_DELAY = 300
+
+    # Maximal width of the popup, in pixels
+    _POPUP_MAX_WIDTH = 800
+
+    def __init__(self):
+        super().__init__()
+        # Incremented on every hover, to detect resting mouse
+        self._generation = 0
+        # Symbol information query in flight, if any
+        self._rc_thread = None
+
+    def on_hover(self, view, point, hover_zone):
+        if (hover_zone != sublime.HOVER_TEXT or
+                not self._is_enabled() or
+                not view.file_name() or
+                view.score_selector(point, self._SELECTOR) <= 0):
+            return
+
+        # Mouse moved on, so the query in flight (if any) is obsolete
+        self._generation += 1
+        self._cancel_query()
+
+        sublime.set_timeout(
+            functools.partial(self._on_idle, view, point, self._generation),
+            self._get_hover_delay())
+
+    def _on_idle(self, view, point, generation):
+        """ Present information of the symbol at `point`, in case the mouse
+            rested there since `generation`.
+        """
+        if generation != self._generation or not view.is_valid():
+            return
+
+        location = CursorLocationHelper.extract_location(
+            view, point, avoid_word_end=True)
+        cache_key = (location, view.change_count())
+        cached_symbol_info = symbol_info_cache.get(cache_key)
+        if cached_symbol_info is not None:
+            logger.debug("Presenting symbol information from cache.")
+            self._show_popup(view, point, cached_symbol_info)
+            return
+
+        rc_params = SYMBOL_INFO_PARAMS_FORMAT.format(location=location)
+        self._rc_thread = RCCall(view.file_name(), silent=True)
+        RequestScheduler.execute(
+            self._rc_thread, self.__class__.__name__, view,
+            functools.partial(
+                self._on_symbol_info_received, view, point, generation,
+                cache_key),
+            rc_params)
+
+    def _on_symbol_info_received(
+            self, view, point, generation, cache_key, rc_thread):
+        """ Cache the symbol information returned by the completed
+            `rc_thread` under `cache_key`, and present it in case the mouse
+            still rests at `point`.
+        """
+        if rc_thread is self._rc_thread:
+            self._rc_thread = None
+
+        if not rc_thread.rc_returned_successfully:
+            return
+
+        symbol_info_cache.put(
+            cache_key, rc_thread.received_output,
+            related_files=(view.file_name(),))
+
+        if generation == self._generation:
+            with rc_thread.timings.measure("render"):
+                self._show_popup(view, point, rc_thread.received_output)
+
+    def _cancel_query(self):
+        if self._rc_thread is not None:
+            self._rc_thread.cancel()
+            self._rc_thread = None
+
+    def _show_popup(self, view, point, symbol_info_output):
+        """ Present `symbol_info_output` received from "rc" in a popup at
+            `point`.
+        """
+        try:
+            symbol_info = json.loads(symbol_info_output)
+        except ValueError:
+            logger.debug("Symbol information is not a valid JSON.")
+            return
+
+        if not isinstance(symbol_info, dict) or not symbol_info:
+            # No symbol at the hovered location
+            return
+
+        try:
+            content = self._format_popup(view.window(), symbol_info)
+        except ValueError:
+            logger.debug("Symbol information has an unexpected location.")
+            return
+
+        view.show_popup(
+            content,
+            flags=sublime.HIDE_ON_MOUSE_MOVE_AWAY,
+            location=point,
+            max_width=self._POPUP_MAX_WIDTH,
+            on_navigate=lambda location: self._navigate(view, location))
+
+    @classmethod
+    def _format_popup(cls, window, symbol_info):
+        """ Return the HTML content of a popup presenting `symbol_info`.
+        """
+        lines = ["<b>{}</b> <i>{}</i>".format(
+            html.escape(symbol_info.get("symbolName", "")),
+            html.escape(symbol_info.get("kind", "")))]
+
+        symbol_type = symbol_info.get("type")
+        if symbol_type:
+            lines.append("<code>{}</code>".format(html.escape(symbol_type)))
+
+        definition_location = cls._get_definition_location(symbol_info)
+        if definition_location:
+            file_name, row, _ = cls._split_location(definition_location)
+            lines.append("Defined at <a href=\"{}\">{}:{}</a>".format(
+                html.escape(definition_location),
+                html.escape(
+                    CursorLocationHelper.to_display_path(window, file_name)),
+                row))
+
+        return "<br>".join(lines)
+
+    @staticmethod
+    def _get_definition_location(symbol_info):
+        """ Return the location ("{file}:{row}:{col}:") the symbol of
+            `symbol_info` is defined (or else declared) at, if known.
+        """
+        if symbol_info.get("definition"):
+            return symbol_info.get("location")
+
+        targets = symbol_info.get("targets") or []
+        for target in targets:
+            if target.get("definition"):
+                return target.get("location")
+        if targets:
+            return targets[0].get("location")
+        return None
+
+    @staticmethod
+    def _split_location(location):
+        """ Split `location` of the format "{file}:{row}:{col}:" to a
+            (file, row, col) tuple.
+        """
+        file_name, row, col = location.rstrip(':').rsplit(':', 2)
+        return file_name, int(row), int(col)
+
+    def _navigate(self, view, location):
+        """ Navigate to `location` of a link within the popup of `view`.
+        """
+        view.hide_popup()
+        try:
+            target = self._split_location(location)
+        except ValueError:
+            logger.debug("Unexpected location in popup: \"%s\"", location)
+            return
+        CursorLocationHelper.set_cursor_location(view, *target)
+
+    @staticmethod
+    def _is_enabled():
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return rtags_settings.get("show_symbol_info_on_hover", True)
+
+    @classmethod
+    def _get_hover_delay(cls):
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return rtags_settings.get("hover_delay_ms", cls._DEFAULT_HOVER_DELAY)
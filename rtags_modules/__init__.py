@@ -3,5 +3,28 @@
 main_logger: provides the root logger of the plugin
 rc_call: provides an easy and generic execution for rc commands
 cursor_manipulations: contains helper methods for cursor manipulations
+progress_indicator: animates a progress message in the status bar
+request_scheduler: limits, supersedes and cancels concurrent rc calls
+result_cache: size bounded LRU caches of rc results by location
+performance_stats: rolling latency statistics of rc calls by command type
+compile_commands_finder: finds compilation databases within project folders
+compile_commands_fingerprint: tells which compilation database entries changed
+symbol_index: sorted index of the symbol names known to rdm
+context_lines: reads lines of source files from open views or mapped files
+rdm_readiness: holds queries back while rdm is indexing
+persistent_cache: SQLite cache of rc results which outlives Sublime's session
 """
-__all__ = ["main_logger", "rc_call", "cursor_manipulations"]
+__all__ = [
+    "main_logger",
+    "rc_call",
+    "cursor_manipulations",
+    "progress_indicator",
+    "request_scheduler",
+    "result_cache",
+    "performance_stats",
+    "compile_commands_finder",
+    "compile_commands_fingerprint",
+    "symbol_index",
+    "context_lines",
+    "rdm_readiness",
+    "persistent_cache"]
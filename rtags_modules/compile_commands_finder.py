@@ -0,0 +1,235 @@
+"""
+Finds compilation databases (compile_commands.json files) within project
+folders.
+"""
+
+import sublime
+
+import concurrent.futures  # Used for walking directories in parallel
+import fnmatch    # Used for matching ignored directory names
+import json       # Used for persisting the index of walked directories
+import os         # Used for walking directories
+import threading  # Used for guarding the index from concurrent lookups
+
+from RTags.rtags_modules.main_logger import logger
+
+
+class CompileCommandsFinder(object):
+    """ Finds compile_commands.json files within project folders, recursively.
+
+    Directories are walked in parallel, and every walked directory is indexed
+    along with its modification time. The index is persisted within Sublime's
+    cache directory, so later lookups (even after a restart) only rescan
+    directories whose entries were created, removed or renamed since.
+    """
+
+    """ Class Constants """
+    FILE_NAME = "compile_commands.json"
+
+    # Default names (or fnmatch patterns) of directories that are not walked
+    _DEFAULT_IGNORE_PATTERNS = [
+        ".git", ".hg", ".svn", "node_modules", "__pycache__", "CMakeFiles",
+        ".cache"]
+
+    # Default depth of subdirectories walked within every project folder
+    _DEFAULT_MAX_DEPTH = 8
+
+    # Amount of directories scanned concurrently
+    _MAX_WORKERS = 8
+
+    # Version of the persisted index format
+    _INDEX_VERSION = 1
+
+    # Indexed directories and databases, by project folder
+    _index = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def find(cls, folders):
+        """ Return paths of all compilation databases within `folders`.
+
+        Note:
+            Blocks until the lookup completes, hence should not be called
+            from Sublime's main thread.
+        """
+        ignore_patterns = cls._get_ignore_patterns()
+        max_depth = cls._get_max_depth()
+
+        with cls._lock:
+            index = cls._load_index()
+            databases = []
+            with concurrent.futures.ThreadPoolExecutor(
+                    cls._MAX_WORKERS) as executor:
+                for folder in folders:
+                    # Index is rebuilt once the walking settings change
+                    folder_index = index.get(folder)
+                    if folder_index is None or (
+                            folder_index["ignore_patterns"],
+                            folder_index["max_depth"]) != (
+                            ignore_patterns, max_depth):
+                        folder_index = {
+                            "ignore_patterns": ignore_patterns,
+                            "max_depth": max_depth,
+                            "directories": {},
+                            "databases": []}
+                        index[folder] = folder_index
+
+                    cls._refresh(executor, folder, folder_index)
+                    databases.extend(folder_index["databases"])
+            cls._save_index(index)
+
+        return databases
+
+    @classmethod
+    def _refresh(cls, executor, folder, folder_index):
+        """ Bring `folder_index` up to date with the contents of `folder`.
+        """
+        directories = folder_index["directories"]
+        databases = set(folder_index["databases"])
+
+        # Only directories whose entries changed since last lookup (or were
+        # never walked) are scanned
+        if directories:
+            indexed_directories = list(directories)
+            changed_directories = []
+            for directory, mtime in zip(
+                    indexed_directories,
+                    executor.map(cls._get_mtime, indexed_directories)):
+                if mtime is None:
+                    del directories[directory]
+                elif mtime != directories[directory]:
+                    changed_directories.append(directory)
+        else:
+            changed_directories = [folder]
+
+        logger.debug("Scanning %s changed directories of \"%s\".",
+            len(changed_directories), folder)
+
+        ignore_patterns = folder_index["ignore_patterns"]
+        max_depth = folder_index["max_depth"]
+        while changed_directories:
+            new_directories = []
+            scan_results = executor.map(
+                lambda directory: cls._scan(directory, ignore_patterns),
+                changed_directories)
+
+            for directory, (mtime, has_database, subdirectories) in zip(
+                    changed_directories, scan_results):
+                database = os.path.join(directory, cls.FILE_NAME)
+                if mtime is None:
+                    directories.pop(directory, None)
+                    databases.discard(database)
+                    continue
+
+                directories[directory] = mtime
+                if has_database:
+                    databases.add(database)
+                else:
+                    databases.discard(database)
+
+                new_directories.extend(
+                    subdirectory for subdirectory in subdirectories
+                    if subdirectory not in directories and
+                    cls._depth(folder, subdirectory) <= max_depth)
+
+            changed_directories = new_directories
+
+        # Databases within directories that no longer exist are gone as well
+        folder_index["databases"] = sorted(
+            database for database in databases
+            if os.path.dirname(database) in directories)
+
+    @classmethod
+    def _scan(cls, directory, ignore_patterns):
+        """ Return the modification time of `directory`, whether it contains
+            a compilation database, and its subdirectories that should be
+            walked.
+        """
+        try:
+            # Modification time is taken first, so a change made while
+            # scanning is noticed by the next lookup
+            mtime = os.stat(directory).st_mtime
+            names = os.listdir(directory)
+        except OSError:
+            return None, False, []
+
+        subdirectories = []
+        for name in names:
+            if any(fnmatch.fnmatch(name, pattern)
+                   for pattern in ignore_patterns):
+                continue
+            path = os.path.join(directory, name)
+            if os.path.isdir(path):
+                subdirectories.append(path)
+
+        return mtime, cls.FILE_NAME in names, subdirectories
+
+    @staticmethod
+    def _get_mtime(directory):
+        try:
+            return os.stat(directory).st_mtime
+        except OSError:
+            return None
+
+    @staticmethod
+    def _depth(folder, directory):
+        """ Return how deep `directory` is within `folder`.
+        """
+        return os.path.relpath(directory, folder).count(os.sep) + 1
+
+    @classmethod
+    def _get_index_path(cls):
+        return os.path.join(
+            sublime.cache_path(), "RTags", "compile_commands_index.json")
+
+    @classmethod
+    def _load_index(cls):
+        """ Return the index, loading it from disk on first use.
+
+        Note:
+            Must be called while holding the lock.
+        """
+        if cls._index is not None:
+            return cls._index
+
+        cls._index = {}
+        try:
+            with open(cls._get_index_path()) as index_file:
+                persisted_index = json.load(index_file)
+            if persisted_index.get("version") == cls._INDEX_VERSION:
+                cls._index = persisted_index["folders"]
+        except (IOError, OSError, ValueError, KeyError):
+            logger.debug("No valid compilation databases index was found.")
+
+        return cls._index
+
+    @classmethod
+    def _save_index(cls, index):
+        """ Persist `index`, so it outlives Sublime's session.
+
+        Note:
+            Must be called while holding the lock.
+        """
+        index_path = cls._get_index_path()
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            with open(index_path + ".tmp", "w") as index_file:
+                json.dump({
+                    "version": cls._INDEX_VERSION,
+                    "folders": index}, index_file)
+            os.replace(index_path + ".tmp", index_path)
+        except (IOError, OSError) as e:
+            logger.debug(
+                "Failed to persist compilation databases index: %s", e)
+
+    @classmethod
+    def _get_ignore_patterns(cls):
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return list(rtags_settings.get(
+            "compile_commands_ignore_patterns", cls._DEFAULT_IGNORE_PATTERNS))
+
+    @classmethod
+    def _get_max_depth(cls):
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return max(0, rtags_settings.get(
+            "compile_commands_max_depth", cls._DEFAULT_MAX_DEPTH))
@@ -0,0 +1,249 @@
+"""
+Fingerprints compilation databases, to tell which of their entries changed
+since they were last loaded into rdm.
+"""
+
+import sublime
+
+import collections  # Used for keeping remembered databases in LRU order
+import hashlib    # Used for hashing databases and their entries
+import json       # Used for parsing databases, and persisting fingerprints
+import os         # Used for resolving source paths of entries
+import shlex      # Used for splitting compile commands of entries
+import threading  # Used for guarding remembered fingerprints
+
+from RTags.rtags_modules.main_logger import logger
+
+
+class CompileCommandsFingerprint(object):
+    """ Content hash of a compile_commands.json file, along with a fingerprint
+    of every entry (source file) in it.
+
+    Fingerprints of the last loaded databases are remembered (and persisted
+    within Sublime's cache directory) per rdm instance they were loaded into,
+    so a later load into the same instance can be compared to them.
+    """
+
+    """ Class Constants """
+    # Maximal amount of databases whose fingerprints are remembered
+    _MAX_REMEMBERED = 8
+
+    # Remembered fingerprints by rdm socket file and database path, in LRU
+    # order
+    _remembered = None
+    _lock = threading.Lock()
+
+    def __init__(self, rdm_socket_file, path, content_hash,
+                 entry_fingerprints=None, content=None):
+        """ Params:
+                rdm_socket_file    - Socket file of the rdm instance the
+                                     database is loaded into
+                path               - Path of the compile_commands.json file
+                content_hash       - Hash of the whole file
+                entry_fingerprints - Dict of entry fingerprint by source file,
+                                     or None to compute it out of `content`
+                content            - Binary content of the file
+        """
+        """ Public members """
+        self.rdm_socket_file = rdm_socket_file
+        self.path = path
+        self.content_hash = content_hash
+
+        """ Private members """
+        self._entry_fingerprints = entry_fingerprints
+        self._content = content
+        # Parsed entries by source file, once parsed
+        self._entries = None
+
+    @classmethod
+    def of_file(cls, rdm_socket_file, path):
+        """ Fingerprint the compile_commands.json file at `path`, to be loaded
+            into the rdm instance listening on `rdm_socket_file`.
+
+        Entries are only parsed once needed, so an unchanged file is told
+        apart by its hash alone.
+
+        Raises:
+            IOError/OSError - The file could not be read
+        """
+        with open(path, "rb") as compile_commands_file:
+            content = compile_commands_file.read()
+
+        return cls(
+            rdm_socket_file, path, hashlib.sha1(content).hexdigest(),
+            content=content)
+
+    @property
+    def entries(self):
+        """ Entries of the database by absolute source file path.
+
+        Raises:
+            ValueError - The file is not a valid compilation database
+        """
+        if self._entries is None:
+            entries = json.loads(self._content.decode('UTF-8'))
+            if not isinstance(entries, list):
+                raise ValueError("A compilation database must be a list.")
+            self._entries = {
+                os.path.normpath(os.path.join(
+                    entry["directory"], entry["file"])): entry
+                for entry in entries}
+        return self._entries
+
+    @property
+    def entry_fingerprints(self):
+        """ Fingerprints of the database entries, by source file path.
+        """
+        if self._entry_fingerprints is None:
+            self._entry_fingerprints = {
+                source: self._fingerprint_entry(entry)
+                for source, entry in self.entries.items()}
+        return self._entry_fingerprints
+
+    def diff(self, other):
+        """ Return the sources whose entries were added or changed since
+            `other`, and the sources whose entries were removed since.
+        """
+        fingerprints = self.entry_fingerprints
+        other_fingerprints = other.entry_fingerprints
+        changed_sources = sorted(
+            source for source, fingerprint in fingerprints.items()
+            if other_fingerprints.get(source) != fingerprint)
+        removed_sources = sorted(
+            source for source in other_fingerprints
+            if source not in fingerprints)
+        return changed_sources, removed_sources
+
+    def compile_arguments(self, source):
+        """ Return the compiler invocation of `source` as a list of arguments.
+        """
+        entry = self.entries[source]
+        if "arguments" in entry:
+            return list(entry["arguments"])
+        return shlex.split(entry["command"])
+
+    @staticmethod
+    def _fingerprint_entry(entry):
+        """ Return a short hash of everything affecting how `entry` is indexed.
+        """
+        relevant = [
+            entry.get("directory"), entry.get("arguments"),
+            entry.get("command")]
+        return hashlib.sha1(
+            json.dumps(relevant).encode('UTF-8')).hexdigest()[:16]
+
+    @classmethod
+    def last_loaded(cls, rdm_socket_file, path):
+        """ Return the fingerprint remembered for the database at `path`, or
+            None in case it was not loaded into the rdm instance listening on
+            `rdm_socket_file` before.
+        """
+        with cls._lock:
+            remembered = cls._load_remembered().get(
+                cls._key(rdm_socket_file, path))
+            if remembered is None:
+                return None
+            return cls._from_remembered(remembered)
+
+    @classmethod
+    def last_loaded_within(cls, rdm_socket_file, folder):
+        """ Return the fingerprint of the database within `folder` that was
+            loaded last into the rdm instance listening on `rdm_socket_file`,
+            or None in case no such database was loaded into it before.
+        """
+        folder_prefix = os.path.join(folder, "")
+        with cls._lock:
+            for remembered in reversed(
+                    list(cls._load_remembered().values())):
+                if (remembered["rdm_socket_file"] == rdm_socket_file and
+                        remembered["path"].startswith(folder_prefix)):
+                    return cls._from_remembered(remembered)
+            return None
+
+    @classmethod
+    def remember(cls, fingerprint):
+        """ Remember `fingerprint` as the last loaded one of its database.
+        """
+        entry_fingerprints = fingerprint.entry_fingerprints
+        with cls._lock:
+            remembered = cls._load_remembered()
+            key = cls._key(fingerprint.rdm_socket_file, fingerprint.path)
+            remembered.pop(key, None)
+            remembered[key] = {
+                "rdm_socket_file": fingerprint.rdm_socket_file,
+                "path": fingerprint.path,
+                "hash": fingerprint.content_hash,
+                "entries": entry_fingerprints}
+            while len(remembered) > cls._MAX_REMEMBERED:
+                remembered.popitem(last=False)
+            cls._save_remembered(remembered)
+
+    @classmethod
+    def forget(cls, rdm_socket_file, path):
+        """ Forget the fingerprint of the database at `path` loaded into the
+            rdm instance listening on `rdm_socket_file`, so it is fully
+            loaded next time.
+        """
+        with cls._lock:
+            remembered = cls._load_remembered()
+            if remembered.pop(
+                    cls._key(rdm_socket_file, path), None) is not None:
+                cls._save_remembered(remembered)
+
+    @staticmethod
+    def _key(rdm_socket_file, path):
+        """ Return the key a database at `path` loaded into the rdm instance
+            listening on `rdm_socket_file` is remembered by.
+        """
+        # Persisted as JSON, whose keys must be strings
+        return json.dumps([rdm_socket_file, path])
+
+    @classmethod
+    def _from_remembered(cls, remembered):
+        return cls(
+            remembered["rdm_socket_file"], remembered["path"],
+            remembered["hash"], remembered["entries"])
+
+    @classmethod
+    def _get_persistence_path(cls):
+        return os.path.join(
+            sublime.cache_path(), "RTags",
+            "compile_commands_fingerprints_v2.json")
+
+    @classmethod
+    def _load_remembered(cls):
+        """ Return the remembered fingerprints, loading them on first use.
+
+        Note:
+            Must be called while holding the lock.
+        """
+        if cls._remembered is not None:
+            return cls._remembered
+
+        cls._remembered = collections.OrderedDict()
+        try:
+            with open(cls._get_persistence_path()) as persistence_file:
+                cls._remembered.update(json.load(
+                    persistence_file,
+                    object_pairs_hook=collections.OrderedDict))
+        except (IOError, OSError, ValueError):
+            logger.debug("No remembered compilation databases were found.")
+
+        return cls._remembered
+
+    @classmethod
+    def _save_remembered(cls, remembered):
+        """ Persist `remembered`, so it outlives Sublime's session.
+
+        Note:
+            Must be called while holding the lock.
+        """
+        persistence_path = cls._get_persistence_path()
+        try:
+            os.makedirs(os.path.dirname(persistence_path), exist_ok=True)
+            with open(persistence_path + ".tmp", "w") as persistence_file:
+                json.dump(remembered, persistence_file)
+            os.replace(persistence_path + ".tmp", persistence_path)
+        except (IOError, OSError) as e:
+            logger.debug(
+                "Failed to persist compilation database fingerprints: %s", e)
@@ -0,0 +1,134 @@
+"""
+Provides the text of source lines by their row numbers, for presenting the
+context of locations without receiving it from rdm.
+"""
+
+import collections  # Used for keeping mapped files in LRU order
+import mmap         # Used for reading files without copying them as a whole
+import os           # Used for telling the size of files
+
+from RTags.rtags_modules.cursor_manipulations import CursorLocationHelper
+from RTags.rtags_modules.main_logger import logger
+
+
+class ContextLines(object):
+    """ Reads lines of source files by their row numbers.
+
+    Lines of files that are open in the window are read from their views, so
+    they reflect unsaved modifications. Lines of other files are read from
+    memory mapped files, through an index of line offsets that is built once
+    per file (as far as needed), and shared by all lines read from it.
+
+    Note:
+        Not thread safe. Files are mapped until `close()` is called.
+    """
+
+    """ Class Constants """
+    # Maximal amount of files mapped at once
+    _MAX_MAPPED_FILES = 64
+
+    def __init__(self, window):
+        """ Params:
+                window - sublime.Window whose open views are preferred over
+                         the files on disk
+        """
+        """ Private members """
+        self._window = window
+        # Open view (or None) by file name
+        self._views = {}
+        # Mapped files by file name, in LRU order
+        self._mapped_files = collections.OrderedDict()
+
+    def get(self, file_name, row):
+        """ Return the text of line `row` (nonzero based) of `file_name`, or
+            an empty string in case it could not be read.
+        """
+        view = self._views.get(file_name, False)
+        if view is False:
+            view = self._window.find_open_file(
+                CursorLocationHelper.to_project_path(self._window, file_name))
+            self._views[file_name] = view
+        if view is not None and view.is_valid():
+            # Views clamp rows past their end to their last line
+            last_row, _ = view.rowcol(view.size())
+            if not 0 < row <= last_row + 1:
+                return ''
+            return view.substr(view.line(view.text_point(row - 1, 0)))
+
+        mapped_file = self._mapped_files.get(file_name)
+        if mapped_file is None:
+            mapped_file = self._map(file_name)
+        else:
+            self._mapped_files.move_to_end(file_name)
+        return mapped_file.line(row)
+
+    def close(self):
+        """ Unmap all mapped files.
+        """
+        for mapped_file in self._mapped_files.values():
+            mapped_file.close()
+        self._mapped_files.clear()
+        self._views.clear()
+
+    def _map(self, file_name):
+        """ Map `file_name`, unmapping the least recently used file in case
+            too many files are mapped.
+        """
+        try:
+            mapped_file = _MappedFile(file_name)
+        except (IOError, OSError, ValueError) as e:
+            logger.debug("Failed to map \"%s\": %s", file_name, e)
+            # Lines of the file are considered empty
+            mapped_file = _MappedFile()
+
+        self._mapped_files[file_name] = mapped_file
+        while len(self._mapped_files) > self._MAX_MAPPED_FILES:
+            _, evicted_file = self._mapped_files.popitem(last=False)
+            evicted_file.close()
+        return mapped_file
+
+
+class _MappedFile(object):
+    """ Memory mapped file, along with the offsets of its lines.
+    """
+
+    def __init__(self, file_name=None):
+        """ Map `file_name`, or nothing (an empty file) in case it is None.
+
+        Raises:
+            IOError/OSError - The file could not be mapped
+        """
+        # Offset of every line that was indexed so far (by zero based row)
+        self._line_offsets = [0]
+        self._data = b''
+
+        if file_name is None:
+            return
+
+        with open(file_name, 'rb') as mapped_file:
+            # Empty files can't be mapped
+            if os.fstat(mapped_file.fileno()).st_size:
+                self._data = mmap.mmap(
+                    mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def line(self, row):
+        """ Return the text of line `row` (nonzero based), or an empty string
+            in case the file is shorter.
+        """
+        line_offsets = self._line_offsets
+        while len(line_offsets) < row:
+            end = self._data.find(b'\n', line_offsets[-1])
+            if end == -1:
+                return ''
+            line_offsets.append(end + 1)
+
+        start = line_offsets[row - 1]
+        end = self._data.find(b'\n', start)
+        if end == -1:
+            end = len(self._data)
+        return self._data[start:end].decode('UTF-8', 'replace').rstrip('\r')
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
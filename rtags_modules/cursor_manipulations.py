@@ -10,7 +10,9 @@ What is a cursor?
 import sublime
 
 from Default import history_list  # Manages Sublime's cursor location history
+import collections  # For keeping resolved file names in LRU order
 import os.path  # For extracting symbolic links when comparing paths
+import threading  # For guarding the project roots index
 
 from RTags.rtags_modules.main_logger import logger
 
@@ -48,8 +50,35 @@ class CursorLocationHelper(object):
             return ""
 
         # Extract cursor's point from the cursor's region
-        point = region.a
+        return CursorLocationHelper.extract_location(
+            view, region.a, avoid_word_end)
 
+    @staticmethod
+    def extract_locations(view, avoid_word_end=False):
+        """ Return the absolute locations ({file}:{row}:{col}) of all cursors
+            within `view`, without duplicates and in the order of the
+            cursors.
+
+            Selections (non-empty regions) are skipped. `avoid_word_end` is
+            treated as by `extract_single_location()`.
+        """
+        locations = []
+        for region in view.sel():
+            if CursorLocationHelper._is_selection(region):
+                continue
+            location = CursorLocationHelper.extract_location(
+                view, region.a, avoid_word_end)
+            if location not in locations:
+                locations.append(location)
+        return locations
+
+    @staticmethod
+    def extract_location(view, point, avoid_word_end=False):
+        """ Return the absolute location ({file}:{row}:{col}) of `point`
+            within `view`.
+
+            `avoid_word_end` is treated as by `extract_single_location()`.
+        """
         if avoid_word_end:
             if CursorLocationHelper._is_end_of_word(view, point):
                 # Reassign point to the beggining of the word
@@ -84,26 +113,69 @@ class CursorLocationHelper(object):
         """
         logger.debug("About to navigate to a new location.")
 
+        window = source_view.window()
+        source_file_name = source_view.file_name()
+
+        # Fix project/folder path prefix within absolute path, in case the
+        # directed file is actually a part of it.
+        project_dest_file_name = CursorLocationHelper.to_project_path(
+            window, dest_file_name)
+
         # New cursor location is in the source view
-        if os.path.realpath(source_view.file_name()) == dest_file_name:
+        if source_file_name and (
+                source_file_name == project_dest_file_name or
+                _ProjectRoots.real_file_name(
+                    window, source_file_name) == dest_file_name):
             CursorLocationHelper._set_cursor_location_same_view(
                 source_view, dest_row, dest_col)
 
         # New cursor location is in a different view
         else:
-            try:
-                # Fix project/folder path prefix within absolute path, in case
-                # the directed file is actually a part of it.
-                dest_file_name = (CursorLocationHelper._to_project_path(
-                    dest_file_name))
-                logger.debug("New location is within the project path.")
-            except CursorLocationHelper.FileOutsideProjectPathError:
-                # No modification should be done in this case
-                logger.debug("New location is outside the project path.")
-                pass
-
             CursorLocationHelper._set_cursor_location_different_view(
-                source_view, dest_file_name, dest_row, dest_col)
+                source_view, project_dest_file_name, dest_row, dest_col)
+
+    @staticmethod
+    def to_display_path(window, file_name):
+        """ Return `file_name` relative to the folder of `window` containing
+            it, or as is in case it is outside of the project/folder.
+        """
+        root = _ProjectRoots.find(window, file_name)
+        if root is None:
+            return file_name
+        return os.path.relpath(file_name, root.prefix)
+
+    @staticmethod
+    def to_project_path(window, file_name):
+        """ Return `file_name` prefixed with the folder of `window` containing
+            it, as the folder was opened, or as is in case it is outside of
+            the project/folder.
+
+        An actual modification only takes place if the folder's path contains
+        symbolic links, and `file_name` has them extracted (as rc reports
+        locations).
+
+        Motivation:
+            SublimeText treats files opened via paths containing symbolic
+            links as different from one another, and I wanted to avoid it.
+            Refer to https://github.com/SublimeTextIssues/Core/issues/611 for
+            more information.
+
+        Credits:
+            Many thanks to `Path Tools` plugin for the main logic
+        """
+        root = _ProjectRoots.find(window, file_name)
+        if root is None:
+            return file_name
+        return root.folder + file_name[len(root.prefix):]
+
+    @staticmethod
+    def find_project_folder(window, file_name):
+        """ Return the folder of `window` containing `file_name` (either via
+            symbolic links or not), or None in case it is outside of the
+            project/folder.
+        """
+        root = _ProjectRoots.find(window, file_name)
+        return root.folder if root is not None else None
 
     @staticmethod
     def _is_single_cursor(view):
@@ -130,44 +202,6 @@ class CursorLocationHelper(object):
         """
         return "{}:{}:{}".format(file, row, col)
 
-    @staticmethod
-    def _to_project_path(absolute_path):
-        """ Modify `absolute_path` such that it will be prefixed correctly with
-            the current project/folder root directory, in case it is inside it.
-
-            An actual modification only takes place if current project/folder
-            root directory path contains symbolic links. Exception is raised in
-            case `absolute_path` directs to a file outside of the
-            project/folder.
-
-            Note:
-                This method is capable of handling projects with multiple root
-                directories, and also directories that were opened directly
-                without regard to Sublime's Project feature.
-
-            Motivation:
-                SublimeText treats files opened via paths containing symbolic
-                links as different from one another, and I wanted to avoid it.
-                Refer to https://github.com/SublimeTextIssues/Core/issues/611
-                for more information.
-
-            Credits:
-                Many thanks to `Path Tools` plugin for the main logic
-        """
-        project_root_directories = (
-            directory for directory in sublime.active_window().folders())
-
-        for project_root_dir in project_root_directories:
-            # Root directories might contain symlinks that must be extracted
-            project_root_dir_extracted = os.path.realpath(project_root_dir)
-            if absolute_path.startswith(project_root_dir_extracted):
-                return project_root_dir + absolute_path[
-                    len(project_root_dir_extracted):]
-
-        raise CursorLocationHelper.FileOutsideProjectPathError(
-            "The given path does not point to a file within the current"
-            "project/folder: \"{}\"".format(absolute_path))
-
     @staticmethod
     def _set_cursor_location_same_view(source_view, dest_row, dest_col):
         """ Set `source_view`'s cursor/s to a new location at the same view.
@@ -204,7 +238,96 @@ class CursorLocationHelper(object):
             target_location,
             sublime.ENCODED_POSITION)
 
-    class FileOutsideProjectPathError(ValueError):
-        """ Value does not point to a file within the current project/folder.
+
+class _ProjectRoots(object):
+    """ Index of the root folders of every window, for telling the folder
+    containing a file without accessing the file system.
+
+    - Every folder is indexed by its path as opened, and by its path with
+      symbolic links extracted (as rc reports locations). The folder
+      containing a file is found by looking its directories up in the index,
+      from the innermost one, so the longest matching root is found
+      regardless of the amount of folders.
+    - `os.path.realpath()` is called once per folder, when the index of the
+      window is built. Indexes are rebuilt once the folders of their window
+      change, along with the file names resolved on their behalf.
+    """
+
+    """ Class Constants """
+    # Maximal amount of resolved file names kept per window
+    _MAX_REAL_FILE_NAMES = 1024
+
+    # Root folder, and the path prefix it was found by
+    Root = collections.namedtuple("Root", ("folder", "prefix"))
+
+    # (folders, roots by path prefix, resolved file names in LRU order), by
+    # window id
+    _indexes = {}
+
+    _lock = threading.Lock()
+
+    @classmethod
+    def find(cls, window, file_name):
+        """ Return the Root of `window` containing `file_name`, or None in
+            case it is outside of the project/folder.
+        """
+        if window is None or not file_name:
+            return None
+
+        _, roots, _ = cls._get_index(window)
+        directory = os.path.dirname(file_name)
+        while True:
+            root = roots.get(directory)
+            if root is not None:
+                return root
+            parent_directory = os.path.dirname(directory)
+            if parent_directory == directory:
+                return None
+            directory = parent_directory
+
+    @classmethod
+    def real_file_name(cls, window, file_name):
+        """ Return `file_name` with symbolic links extracted, as resolved
+            once per file on behalf of `window`.
+        """
+        if window is None:
+            return os.path.realpath(file_name)
+
+        _, _, real_file_names = cls._get_index(window)
+        with cls._lock:
+            real_file_name = real_file_names.get(file_name)
+            if real_file_name is not None:
+                real_file_names.move_to_end(file_name)
+                return real_file_name
+
+        real_file_name = os.path.realpath(file_name)
+        with cls._lock:
+            real_file_names[file_name] = real_file_name
+            while len(real_file_names) > cls._MAX_REAL_FILE_NAMES:
+                real_file_names.popitem(last=False)
+        return real_file_name
+
+    @classmethod
+    def _get_index(cls, window):
+        """ Return the index of `window`, building it in case its folders
+            changed since it was last built.
         """
-        pass
+        folders = tuple(window.folders())
+        index = cls._indexes.get(window.id())
+        if index is not None and index[0] == folders:
+            return index
+
+        logger.debug(
+            "Indexing the project folders of window %s.", window.id())
+        roots = {}
+        # Earlier folders take precedence over later ones of the same path
+        for folder in reversed(folders):
+            folder = folder.rstrip(os.sep) or os.sep
+            roots[os.path.realpath(folder)] = cls.Root(
+                folder, os.path.realpath(folder))
+            roots[folder] = cls.Root(folder, folder)
+
+        index = (folders, roots, collections.OrderedDict())
+        with cls._lock:
+            cls._indexes[window.id()] = index
+        return index
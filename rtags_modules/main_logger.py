@@ -1,34 +1,156 @@
 import sublime  # To obtain plugin settings
 import logging
+import logging.handlers  # To log asynchronously, and rotate log files
+import os.path  # To expand the path of the log file
+import queue  # To pass log records to the logging thread
 
 
 # Define the plugin logger, to be initialized on `plugin_loaded()`
 logger = logging.getLogger(__name__)
 
+# Default maximal amount of bytes of a single logged message
+DEFAULT_PAYLOAD_BUDGET = 4096
+
+# Defaults for rotating the log file
+DEFAULT_LOG_FILE_MAX_BYTES = 1 << 20
+DEFAULT_LOG_FILE_BACKUP_COUNT = 3
+
+# Thread writing queued log records to the handlers, once initialized
+_listener = None
+
+# Settings the logger was initialized with
+_initialized_settings = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """ Queues log records as they are, so they are only formatted by the
+    logging thread (and not at all in case no handler accepts them).
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    """ Passes every queued log record to the handlers whose level accepts it.
+    """
+
+    def handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class _TruncatingFormatter(logging.Formatter):
+    """ Formats log records, truncating their messages to a budget of bytes.
+
+    Arguments of a record are truncated before they are formatted into its
+    message, so huge payloads (e.g. rc output) are never copied as a whole.
+    """
+
+    def __init__(self, fmt, payload_budget):
+        super().__init__(fmt)
+        self._payload_budget = payload_budget
+
+    def formatMessage(self, record):
+        record.message = self._truncate(record.message)
+        return super().formatMessage(record)
+
+    def format(self, record):
+        if isinstance(record.args, tuple):
+            record.args = tuple(
+                self._truncate(arg) if isinstance(arg, str) else arg
+                for arg in record.args)
+        return super().format(record)
+
+    def _truncate(self, text):
+        if len(text) <= self._payload_budget:
+            # Text can't exceed the budget, since every character takes at
+            # least a byte
+            return text
+
+        encoded_text = text.encode('UTF-8')
+        if len(encoded_text) <= self._payload_budget:
+            return text
+
+        return "{}... [{} more bytes]".format(
+            encoded_text[:self._payload_budget].decode('UTF-8', 'ignore'),
+            len(encoded_text) - self._payload_budget)
+
 
 def InitializeMainLogger():
     """ Apply required settings to the main RTags logger.
+
+    Log records are queued by the calling threads, and written to the console
+    (and the log file, if any) by a dedicated thread, so logging never blocks
+    the caller.
     """
+    global _listener, _initialized_settings
+
+    # Stop logging of previous initialization, if any (relevant when
+    # reloading)
+    ShutdownMainLogger()
+
     # Remove all previously added handlers, if any (relevant when reloading)
     logger.handlers = []
 
-    # Must be set to lowest level to get total freedom in handlers
-    logger.setLevel(logging.DEBUG)
-
     # Disable log duplications when reloading
     logger.propagate = False
 
+    _initialized_settings = _GetLoggingSettings()
+    logging_level, payload_budget, log_file, max_bytes, backup_count = (
+        _initialized_settings)
+
+    # Create formatter, truncating large payloads
+    formatter = _TruncatingFormatter(
+        '[RTags / %(levelname)s] %(message)s', payload_budget)
+
     # Create console handler with the requested logging level
     console_handler = logging.StreamHandler()
-    logging_level = GetRequestedLoggingLevel()
     console_handler.setLevel(logging_level)
-
-    # Create formatter and add it to the handler
-    formatter = logging.Formatter('[RTags / %(levelname)s] %(message)s')
     console_handler.setFormatter(formatter)
+    handlers = [console_handler]
+
+    # Create rotating file handler, logging everything
+    log_file_error = None
+    if log_file:
+        try:
+            file_handler = logging.handlers.RotatingFileHandler(
+                os.path.expanduser(log_file),
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                encoding='UTF-8')
+        except (IOError, OSError) as e:
+            log_file_error = e
+        else:
+            file_handler.setLevel(logging.DEBUG)
+            file_handler.setFormatter(_TruncatingFormatter(
+                '%(asctime)s [%(threadName)s / %(levelname)s] %(message)s',
+                payload_budget))
+            handlers.append(file_handler)
 
-    # Add the handler to logger
-    logger.addHandler(console_handler)
+    # Records nobody would write are dropped as soon as possible
+    logger.setLevel(min(handler.level for handler in handlers))
+
+    log_queue = queue.Queue()
+    logger.addHandler(_QueueHandler(log_queue))
+    _listener = _QueueListener(log_queue, *handlers)
+    _listener.start()
+
+    if log_file_error:
+        logger.warning(
+            "Failed to open log file \"%s\": %s", log_file, log_file_error)
+
+
+def ShutdownMainLogger():
+    """ Write all queued log records, and stop the logging thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
 
 
 def GetRequestedLoggingLevel():
@@ -39,8 +161,22 @@ def GetRequestedLoggingLevel():
     return logging.DEBUG if verbose_logging else logging.WARNING
 
 
+def _GetLoggingSettings():
+    """ Returns the plugin settings affecting the logger.
+    """
+    rtags_settings = sublime.load_settings("RTags.sublime-settings")
+    return (
+        GetRequestedLoggingLevel(),
+        max(1, rtags_settings.get(
+            "log_payload_budget_bytes", DEFAULT_PAYLOAD_BUDGET)),
+        rtags_settings.get("log_file"),
+        rtags_settings.get("log_file_max_bytes", DEFAULT_LOG_FILE_MAX_BYTES),
+        rtags_settings.get(
+            "log_file_backup_count", DEFAULT_LOG_FILE_BACKUP_COUNT))
+
+
 def ReinitializeMainLogger():
     """ Reinitializes the plugin's logger in case the settings have changed.
     """
-    if logger.handlers[0].level != GetRequestedLoggingLevel():
+    if _GetLoggingSettings() != _initialized_settings:
         InitializeMainLogger()
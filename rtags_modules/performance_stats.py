@@ -0,0 +1,178 @@
+"""
+Collects latency statistics of rc calls, to tell whether rdm or the plugin is
+the bottleneck.
+"""
+
+import collections  # Used for keeping rolling windows of samples
+import math         # Used for computing percentiles
+import threading    # Used for guarding the statistics from concurrent access
+import time         # Used for timing phases
+
+
+class PhaseTimings(object):
+    """ Accumulates the durations of the phases of a single request, to be
+    recorded at once when the request completes.
+    """
+
+    def __init__(self):
+        # Accumulated seconds by phase name, in order of first appearance
+        self._durations = collections.OrderedDict()
+
+    def add(self, phase, seconds):
+        """ Account `seconds` more to `phase`.
+        """
+        self._durations[phase] = self._durations.get(phase, 0.0) + seconds
+
+    def measure(self, phase):
+        """ Return a context manager accounting the time spent within it to
+            `phase`.
+        """
+        return _PhaseMeasurement(self, phase)
+
+    def merge(self, timings):
+        """ Account all phases accumulated by `timings` as well.
+        """
+        for phase, seconds in timings._durations.items():
+            self.add(phase, seconds)
+
+    def commit(self, command_type):
+        """ Record all accumulated phases as samples of `command_type`.
+        """
+        for phase, seconds in self._durations.items():
+            PerformanceStats.record(command_type, phase, seconds)
+        self._durations.clear()
+
+
+class _PhaseMeasurement(object):
+    def __init__(self, timings, phase):
+        self._timings = timings
+        self._phase = phase
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._timings.add(self._phase, time.perf_counter() - self._start)
+
+
+class PerformanceStats(object):
+    """ In-memory statistics of rc calls, by command type (the main rc option
+    of the call, e.g. "--references").
+
+    Durations are kept per command type and phase, as a rolling window of the
+    most recent samples, out of which percentiles are computed. Phases are:
+
+    - queue: waiting for rdm to be available for another call
+    - spawn: spawning the rc process
+    - response: waiting for rdm to respond
+    - decode: decoding the received output
+    - parse: parsing the output into results
+    - render: presenting the results
+    - total: the whole rc call, from queue to decode
+    """
+
+    """ Class Constants """
+    PHASES = ("queue", "spawn", "response", "decode", "parse", "render",
+              "total")
+
+    # Amount of recent samples kept per command type and phase
+    _WINDOW_SIZE = 1000
+
+    # Percentiles presented in the report
+    _PERCENTILES = (50, 95, 99)
+
+    # Durations in seconds, by (command type, phase)
+    _samples = {}
+
+    # Amounts of timed out calls, by command type
+    _timeouts = collections.Counter()
+
+    # Amounts of rc exit codes, by command type
+    _exit_codes = collections.defaultdict(collections.Counter)
+
+    _lock = threading.Lock()
+
+    @classmethod
+    def record(cls, command_type, phase, seconds):
+        """ Record a sample of `seconds` spent in `phase` of `command_type`.
+        """
+        with cls._lock:
+            samples = cls._samples.get((command_type, phase))
+            if samples is None:
+                samples = collections.deque(maxlen=cls._WINDOW_SIZE)
+                cls._samples[(command_type, phase)] = samples
+            samples.append(seconds)
+
+    @classmethod
+    def record_exit_code(cls, command_type, exit_code):
+        with cls._lock:
+            cls._exit_codes[command_type][exit_code] += 1
+
+    @classmethod
+    def record_timeout(cls, command_type):
+        with cls._lock:
+            cls._timeouts[command_type] += 1
+
+    @classmethod
+    def clear(cls):
+        """ Forget all collected statistics.
+        """
+        with cls._lock:
+            cls._samples.clear()
+            cls._timeouts.clear()
+            cls._exit_codes.clear()
+
+    @classmethod
+    def format_report(cls):
+        """ Return a human readable report of the collected statistics.
+        """
+        with cls._lock:
+            samples = {
+                key: sorted(values) for key, values in cls._samples.items()}
+            timeouts = dict(cls._timeouts)
+            exit_codes = {
+                command_type: dict(counter)
+                for command_type, counter in cls._exit_codes.items()}
+
+        command_types = sorted(
+            set(command_type for command_type, _ in samples) |
+            set(timeouts) | set(exit_codes))
+        if not command_types:
+            return "No rc calls were made yet.\n"
+
+        lines = [
+            "Latencies of the last {} calls per command type, "
+            "in milliseconds.".format(cls._WINDOW_SIZE),
+            ""]
+        for command_type in command_types:
+            lines.append("{}".format(command_type))
+            lines.append("    Timeouts: {}".format(
+                timeouts.get(command_type, 0)))
+            lines.append("    Exit codes: {}".format(", ".join(
+                "{} (x{})".format(exit_code, count)
+                for exit_code, count in sorted(
+                    exit_codes.get(command_type, {}).items())) or "-"))
+
+            lines.append("    {:<10}{:>8}{}".format("phase", "count", "".join(
+                "{:>10}".format("p{}".format(percentile))
+                for percentile in cls._PERCENTILES)))
+            for phase in cls.PHASES:
+                phase_samples = samples.get((command_type, phase))
+                if not phase_samples:
+                    continue
+                lines.append("    {:<10}{:>8}{}".format(
+                    phase, len(phase_samples), "".join(
+                        "{:>10.1f}".format(1000 * cls._percentile(
+                            phase_samples, percentile))
+                        for percentile in cls._PERCENTILES)))
+            lines.append("")
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def _percentile(sorted_samples, percentile):
+        """ Return the `percentile` of `sorted_samples` (nearest rank).
+        """
+        rank = int(math.ceil(percentile / 100.0 * len(sorted_samples)))
+        return sorted_samples[max(rank, 1) - 1]
@@ -0,0 +1,342 @@
+"""
+Provides a size bounded cache of rc results which outlives Sublime's session.
+"""
+
+import sublime
+
+import json       # Used for serializing related files of entries
+import os         # Used for telling the modification times of files
+import threading  # Used for guarding the database connection
+import time       # Used for telling which entries were least recently used
+import zlib       # Used for compressing cached values
+
+try:
+    import sqlite3  # Not bundled with the Python of every Sublime build
+except ImportError:
+    sqlite3 = None
+
+from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.compile_commands_fingerprint import (
+    CompileCommandsFingerprint)
+from RTags.rtags_modules.rc_call import RCCall
+from RTags.rtags_modules.rdm_readiness import RdmReadiness
+from RTags.rtags_modules.cursor_manipulations import CursorLocationHelper
+
+
+class PersistentCache(object):
+    """ SQLite database of rc results, by the rdm instance (its socket file)
+    they were answered by, the compilation database of the project they were
+    queried in, kind (e.g. a command name) and location.
+
+    - Every entry records the hash of that compilation database as it was
+      loaded into that rdm instance, and the modification times of the files
+      it was derived from. It is valid as long as neither changed, which is
+      verified (by a `stat()` per file) whenever it is read.
+    - Entries are only read while rdm is indexing, since modifications of
+      files an entry was not derived from (e.g. a new reference) go
+      unnoticed, while rdm answers up to date results once it is ready.
+      Readers should still query rdm, and replace what they read with its
+      answer.
+    - Values are compressed, and the least recently used entries are evicted
+      once the database outgrows "persistent_cache_max_mb".
+    - Only saved files are looked up, since cached results reflect files on
+      disk.
+
+    Note:
+        Entries are read and written on Sublime's async thread, and callbacks
+        are called on the main thread.
+    """
+
+    """ Class Constants """
+    # Default maximal size of all cached values, in megabytes
+    _DEFAULT_MAX_MB = 64
+
+    # Fraction of the maximal size the cache is shrunk to once it outgrows it
+    _EVICTION_RATIO = 0.9
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results_v3 (
+            rdm_socket_file TEXT NOT NULL,
+            compile_commands_path TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            location TEXT NOT NULL,
+            compile_commands_hash TEXT NOT NULL,
+            related_files TEXT NOT NULL,
+            value BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            accessed REAL NOT NULL,
+            PRIMARY KEY (
+                rdm_socket_file, compile_commands_path, kind, location))"""
+
+    # Tables of former schemas, dropped once the database is opened
+    _OBSOLETE_TABLES = ("results_v1", "results_v2")
+
+    # Connection to the database, once opened, or False in case it failed
+    _connection = None
+
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_async(cls, kind, location, view, on_done):
+        """ Look up the value cached for `location` of `view` by `kind`, and
+            pass it (or None in case of a miss) to `on_done` on the main
+            thread.
+
+        Nothing is looked up (as if missed) unless the rdm instance serving
+        `view` is indexing.
+        """
+        compile_commands = (
+            cls._get_compile_commands(view) if cls.is_applicable(view)
+            else None)
+        if compile_commands is None or not RdmReadiness.is_indexing(
+                compile_commands.rdm_socket_file):
+            on_done(None)
+            return
+
+        def _get():
+            value = cls._get(compile_commands, kind, location)
+            sublime.set_timeout(lambda: on_done(value), 0)
+        sublime.set_timeout_async(_get, 0)
+
+    @classmethod
+    def put_async(cls, kind, location, view, value, related_files):
+        """ Cache `value` for `location` of `view` by `kind`, as long as
+            `related_files` are not modified.
+        """
+        if not cls.is_applicable(view):
+            return
+
+        compile_commands = cls._get_compile_commands(view)
+        related_files = set(related_files)
+        related_files.add(view.file_name())
+        sublime.set_timeout_async(
+            lambda: cls._put(
+                compile_commands, kind, location, value, related_files),
+            0)
+
+    @classmethod
+    def is_applicable(cls, view):
+        """ Whether results of `view` can be cached persistently.
+        """
+        if sqlite3 is None or cls._connection is False:
+            return False
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return bool(
+            rtags_settings.get("persistent_cache", True) and
+            view.file_name() is not None and
+            not view.is_dirty() and
+            cls._get_compile_commands(view) is not None)
+
+    @classmethod
+    def _get(cls, compile_commands, kind, location):
+        key = (
+            compile_commands.rdm_socket_file, compile_commands.path, kind,
+            location)
+        with cls._lock:
+            row = cls._execute(
+                "SELECT compile_commands_hash, related_files, value "
+                "FROM results_v3 WHERE rdm_socket_file = ? AND "
+                "compile_commands_path = ? AND kind = ? AND location = ?",
+                key).fetchone()
+            if row is None:
+                return None
+
+            related_files = json.loads(row[1])
+            if (row[0] != compile_commands.content_hash or
+                    related_files != cls._stat(related_files)):
+                logger.debug(
+                    "Dropping outdated persistent %s entry of \"%s\".",
+                    kind, location)
+                cls._execute(
+                    "DELETE FROM results_v3 WHERE rdm_socket_file = ? AND "
+                    "compile_commands_path = ? AND kind = ? AND "
+                    "location = ?", key)
+                return None
+
+            cls._execute(
+                "UPDATE results_v3 SET accessed = ? WHERE "
+                "rdm_socket_file = ? AND compile_commands_path = ? AND "
+                "kind = ? AND location = ?",
+                (time.time(),) + key)
+
+        logger.debug("Found persistent %s entry of \"%s\".", kind, location)
+        return zlib.decompress(row[2]).decode('UTF-8')
+
+    @classmethod
+    def _put(cls, compile_commands, kind, location, value, related_files):
+        related_files = cls._stat(
+            {file_name: None for file_name in related_files})
+        if None in related_files.values():
+            # Some file no longer exists, so the value is already outdated
+            return
+
+        compressed_value = zlib.compress(value.encode('UTF-8'))
+        max_size = cls._get_max_size()
+        if len(compressed_value) > max_size * (1 - cls._EVICTION_RATIO):
+            logger.debug(
+                "Not persisting a %s bytes %s entry.",
+                len(compressed_value), kind)
+            return
+
+        with cls._lock:
+            cls._execute(
+                "INSERT OR REPLACE INTO results_v3 VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (compile_commands.rdm_socket_file, compile_commands.path,
+                 kind, location, compile_commands.content_hash,
+                 json.dumps(related_files, sort_keys=True), compressed_value,
+                 len(compressed_value), time.time()))
+            cls._evict(max_size)
+
+    @classmethod
+    def _evict(cls, max_size):
+        """ Evict the least recently used entries, in case the cache outgrew
+            `max_size`.
+
+        Note:
+            Must be called while holding the lock.
+        """
+        row = cls._execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results_v3").fetchone()
+        if row is None or row[0] <= max_size:
+            return
+
+        total_size = row[0]
+        evicted_size = 0
+        evicted_rows = []
+        for row_id, size in cls._execute(
+                "SELECT rowid, size FROM results_v3 "
+                "ORDER BY accessed").fetchall():
+            if total_size - evicted_size <= max_size * cls._EVICTION_RATIO:
+                break
+            evicted_size += size
+            evicted_rows.append((row_id,))
+
+        cls._execute_many(
+            "DELETE FROM results_v3 WHERE rowid = ?", evicted_rows)
+        logger.debug(
+            "Evicted %s persistent entries (%s bytes).",
+            len(evicted_rows), evicted_size)
+
+    @classmethod
+    def _execute(cls, statement, parameters=()):
+        """ Execute `statement` (committing it), and return its cursor.
+
+        Note:
+            Must be called while holding the lock.
+        """
+        connection = cls._connect()
+        if connection is None:
+            return _NoRows()
+
+        try:
+            with connection:
+                return connection.execute(statement, parameters)
+        except sqlite3.Error as e:
+            cls._disable(e)
+            return _NoRows()
+
+    @classmethod
+    def _execute_many(cls, statement, parameters):
+        """ Execute `statement` for every item of `parameters` at once.
+
+        Note:
+            Must be called while holding the lock.
+        """
+        connection = cls._connect()
+        if connection is None:
+            return
+
+        try:
+            with connection:
+                connection.executemany(statement, parameters)
+        except sqlite3.Error as e:
+            cls._disable(e)
+
+    @classmethod
+    def _connect(cls):
+        """ Return the connection to the database, opening it on first use,
+            or None in case it could not be opened.
+
+        Note:
+            Must be called while holding the lock.
+        """
+        if cls._connection is None:
+            database_path = os.path.join(
+                sublime.cache_path(), "RTags", "results.sqlite")
+            try:
+                os.makedirs(os.path.dirname(database_path), exist_ok=True)
+                cls._connection = sqlite3.connect(
+                    database_path, check_same_thread=False)
+                cls._connection.execute(cls._SCHEMA)
+                for table in cls._OBSOLETE_TABLES:
+                    cls._connection.execute(
+                        "DROP TABLE IF EXISTS {}".format(table))
+            except (IOError, OSError, sqlite3.Error) as e:
+                cls._disable(e)
+
+        return cls._connection or None
+
+    @classmethod
+    def _disable(cls, e):
+        """ Stop using the database for the rest of the session, due to `e`.
+
+        Note:
+            Must be called while holding the lock.
+        """
+        logger.warning("Persistent result cache is disabled: %s", e)
+        if cls._connection:
+            cls._connection.close()
+        cls._connection = False
+
+    @staticmethod
+    def _stat(related_files):
+        """ Return a dict of the modification time (in nanoseconds) of every
+            file of `related_files`, or None for files that don't exist.
+        """
+        modification_times = {}
+        for file_name in related_files:
+            try:
+                modification_times[file_name] = os.stat(
+                    file_name).st_mtime_ns
+            except (IOError, OSError):
+                modification_times[file_name] = None
+        return modification_times
+
+    @staticmethod
+    def _get_compile_commands(view):
+        """ Return the fingerprint of the compilation database of the project
+            of `view`, as it was last loaded into the rdm instance serving
+            `view`, or None in case it is unknown.
+        """
+        window = view.window()
+        if window is None:
+            return None
+        folder = CursorLocationHelper.find_project_folder(
+            window, view.file_name())
+        if folder is None:
+            return None
+        return CompileCommandsFingerprint.last_loaded_within(
+            RCCall.socket_file_for(window=window), folder)
+
+    @classmethod
+    def _get_max_size(cls):
+        """ Return the maximal size of all cached values, in bytes.
+        """
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return max(1, rtags_settings.get(
+            "persistent_cache_max_mb", cls._DEFAULT_MAX_MB)) << 20
+
+
+class _NoRows(object):
+    """ Result of statements that could not be executed.
+    """
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def __iter__(self):
+        return iter(())
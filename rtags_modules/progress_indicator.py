@@ -0,0 +1,73 @@
+"""
+Provides an animated progress indicator for Sublime's status bar.
+"""
+
+import sublime
+
+import itertools  # Used for assigning a unique status key per indicator
+
+
+class ProgressIndicator(object):
+    """ Animates a message in a view's status bar until stopped.
+
+    Note:
+        All methods are expected to be called from Sublime's main thread.
+    """
+
+    """ Class Constants """
+    # Interval (in milliseconds) between two frames of the animation
+    _FRAME_INTERVAL = 100
+
+    # Width of the animated bar, in characters
+    _WIDTH = 8
+
+    # Unique ids, so concurrent indicators won't overwrite one another
+    _ids = itertools.count()
+
+    def __init__(self, view, message):
+        """ Create a ProgressIndicator instance, and initialize its members
+
+            Params:
+                view    - sublime.View whose status bar presents the indicator
+                message - Text to present next to the animated bar
+        """
+        """ Private members """
+        self._view = view
+        self._message = message
+        self._status_key = "rtags_progress_{}".format(next(self._ids))
+        self._frame = 0
+        self._running = False
+
+    def start(self):
+        """ Start animating the indicator.
+        """
+        if self._running:
+            return
+        self._running = True
+        self._animate()
+
+    def stop(self):
+        """ Stop animating the indicator, and remove it from the status bar.
+        """
+        self._running = False
+        self._view.erase_status(self._status_key)
+
+    def _animate(self):
+        """ Draw the next frame of the indicator, and schedule the one after.
+        """
+        if not self._running:
+            return
+
+        # Bounce a single "=" between the edges of the bar
+        cycle_length = 2 * (self._WIDTH - 1)
+        position = self._frame % cycle_length
+        if position >= self._WIDTH:
+            position = cycle_length - position
+        bar = ' ' * position + '=' + ' ' * (self._WIDTH - 1 - position)
+
+        self._view.set_status(
+            self._status_key,
+            "RTags: {} [{}]".format(self._message, bar))
+
+        self._frame += 1
+        sublime.set_timeout(self._animate, self._FRAME_INTERVAL)
@@ -4,14 +4,28 @@ Provides easy and generic execution for rc commands.
 
 import sublime
 
+import functools   # Used for passing streamed output to the main thread
+import logging     # Used for checking which messages are logged
+import os.path     # Used for locating rdm's socket file
 import subprocess  # Used for executing "rc" command
 import threading   # Enables execution of "rc" command in a separete thread
+import time        # Used for batching streamed output
 
+from RTags.rtags_modules.cursor_manipulations import CursorLocationHelper
 from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.performance_stats import PerformanceStats, PhaseTimings
+from RTags.rtags_modules.progress_indicator import ProgressIndicator
+from RTags.rtags_modules.rdm_readiness import RdmReadiness
+from RTags.rtags_modules.request_scheduler import RequestScheduler
 
 
 class RCCall(threading.Thread):
     """ Represents a call for "rc" command.
+
+    The command can be executed either with `execute_rc()` (and then waited
+    for with `join()`), or with `execute_rc_async()` which notifies a callback
+    on Sublime's main thread once the command completes. The latter can also
+    stream the output to the main thread in batches of lines, as it arrives.
     """
 
     """ Class Constants """
@@ -21,11 +35,42 @@ class RCCall(threading.Thread):
     # Amount of second given to rc call to complete its communication with rdm
     _TIMEOUT = 10
 
-    def __init__(self, view_file_path=None):
+    # Socket file rdm listens on by default
+    _DEFAULT_SOCKET_FILE = "~/.rdm"
+
+    # Maximal amount of bytes read at once from a streaming rc process
+    _STREAM_CHUNK_SIZE = 1 << 16
+
+    # rc options that only modify the output of the main option of a call
+    _OUTPUT_OPTIONS = ("--json", "--no-context")
+
+    # rc options of queries answered out of rdm's index, which are held back
+    # while rdm is indexing
+    _INDEX_QUERY_OPTIONS = (
+        "--references", "--follow-location", "--symbol-info",
+        "--list-symbols", "--find-symbols")
+
+    def __init__(self, view_file_path=None, silent=False,
+                 working_directory=None, input_data=None,
+                 rdm_socket_file=None):
         """ Create an RCCall instance, and initialize its members
 
             Params:
-                view_file_path - Full file path of the currently active view
+                view_file_path    - Full file path of the currently active view
+                silent            - Whether the call is kept from the user (no
+                                    progress indicator and no error messages),
+                                    e.g. for background queries
+                working_directory - Directory to execute rc in, for commands
+                                    that depend on it (e.g. "--compile").
+                                    Such calls always spawn rc.
+                input_data        - Binary data to feed rc with through its
+                                    standard input (e.g. contents of an
+                                    "--unsaved-file"). Such calls always
+                                    spawn rc.
+                rdm_socket_file   - Socket file of the rdm instance to call,
+                                    or None to call the one serving the
+                                    project of `view_file_path` (see
+                                    `socket_file_for()`)
         """
         super(RCCall, self).__init__()
 
@@ -33,13 +78,24 @@ class RCCall(threading.Thread):
         self.view_file_path = view_file_path
         self.rc_returned_successfully = False
         self.received_output = ""
+        # Socket file of the rdm instance serving this call
+        self.rdm_socket_file = (
+            rdm_socket_file or self.socket_file_for(view_file_path))
+        # Durations of the phases of this call, recorded once it completes.
+        # Callbacks may account their own phases (e.g. "parse") as well.
+        self.timings = PhaseTimings()
 
         """ Private members """
+        self._silent = silent
+        self._working_directory = working_directory
+        self._input_data = input_data
+
         # Default parameters to be used in any rc call
         self._rc_default_params = [
             "--no-color",
             "--absolute-path",
-            "--verify-version={}".format(self._PROTOCOL_VERSION)]
+            "--verify-version={}".format(self._PROTOCOL_VERSION),
+            "--socket-file={}".format(self.rdm_socket_file)]
 
         if view_file_path:
             self._rc_default_params.append("--current-file={}".format(
@@ -48,33 +104,321 @@ class RCCall(threading.Thread):
         # User defined parameters to be used in any rc call
         self._rc_user_params = []
 
+        # Callback to be notified on the main thread when rc call completes
+        self._on_done = None
+
+        # Callback to be notified on the main thread with streamed output
+        self._on_output_lines = None
+
+        # Status bar indicator presented while an asynchronous call is running
+        self._progress_indicator = None
+
+        # Spawned rc process, and whether it should be abandoned
+        self._process = None
+        self._cancelled = False
+        self._process_lock = threading.Lock()
+
+    @classmethod
+    def socket_file_for(cls, file_name=None, window=None):
+        """ Return the socket file of the rdm instance serving `file_name`,
+            or the project of `window`.
+
+        rdm instances are configured by the "rdm_socket_file" setting, either
+        within the "settings" of a project (serving the files within its
+        window), or else within the plugin's settings.
+        """
+        if window is None and file_name:
+            window = cls._find_window(file_name)
+
+        socket_file = None
+        if window is not None:
+            project_settings = (window.project_data() or {}).get(
+                "settings", {})
+            socket_file = project_settings.get("rdm_socket_file")
+        if not socket_file:
+            rtags_settings = sublime.load_settings("RTags.sublime-settings")
+            socket_file = rtags_settings.get(
+                "rdm_socket_file", cls._DEFAULT_SOCKET_FILE)
+        return os.path.expanduser(socket_file)
+
+    @staticmethod
+    def _find_window(file_name):
+        """ Return the window `file_name` is open in, or else the window of
+            the project folder containing it (if any).
+        """
+        windows = sublime.windows()
+        for window in windows:
+            if window.find_open_file(file_name) is not None:
+                return window
+
+        containing_window = None
+        containing_folder = ""
+        for window in windows:
+            folder = CursorLocationHelper.find_project_folder(
+                window, file_name)
+            if folder is not None and len(folder) > len(containing_folder):
+                containing_window = window
+                containing_folder = folder
+        return containing_window
+
+    @property
+    def is_cancelled(self):
+        """ Whether this call was cancelled by `cancel()`.
+        """
+        return self._cancelled
+
+    @property
+    def command_type(self):
+        """ The main rc option of this call (e.g. "--references"), by which
+            its performance statistics are kept.
+        """
+        for param in ' '.join(self._rc_user_params).split():
+            option = param.split('=', 1)[0]
+            if option.startswith("--") and option not in self._OUTPUT_OPTIONS:
+                return option
+        return "rc"
+
     def run(self):
+        start_time = time.perf_counter()
+        try:
+            # Wait for rdm instance to be available for another call
+            with RequestScheduler.rdm_slot(self.rdm_socket_file):
+                self.timings.add("queue", time.perf_counter() - start_time)
+                if not self._cancelled:
+                    self._call_rc()
+            self.timings.add("total", time.perf_counter() - start_time)
+        finally:
+            # Callback must be notified even if rc call failed unexpectedly
+            if self._on_done:
+                sublime.set_timeout(self._notify_done, 0)
+            else:
+                self._record_timings()
+
+    def execute_rc(self, *rc_user_params):
+        """ Execute "rc" command with given parameters on a separate thread.
+        """
+        self._set_params(*rc_user_params)
+        self.start()
+
+    def execute_rc_async(
+            self, on_done, *rc_user_params, progress_view=None,
+            progress_message="Waiting for rdm", on_output_lines=None):
+        """ Execute "rc" command with given parameters on a separate thread,
+            without waiting for it to complete.
+
+        Params:
+            on_done          - Callable accepting this RCCall instance, called
+                               on Sublime's main thread once rc completes
+            rc_user_params   - Parameters for the rc command
+            progress_view    - sublime.View to present a progress indicator
+                               in its status bar (defaults to active view)
+            progress_message - Text of the progress indicator
+            on_output_lines  - Callable accepting a list of output lines,
+                               called on Sublime's main thread for every
+                               batch of output as it arrives. When given,
+                               `received_output` is left empty.
+
+        Queries of rdm's index are only executed once rdm is not indexing
+        (see `RdmReadiness`).
+        """
+        self._on_done = on_done
+        self._on_output_lines = on_output_lines
+        self._set_params(*rc_user_params)
+
+        is_index_query = self.command_type in self._INDEX_QUERY_OPTIONS
+        if is_index_query and RdmReadiness.is_indexing(self.rdm_socket_file):
+            progress_message = "Waiting for rdm to finish indexing"
+
+        if progress_view is None and not self._silent:
+            progress_view = sublime.active_window().active_view()
+        if progress_view is not None and not self._silent:
+            self._progress_indicator = ProgressIndicator(
+                progress_view, progress_message)
+            self._progress_indicator.start()
+
+        if is_index_query:
+            RdmReadiness.when_ready(self.rdm_socket_file, self.start)
+        else:
+            self.start()
+
+    def cancel(self):
+        """ Abandon this call, killing its rc process in case it is running.
+
+        A cancelled call never returns successfully, but its callback (if
+        any) is still notified.
+        """
+        with self._process_lock:
+            self._cancelled = True
+            if self._process and self._process.poll() is None:
+                logger.debug("Killing a cancelled rc process.")
+                self._process.kill()
+
+    def _notify_done(self):
+        """ Stop the progress indicator and pass the result to the callback.
+
+        Note:
+            Must be called from Sublime's main thread.
+        """
+        if self._progress_indicator:
+            self._progress_indicator.stop()
+        try:
+            self._on_done(self)
+        finally:
+            self._record_timings()
+
+    def _record_timings(self):
+        """ Record the timings of this call, unless it was cancelled.
+        """
+        if not self._cancelled:
+            self.timings.commit(self.command_type)
+
+    def _notify_output_lines(self, lines):
+        """ Pass a batch of streamed output lines to the callback.
+
+        Note:
+            Must be called from Sublime's main thread.
+        """
+        self._on_output_lines(lines)
+
+    def _emit_output_lines(self, lines):
+        """ Pass a batch of streamed output lines to the main thread.
+        """
+        sublime.set_timeout(
+            functools.partial(self._notify_output_lines, lines), 0)
+
+    def _call_rc(self):
+        """ Execute rc command, and store its result within this instance.
+        """
         # Clear result of previous rc call
         self.received_output = ""
         self.rc_returned_successfully = False
 
         command = self._build_command()
-        logger.debug("About to execute rc command: \"{}\"".format(command))
+        logger.debug("About to execute rc command: \"%s\"", command)
 
         # Try to execute rc command, and handle the result
         try:
-            binary_output = subprocess.check_output(
-                command.split(), timeout=self._TIMEOUT, shell=False)
+            if self._on_output_lines:
+                self._stream(command)
+                binary_output = None
+            else:
+                binary_output = self._communicate(command)
         except subprocess.CalledProcessError as e:
-            self._log_rc_error(command, e)
+            PerformanceStats.record_exit_code(self.command_type, e.returncode)
+            self._log_rc_error(command, e, self._silent)
         except subprocess.TimeoutExpired as e:
-            self._log_rdm_timeout_error(command, e)
+            PerformanceStats.record_timeout(self.command_type)
+            self._log_rdm_timeout_error(command, e, self._silent)
+            # rdm might be busy indexing, so later queries should wait for it
+            RdmReadiness.check(self.rdm_socket_file)
+        except RCCallCancelledError:
+            logger.debug("rc command was cancelled: \"%s\"", command)
         else:
-            str_output = binary_output.decode('UTF-8').strip()
-            self._log_rc_success(str_output)
-            self.received_output = str_output
+            PerformanceStats.record_exit_code(self.command_type, 0)
+            if binary_output is None:
+                logger.debug("Successfully streamed output of rc command.")
+            else:
+                with self.timings.measure("decode"):
+                    str_output = binary_output.decode('UTF-8').strip()
+                self._log_rc_success(str_output)
+                self.received_output = str_output
             self.rc_returned_successfully = True
 
-    def execute_rc(self, *rc_user_params):
-        """ Execute "rc" command with given parameters on a separate thread.
+    def _communicate(self, command):
+        """ Spawn "rc" to execute `command`, and return its binary output.
+
+        Raises:
+            subprocess.CalledProcessError - rc returned a nonzero exit code
+            subprocess.TimeoutExpired     - rdm took too long to respond
+            RCCallCancelledError          - The call was cancelled meanwhile
         """
-        self._set_params(*rc_user_params)
-        self.start()
+        with self._process_lock:
+            if self._cancelled:
+                raise RCCallCancelledError()
+            with self.timings.measure("spawn"):
+                self._process = self._spawn_rc(command)
+
+        try:
+            with self.timings.measure("response"):
+                binary_output, _ = self._process.communicate(
+                    input=self._input_data, timeout=self._TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            binary_output, _ = self._process.communicate()
+            raise subprocess.TimeoutExpired(
+                command, self._TIMEOUT, binary_output)
+
+        if self._cancelled:
+            raise RCCallCancelledError()
+
+        if self._process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                self._process.returncode, command, binary_output)
+
+        return binary_output
+
+    def _stream(self, command):
+        """ Spawn "rc" to execute `command`, and stream its output to the main
+            thread as it arrives.
+
+        Timeout is applied to the time between two batches of output rather
+        than to the whole call, since streamed output may be arbitrarily long.
+
+        Raises the same exceptions as `_communicate()`.
+        """
+        batcher = _OutputLinesBatcher(self._emit_output_lines)
+
+        with self._process_lock:
+            if self._cancelled:
+                raise RCCallCancelledError()
+            with self.timings.measure("spawn"):
+                self._process = self._spawn_rc(command)
+
+        if self._input_data is not None:
+            try:
+                self._process.stdin.write(self._input_data)
+                self._process.stdin.close()
+            except BrokenPipeError:
+                # rc exited early, which is reported by its exit code
+                pass
+
+        watchdog = _InactivityWatchdog(self._TIMEOUT, self._process.kill)
+        batcher.on_flush = watchdog.reset
+        watchdog.reset()
+
+        try:
+            with self.timings.measure("response"):
+                while True:
+                    chunk = self._process.stdout.read1(
+                        self._STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    batcher.feed(chunk)
+                self._process.wait()
+        finally:
+            watchdog.stop()
+
+        if watchdog.expired:
+            raise subprocess.TimeoutExpired(command, self._TIMEOUT, b'')
+
+        batcher.flush()
+
+        if self._cancelled:
+            raise RCCallCancelledError()
+
+        if self._process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                self._process.returncode, command, b'')
+
+    def _spawn_rc(self, command):
+        """ Spawn "rc" to execute `command`, and return its process.
+        """
+        return subprocess.Popen(
+            command.split(),
+            stdin=subprocess.PIPE if self._input_data is not None else None,
+            stdout=subprocess.PIPE,
+            shell=False,
+            cwd=self._working_directory)
 
     def _set_params(self, *rc_user_params):
         """ Assign parameters for next "rc" execution.
@@ -95,17 +439,16 @@ class RCCall(threading.Thread):
         Params:
             output - UTF-8 decoded output of that command
         """
-        success_msg_format = "Successfully executed rc command:\n \"{}\""
-        success_msg = success_msg_format.format(output)
-        logger.debug(success_msg)
+        logger.debug("Successfully executed rc command:\n \"%s\"", output)
 
     @staticmethod
-    def _log_rc_error(cmd, e):
+    def _log_rc_error(cmd, e, silent=False):
         """ Log about an error in rc execution.
 
         Params:
-            cmd - rc command that caused the error
-            e   - CalledProcessError exception
+            cmd    - rc command that caused the error
+            e      - CalledProcessError exception
+            silent - Whether the error should be supressed from the user
 
         RC exit codes:
             success - 0
@@ -151,15 +494,14 @@ class RCCall(threading.Thread):
             },
         }
 
-        error_msg_format = (
-            "Executing rc resulted in an error (return code {}).\n"
-            " Command: \"{}\"\n"
-            " Output: \"{}\"")
-        error_msg = error_msg_format.format(
-            e.returncode, cmd, e.output.decode('UTF-8').strip())
+        error_msg = (
+            "Executing rc resulted in an error (return code %s).\n"
+            " Command: \"%s\"\n"
+            " Output: \"%s\"")
 
         # Classify the exit code by how relevant it is for the user
-        if e.returncode not in rc_exit_codes_unrelevant_to_user.values():
+        if (not silent and
+                e.returncode not in rc_exit_codes_unrelevant_to_user.values()):
             for very_relevant_error in (
                     rc_exit_codes_very_relevant_to_user.values()):
                 if e.returncode == very_relevant_error["exit_code"]:
@@ -167,23 +509,141 @@ class RCCall(threading.Thread):
                         "[RTags error]\n\n" +
                         very_relevant_error["user_friendly_message"])
                     break
-            logger.error(error_msg)
-        else:
-            error_msg = "RC error supressed from user:\n" + error_msg
-            logger.debug(error_msg)
+            logger.error(
+                error_msg, e.returncode, cmd,
+                e.output.decode('UTF-8').strip())
+        elif logger.isEnabledFor(logging.DEBUG):
+            # Output is only decoded in case it is going to be logged
+            logger.debug(
+                "RC error supressed from user:\n" + error_msg, e.returncode,
+                cmd, e.output.decode('UTF-8').strip())
 
     @staticmethod
-    def _log_rdm_timeout_error(cmd, e):
+    def _log_rdm_timeout_error(cmd, e, silent=False):
         """ Log about rdm taking too long to fully respond to a rc request.
 
         Params:
-            cmd - rc command that caused the error
-            e   - TimeoutExpired exception
-        """
-        error_msg_format = (
-            "Executing rc took too long, timeout expired ({} seconds).\n"
-            " Command: \"{}\"\n"
-            " Output: \"{}\"")
-        error_msg = error_msg_format.format(
-            e.timeout, cmd, e.output.decode('UTF-8').strip())
-        logger.error(error_msg)
+            cmd    - rc command that caused the error
+            e      - TimeoutExpired exception
+            silent - Whether the error should be supressed from the user
+        """
+        log_level = logging.DEBUG if silent else logging.ERROR
+        if logger.isEnabledFor(log_level):
+            # Output is only decoded in case it is going to be logged
+            logger.log(
+                log_level,
+                "Executing rc took too long, timeout expired (%s seconds).\n"
+                " Command: \"%s\"\n"
+                " Output: \"%s\"",
+                e.timeout, cmd, (e.output or b'').decode('UTF-8').strip())
+
+
+class RCCallCancelledError(Exception):
+    """ rc call was cancelled before its result was received.
+    """
+    pass
+
+
+class _OutputLinesBatcher(object):
+    """ Splits streamed binary output to decoded lines, and passes them on in
+    batches, so the main thread won't be notified for every single line.
+    """
+
+    """ Class Constants """
+    # Amount of lines that triggers passing a batch on
+    _BATCH_SIZE = 1000
+
+    # Amount of seconds after which pending lines are passed on anyway
+    _BATCH_INTERVAL = 0.05
+
+    def __init__(self, on_batch):
+        """ Params:
+                on_batch - Callable accepting a list of decoded lines
+        """
+        """ Public members """
+        # Callable to be notified after every batch that was passed on
+        self.on_flush = None
+
+        """ Private members """
+        self._on_batch = on_batch
+        self._partial_line = b''
+        self._pending_lines = []
+        # The first batch is passed on right away
+        self._last_flush_time = 0
+
+    def feed(self, chunk):
+        """ Add a chunk of binary output, which may end in a partial line.
+        """
+        lines = (self._partial_line + chunk).split(b'\n')
+        self._partial_line = lines.pop()
+        self._add_lines(lines)
+
+        if (len(self._pending_lines) >= self._BATCH_SIZE or
+                time.time() - self._last_flush_time >= self._BATCH_INTERVAL):
+            self._pass_on()
+
+    def flush(self):
+        """ Pass all remaining output on, assuming no more output will follow.
+        """
+        if self._partial_line:
+            self._add_lines([self._partial_line])
+            self._partial_line = b''
+        self._pass_on()
+
+    def _add_lines(self, binary_lines):
+        """ Decode non empty `binary_lines`, and add them to the batch.
+        """
+        self._pending_lines.extend(
+            line.decode('UTF-8', 'replace').rstrip('\r')
+            for line in binary_lines if line.strip())
+
+    def _pass_on(self):
+        """ Pass pending lines on as a batch.
+        """
+        if self._pending_lines:
+            self._on_batch(self._pending_lines)
+            self._pending_lines = []
+            if self.on_flush:
+                self.on_flush()
+        self._last_flush_time = time.time()
+
+
+class _InactivityWatchdog(object):
+    """ Calls a callback once a given time passes without being reset.
+    """
+
+    def __init__(self, timeout, on_expired):
+        """ Params:
+                timeout    - Amount of seconds of inactivity to wait for
+                on_expired - Callable to call on expiration
+        """
+        """ Public members """
+        self.expired = False
+
+        """ Private members """
+        self._timeout = timeout
+        self._on_expired = on_expired
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """ Restart waiting for the whole timeout.
+        """
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self._timeout, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def stop(self):
+        """ Stop waiting.
+        """
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+    def _expire(self):
+        self.expired = True
+        self._on_expired()
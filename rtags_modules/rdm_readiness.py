@@ -0,0 +1,175 @@
+"""
+Tells whether rdm is ready to answer queries, and holds queries back while it
+is busy indexing.
+"""
+
+import sublime
+
+import threading  # Used for polling rdm in the background
+import time       # Used for backing off between polls
+
+from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.progress_indicator import ProgressIndicator
+
+
+class RdmReadiness(object):
+    """ Monitors whether rdm instances are indexing.
+
+    - Once an rdm instance may have started indexing (e.g. a project was
+      loaded, or a query timed out), it is polled with "--is-indexing" on a
+      background thread, backing off exponentially, until it reports it is
+      done.
+    - Meanwhile, the status bar presents a progress indicator, and queries
+      of that instance are queued instead of piling up against it until
+      they time out. They are released at once when it is ready (or fails to
+      answer).
+    - Cached results are left as they are, since indexing is also started
+      by syncing a single file (which invalidates its own results). Loading
+      a project clears the caches itself.
+
+    rdm instances are told apart by their socket files.
+    """
+
+    """ Class Constants """
+    # Minimal and maximal amount of seconds between two polls
+    _MIN_POLL_INTERVAL = 0.25
+    _MAX_POLL_INTERVAL = 4.0
+
+    # Socket files of rdm instances last reported to be indexing
+    _indexing_socket_files = set()
+
+    # Callables to call once rdm is ready, in the order they were queued, by
+    # socket file
+    _waiters = {}
+
+    # Socket files of monitored rdm instances
+    _monitored_socket_files = set()
+
+    # Socket files of monitored rdm instances that were checked again since
+    # they were last polled, so they should be polled once more
+    _rechecked_socket_files = set()
+
+    _lock = threading.Lock()
+
+    @classmethod
+    def is_indexing(cls, rdm_socket_file):
+        """ Whether the rdm instance listening on `rdm_socket_file` was last
+            reported to be indexing.
+        """
+        return rdm_socket_file in cls._indexing_socket_files
+
+    @classmethod
+    def check(cls, rdm_socket_file):
+        """ Start monitoring the rdm instance listening on `rdm_socket_file`,
+            unless it is already monitored.
+        """
+        with cls._lock:
+            if rdm_socket_file in cls._monitored_socket_files:
+                # The monitor may be past its last poll already
+                cls._rechecked_socket_files.add(rdm_socket_file)
+                return
+            cls._monitored_socket_files.add(rdm_socket_file)
+
+        monitor_thread = threading.Thread(
+            target=cls._monitor, args=(rdm_socket_file,))
+        monitor_thread.daemon = True
+        monitor_thread.start()
+
+    @classmethod
+    def when_ready(cls, rdm_socket_file, callback):
+        """ Call `callback` once the rdm instance listening on
+            `rdm_socket_file` is not indexing: immediately in case it is not
+            known to be indexing, or else from the monitoring thread once it
+            is done.
+        """
+        with cls._lock:
+            if rdm_socket_file in cls._indexing_socket_files:
+                waiters = cls._waiters.setdefault(rdm_socket_file, [])
+                waiters.append(callback)
+                logger.debug(
+                    "rdm is indexing, queueing a query (%s are queued).",
+                    len(waiters))
+                return
+        callback()
+
+    @classmethod
+    def _monitor(cls, rdm_socket_file):
+        """ Poll the rdm instance listening on `rdm_socket_file` until it is
+            done indexing, and release its queued queries.
+        """
+        interval = cls._MIN_POLL_INTERVAL
+        was_indexing = False
+        progress_indicator = None
+
+        while True:
+            with cls._lock:
+                cls._rechecked_socket_files.discard(rdm_socket_file)
+
+            if cls._poll(rdm_socket_file):
+                if not was_indexing:
+                    was_indexing = True
+                    logger.info(
+                        "rdm at \"%s\" is indexing, queueing queries "
+                        "meanwhile.", rdm_socket_file)
+                    progress_indicator = cls._start_progress_indicator()
+
+                time.sleep(interval)
+                interval = min(interval * 2, cls._MAX_POLL_INTERVAL)
+                continue
+
+            # Monitoring stops under the same lock checks are made under, so
+            # a check made since the last poll is never lost
+            with cls._lock:
+                if rdm_socket_file in cls._rechecked_socket_files:
+                    continue
+                waiters = cls._waiters.pop(rdm_socket_file, [])
+                cls._monitored_socket_files.discard(rdm_socket_file)
+            break
+
+        if was_indexing:
+            logger.info(
+                "rdm at \"%s\" is done indexing, releasing %s queued "
+                "queries.", rdm_socket_file, len(waiters))
+
+        if progress_indicator is not None:
+            sublime.set_timeout(progress_indicator.stop, 0)
+
+        for callback in waiters:
+            callback()
+
+    @classmethod
+    def _poll(cls, rdm_socket_file):
+        """ Return whether the rdm instance listening on `rdm_socket_file`
+            reports it is indexing, marking it as such. Failing to query rdm
+            is considered as not indexing, so queries report the failure
+            themselves.
+        """
+        # Imported here, since rc calls depend on this module
+        from RTags.rtags_modules.rc_call import RCCall
+
+        rc_thread = RCCall(silent=True, rdm_socket_file=rdm_socket_file)
+        rc_thread.execute_rc("--is-indexing")
+        rc_thread.join()
+
+        is_indexing = (
+            rc_thread.rc_returned_successfully and
+            rc_thread.received_output not in ("0", "false"))
+        with cls._lock:
+            if is_indexing:
+                cls._indexing_socket_files.add(rdm_socket_file)
+            else:
+                cls._indexing_socket_files.discard(rdm_socket_file)
+        return is_indexing
+
+    @staticmethod
+    def _start_progress_indicator():
+        """ Return a ProgressIndicator presented in the active view, started
+            on the main thread.
+        """
+        view = sublime.active_window().active_view()
+        if view is None:
+            return None
+
+        progress_indicator = ProgressIndicator(view, "rdm is indexing")
+        sublime.set_timeout(progress_indicator.start, 0)
+        return progress_indicator
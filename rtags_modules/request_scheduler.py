@@ -0,0 +1,175 @@
+"""
+Coordinates rc calls, so repeated requests won't pile up against rdm.
+"""
+
+import sublime
+
+import threading  # Used for limiting concurrent calls per rdm instance
+
+from RTags.rtags_modules.main_logger import logger
+from RTags.rtags_modules.progress_indicator import ProgressIndicator
+
+
+class RequestScheduler(object):
+    """ Schedules rc calls made on behalf of views.
+
+    - Every rdm instance serves a limited amount of concurrent rc calls.
+    - A new request of some kind from a view supersedes (and cancels) the
+      older request of the same kind from that view.
+    - A request may consist of a batch of rc calls, which are executed
+      concurrently (as far as rdm's call slots allow), and are completed
+      (or superseded) together.
+    - Results of requests made for a location that no longer exists (the
+      view was modified or closed meanwhile) are dropped.
+    """
+
+    """ Class Constants """
+    # Default amount of rc calls that may run concurrently per rdm instance
+    _DEFAULT_MAX_CONCURRENT_CALLS = 4
+
+    # Semaphores limiting concurrent calls, by rdm socket file
+    _rdm_slots = {}
+
+    # rc calls of pending requests, by (view id, request kind)
+    _pending_requests = {}
+
+    _lock = threading.Lock()
+
+    @classmethod
+    def rdm_slot(cls, rdm_socket_file):
+        """ Return a context manager holding one of the call slots of the rdm
+            instance listening on `rdm_socket_file`.
+        """
+        with cls._lock:
+            slot = cls._rdm_slots.get(rdm_socket_file)
+            if slot is None:
+                slot = threading.BoundedSemaphore(
+                    cls.max_concurrent_calls())
+                cls._rdm_slots[rdm_socket_file] = slot
+            return slot
+
+    @classmethod
+    def execute(cls, rc_call, kind, view, on_done, *rc_user_params, **kwargs):
+        """ Execute `rc_call` asynchronously on behalf of `view`.
+
+        Params:
+            rc_call        - RCCall instance to execute
+            kind           - Name of the request kind (e.g. a command name)
+            view           - sublime.View the request was made for
+            on_done        - Callable accepting `rc_call`, called on the main
+                             thread, unless the result is no longer relevant
+            rc_user_params - Parameters for the rc command
+            kwargs         - Passed as is to `RCCall.execute_rc_async()`
+        """
+        request_key = (view.id(), kind)
+        request = (rc_call,)
+        is_result_relevant = cls._supersede(request_key, request, kind, view)
+
+        def _on_rc_done(rc_call):
+            cls._complete(request_key, request)
+            if is_result_relevant(rc_call):
+                on_done(rc_call)
+
+        on_output_lines = kwargs.get("on_output_lines")
+        if on_output_lines:
+            def _on_rc_output_lines(lines):
+                if is_result_relevant(rc_call):
+                    on_output_lines(lines)
+            kwargs["on_output_lines"] = _on_rc_output_lines
+
+        rc_call.execute_rc_async(_on_rc_done, *rc_user_params, **kwargs)
+
+    @classmethod
+    def execute_batch(cls, rc_calls, kind, view, on_done,
+                      progress_message="Waiting for rdm"):
+        """ Execute a batch of rc calls concurrently on behalf of `view`, as
+            a single request.
+
+        A single progress indicator is presented for the whole batch, so the
+        RCCall instances should be silent.
+
+        Params:
+            rc_calls         - Non-empty list of (RCCall instance, rc
+                               parameters) tuples
+            kind             - Name of the request kind (e.g. a command name)
+            view             - sublime.View the request was made for
+            on_done          - Callable accepting the list of RCCall
+                               instances, called on the main thread once all
+                               of them complete, unless the result is no
+                               longer relevant
+            progress_message - Text of the progress indicator
+        """
+        request_key = (view.id(), kind)
+        request = tuple(rc_call for rc_call, _ in rc_calls)
+        is_result_relevant = cls._supersede(request_key, request, kind, view)
+
+        progress_indicator = ProgressIndicator(view, progress_message)
+        progress_indicator.start()
+        pending_rc_calls = [len(request)]
+
+        def _on_rc_done(rc_call):
+            pending_rc_calls[0] -= 1
+            if pending_rc_calls[0]:
+                return
+
+            progress_indicator.stop()
+            cls._complete(request_key, request)
+            # Calls of a batch are superseded together
+            if is_result_relevant(request[0]):
+                on_done(list(request))
+
+        for rc_call, rc_params in rc_calls:
+            rc_call.execute_rc_async(_on_rc_done, rc_params)
+
+    @classmethod
+    def _supersede(cls, request_key, request, kind, view):
+        """ Make `request` the pending request of `request_key`, cancelling
+            the rc calls of the request it supersedes (if any).
+
+        Returns a callable telling whether the result of an rc call of
+        `request` is still relevant.
+        """
+        change_count = view.change_count()
+
+        with cls._lock:
+            superseded_request = cls._pending_requests.get(request_key)
+            cls._pending_requests[request_key] = request
+
+        if superseded_request:
+            logger.debug(
+                "Cancelling superseded '%s' request.", kind)
+            for superseded_rc_call in superseded_request:
+                superseded_rc_call.cancel()
+
+        def _is_result_relevant(rc_call):
+            if rc_call.is_cancelled:
+                logger.debug(
+                    "Dropping result of superseded '%s' request.", kind)
+                return False
+
+            if not view.is_valid() or view.change_count() != change_count:
+                logger.debug(
+                    "Dropping result of '%s' request, since the requested "
+                    "location no longer exists.", kind)
+                return False
+
+            return True
+
+        return _is_result_relevant
+
+    @classmethod
+    def _complete(cls, request_key, request):
+        """ Forget `request`, in case it is still the pending request of
+            `request_key`.
+        """
+        with cls._lock:
+            if cls._pending_requests.get(request_key) is request:
+                del cls._pending_requests[request_key]
+
+    @classmethod
+    def max_concurrent_calls(cls):
+        """ Return the amount of concurrent calls allowed per rdm instance.
+        """
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return max(1, rtags_settings.get(
+            "max_concurrent_rc_calls", cls._DEFAULT_MAX_CONCURRENT_CALLS))
@@ -0,0 +1,145 @@
+"""
+Provides size bounded LRU caches for rc results, keyed by location.
+"""
+
+import sublime
+
+import collections  # Used for keeping the entries in LRU order
+import threading    # Used for guarding the caches from concurrent access
+
+from RTags.rtags_modules.main_logger import logger
+
+
+class ResultCache(object):
+    """ Thread safe LRU cache of rc results.
+
+    Every entry is related to the files it was derived from, so it can be
+    invalidated once any of them is modified.
+    """
+
+    """ Class Constants """
+    # Default maximal amount of entries kept by every cache
+    _DEFAULT_MAX_SIZE = 256
+
+    # All created caches, for invalidating all of them at once
+    _instances = []
+
+    def __init__(self, name):
+        """ Create a ResultCache instance, and initialize its members
+
+            Params:
+                name - Name of the cache, for logging purposes
+        """
+        """ Public members """
+        self.name = name
+
+        """ Private members """
+        # Cached values (and their related files) by key, in LRU order
+        self._entries = collections.OrderedDict()
+        # Keys of cached entries by related file
+        self._keys_by_file = collections.defaultdict(set)
+        self._lock = threading.Lock()
+
+        ResultCache._instances.append(self)
+
+    @classmethod
+    def invalidate_file_in_all_caches(cls, file_name):
+        """ Remove entries related to `file_name` from all caches.
+        """
+        for cache in cls._instances:
+            cache.invalidate_file(file_name)
+
+    @classmethod
+    def clear_all_caches(cls):
+        """ Remove all entries from all caches.
+        """
+        logger.debug("Clearing all rc result caches.")
+        for cache in cls._instances:
+            cache.clear()
+
+    def get(self, key):
+        """ Return the value cached for `key`, or None in case of a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, related_files):
+        """ Cache `value` for `key`, evicting the least recently used entry in
+            case the cache is full.
+
+        Params:
+            key           - Hashable key, usually including a location
+            value         - Value to cache
+            related_files - Files the value was derived from
+        """
+        related_files = frozenset(related_files)
+        max_size = self._get_max_size()
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, related_files)
+            for related_file in related_files:
+                self._keys_by_file[related_file].add(key)
+
+            while len(self._entries) > max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_file(self, file_name):
+        """ Remove all entries related to `file_name`.
+        """
+        with self._lock:
+            keys = list(self._keys_by_file.get(file_name, ()))
+            for key in keys:
+                self._remove(key)
+
+        if keys:
+            logger.debug("Invalidated %s %s cache entries of \"%s\".",
+                len(keys), self.name, file_name)
+
+    def clear(self):
+        """ Remove all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_file.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        """ Remove the entry of `key`, which must be cached.
+
+        Note:
+            Must be called while holding the lock.
+        """
+        _, related_files = self._entries.pop(key)
+        for related_file in related_files:
+            keys = self._keys_by_file[related_file]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_file[related_file]
+
+    def _get_max_size(self):
+        """ Return the maximal amount of entries kept by the cache.
+        """
+        rtags_settings = sublime.load_settings("RTags.sublime-settings")
+        return max(1, rtags_settings.get(
+            "result_cache_size", self._DEFAULT_MAX_SIZE))
+
+
+# Raw output of "--follow-location" queries, by (location, change count)
+follow_location_cache = ResultCache("follow-location")
+
+# Raw output of symbol information queries, by (location, change count)
+symbol_info_cache = ResultCache("symbol-info")
+
+# Parameters of the symbol information queries cached by `symbol_info_cache`,
+# as a format. Targets are included, so the same entries tell where symbols
+# are defined.
+SYMBOL_INFO_PARAMS_FORMAT = (
+    "--json --symbol-info {location} --symbol-info-include-targets")
@@ -0,0 +1,147 @@
+"""
+Provides a local index of the symbol names known to rdm, so they can be
+searched without querying rdm on every keystroke.
+"""
+
+import bisect     # Used for looking names up within the sorted index
+import heapq      # Used for merging refreshed names into the sorted index
+import threading  # Used for guarding the index from concurrent access
+
+from RTags.rtags_modules.main_logger import logger
+
+
+class SymbolIndex(object):
+    """ Sorted arrays of the symbol names known to rdm, one per rdm instance
+    (by its socket file), since each serves a project of its own.
+
+    Each index is built out of a single "--list-symbols" dump, and refreshed
+    incrementally afterwards: files reindexed by rdm are marked as stale, and
+    only their symbols are listed again (and merged into the index) once the
+    index is used next. By then, rdm has most likely completed reindexing
+    them.
+
+    An array is never modified in place, but replaced as a whole, so a
+    returned array can be used without holding any lock.
+
+    Note:
+        - Names containing whitespaces are not indexed, since they can't be
+          passed to rc as a single parameter. rdm lists every symbol by its
+          plain name as well, so no symbol is lost.
+        - Refreshes only add names. A name whose symbol no longer exists is
+          removed once it is found to have no locations.
+    """
+
+    """ Class Constants """
+    # Maximal amount of stale files refreshed one by one. Once more files
+    # are stale, the whole index should be built again.
+    MAX_INCREMENTAL_FILES = 64
+
+    # Sorted symbol names by rdm socket file, for every built index
+    _names = {}
+
+    # Files reindexed since the index was last built or refreshed, by rdm
+    # socket file
+    _stale_files = {}
+
+    _lock = threading.Lock()
+
+    @classmethod
+    def names(cls, rdm_socket_file):
+        """ Return the sorted array of symbol names indexed for the rdm
+            instance listening on `rdm_socket_file`, or None in case its
+            index was not built yet.
+        """
+        return cls._names.get(rdm_socket_file)
+
+    @classmethod
+    def is_built(cls, rdm_socket_file):
+        return rdm_socket_file in cls._names
+
+    @classmethod
+    def build(cls, rdm_socket_file, list_symbols_output):
+        """ Replace the index of `rdm_socket_file` with the names of
+            `list_symbols_output`.
+        """
+        names = sorted(cls._parse_names(list_symbols_output))
+        with cls._lock:
+            cls._names[rdm_socket_file] = names
+        logger.debug("Indexed %s symbol names of \"%s\".",
+            len(names), rdm_socket_file)
+
+    @classmethod
+    def merge(cls, rdm_socket_file, list_symbols_output):
+        """ Add the names of `list_symbols_output` that are not indexed yet
+            to the index of `rdm_socket_file`.
+        """
+        with cls._lock:
+            names = cls._names.get(rdm_socket_file)
+            if names is None:
+                return
+            new_names = sorted(
+                name for name in cls._parse_names(list_symbols_output)
+                if not cls._contains(names, name))
+            if new_names:
+                cls._names[rdm_socket_file] = list(
+                    heapq.merge(names, new_names))
+        logger.debug("Merged %s new symbol names.", len(new_names))
+
+    @classmethod
+    def discard(cls, rdm_socket_file, name):
+        """ Remove `name` from the index of `rdm_socket_file`, in case it is
+            indexed.
+        """
+        with cls._lock:
+            names = cls._names.get(rdm_socket_file)
+            if names is None or not cls._contains(names, name):
+                return
+            names = list(names)
+            del names[bisect.bisect_left(names, name)]
+            cls._names[rdm_socket_file] = names
+
+    @classmethod
+    def clear(cls, rdm_socket_file=None):
+        """ Drop the index of `rdm_socket_file` (or of every rdm instance, in
+            case it is None), so it is built again once used next.
+        """
+        with cls._lock:
+            if rdm_socket_file is None:
+                cls._names.clear()
+                cls._stale_files.clear()
+            else:
+                cls._names.pop(rdm_socket_file, None)
+                cls._stale_files.pop(rdm_socket_file, None)
+
+    @classmethod
+    def invalidate_files(cls, rdm_socket_file, file_names):
+        """ Mark `file_names` as reindexed by the rdm instance listening on
+            `rdm_socket_file`, so their symbols are listed again once its
+            index is used next.
+        """
+        with cls._lock:
+            if rdm_socket_file in cls._names:
+                cls._stale_files.setdefault(
+                    rdm_socket_file, set()).update(file_names)
+
+    @classmethod
+    def take_stale_files(cls, rdm_socket_file):
+        """ Return the files reindexed since the index of `rdm_socket_file`
+            was last built or refreshed, and consider them refreshed from now
+            on.
+        """
+        with cls._lock:
+            return cls._stale_files.pop(rdm_socket_file, set())
+
+    @staticmethod
+    def _parse_names(list_symbols_output):
+        """ Return the set of indexable names within `list_symbols_output`.
+        """
+        return {
+            name for name in list_symbols_output.splitlines()
+            if name and name.split() == [name]}
+
+    @staticmethod
+    def _contains(names, name):
+        """ Return whether the sorted array `names` contains `name`.
+        """
+        position = bisect.bisect_left(names, name)
+        return position < len(names) and names[position] == name
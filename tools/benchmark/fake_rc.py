@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+A scriptable stand-in for the "rc" executable, for benchmarking the plugin
+without a real RTags installation.
+
+Its behavior is controlled by environment variables:
+
+    FAKE_RC_LATENCY     Seconds to wait before answering (default: 0)
+    FAKE_RC_REFERENCES  Amount of references to answer with (default: 10)
+    FAKE_RC_FILES       Amount of files the references spread over
+                        (default: 10)
+    FAKE_RC_SYMBOLS     Amount of symbols "--list-symbols" lists (default: 10)
+    FAKE_RC_SOURCE_DIRECTORY
+                        Directory of the answered source files (default:
+                        /benchmark/src). See `write_sources()`.
+    FAKE_RC_EXIT_CODE   Exit code to finish with (default: 0)
+    FAKE_RC_INDEXING    Output of "--is-indexing" queries (default: 0)
+    FAKE_RC_INDEXING_UNTIL
+                        Time (as of time.time()) until which "--is-indexing"
+                        queries answer 1 regardless of FAKE_RC_INDEXING
+    FAKE_RC_IS_INDEXED  Output of "--is-indexed" queries (default: indexed)
+    FAKE_RC_CALL_LOG    File to append the arguments of every call to
+
+The answered outputs mimic the ones of rc, so the plugin parses them as
+usual.
+"""
+
+import json
+import os
+import sys
+import time
+
+
+SOURCE_DIRECTORY = os.environ.get(
+    "FAKE_RC_SOURCE_DIRECTORY", "/benchmark/src")
+
+SYMBOL_NAME = "symbol"
+
+
+def source_file_name(index):
+    return "{}/file_{:04}.cpp".format(SOURCE_DIRECTORY, index)
+
+
+def source_line(row):
+    """ Return the text of line `row` of every answered source file.
+    """
+    return "    int value = {}(row, {});".format(SYMBOL_NAME, row)
+
+
+# Column the symbol starts at, in every answered location
+SYMBOL_COLUMN = source_line(1).index(SYMBOL_NAME) + 1
+
+
+def _references_per_file(references, files):
+    files = max(1, min(files, references))
+    return -(-references // files) if references else 0
+
+
+def references_output(references, files, context=True):
+    """ Return "--references" output of `references` spread over `files`,
+        with or without lines of context.
+    """
+    per_file = _references_per_file(references, files)
+    lines = []
+    for index in range(references):
+        row = index % per_file + 1
+        lines.append("{}:{}:{}:{}".format(
+            source_file_name(index // per_file),
+            row,
+            SYMBOL_COLUMN,
+            "\t" + source_line(row) if context else ""))
+    return "\n".join(lines)
+
+
+def write_sources(references, files):
+    """ Write the source files answered for `references` spread over
+        `files` into SOURCE_DIRECTORY, so their lines can be read.
+    """
+    per_file = _references_per_file(references, files)
+    os.makedirs(SOURCE_DIRECTORY, exist_ok=True)
+    contents = "".join(
+        source_line(row) + "\n" for row in range(1, per_file + 1))
+    for index in range(-(-references // per_file) if per_file else 0):
+        with open(source_file_name(index), "w") as source_file:
+            source_file.write(contents)
+
+
+def callers_output(files, arguments=()):
+    """ Return "--references --containing-function" output of the function
+        at the location within `arguments`. The function of file i is
+        called by the functions of files i + 1 and i + 2 (as far as there
+        are `files`), so callers are shared the way diamonds of a call graph
+        are. The function of any other file is called by the one of file 0.
+    """
+    index = -1
+    for argument, next_argument in zip(arguments, arguments[1:]):
+        if argument == "--references":
+            file_name = next_argument.rsplit(":", 3)[0]
+            for candidate in range(files):
+                if source_file_name(candidate) == file_name:
+                    index = candidate
+
+    lines = []
+    for caller in (index + 1, index + 2):
+        if caller < files:
+            lines.append("{}:{}:{}:\tfunction: caller_{}\t"
+                         "functionlocation: {}:{}:{}:".format(
+                             source_file_name(max(index, 0)), 2,
+                             SYMBOL_COLUMN, caller,
+                             source_file_name(caller), 1, SYMBOL_COLUMN))
+    return "\n".join(lines)
+
+
+def list_symbols_output(symbols, arguments=()):
+    """ Return "--list-symbols" output of `symbols`, each listed by its plain
+        and qualified names. Every path filtered by adds a symbol of its own.
+    """
+    names = []
+    for index in range(symbols):
+        name = "{}_{:06}".format(SYMBOL_NAME, index)
+        names.extend((name, "benchmark::" + name))
+    for index, argument in enumerate(arguments):
+        if argument == "--path-filter":
+            names.append("{}_filtered_{}".format(SYMBOL_NAME, index))
+    return "\n".join(names)
+
+
+def follow_location_output(arguments=()):
+    """ Return "--follow-location" output of the location within
+        `arguments`. Locations of distinct columns are followed to distinct
+        files.
+    """
+    index = 0
+    for argument, next_argument in zip(arguments, arguments[1:]):
+        if argument == "--follow-location":
+            index = int(next_argument.rsplit(":", 1)[1]) - 1
+    return "{}:{}:{}:".format(source_file_name(index), 1, SYMBOL_COLUMN)
+
+
+def symbol_info_output():
+    return json.dumps({
+        "location": follow_location_output(),
+        "symbolName": SYMBOL_NAME,
+        "symbolLength": len(SYMBOL_NAME),
+        "startLine": 1,
+        "endLine": 1,
+        "startColumn": SYMBOL_COLUMN,
+        "endColumn": SYMBOL_COLUMN + len(SYMBOL_NAME),
+        "kind": "CallExpr",
+        "type": "int (int, int)",
+        "targets": [{
+            "location": follow_location_output(),
+            "symbolName": SYMBOL_NAME + "(int, int)",
+            "kind": "FunctionDecl",
+            "type": "int (int, int)",
+            "definition": True}]})
+
+
+def output_for(arguments, references=10, files=10, indexing="0",
+               symbols=10, indexed="indexed"):
+    """ Return the output rc would answer a call of `arguments` with.
+    """
+    if "--containing-function" in arguments:
+        return callers_output(files, arguments)
+    if "--references" in arguments:
+        return references_output(
+            references, files, context="--no-context" not in arguments)
+    if "--list-symbols" in arguments:
+        return list_symbols_output(symbols, arguments)
+    if "--follow-location" in arguments or "--find-symbols" in arguments:
+        return follow_location_output(arguments)
+    if "--symbol-info" in arguments:
+        return symbol_info_output()
+    if "--is-indexing" in arguments:
+        return indexing
+    if "--is-indexed" in arguments:
+        return indexed
+    return ""
+
+
+def main():
+    arguments = sys.argv[1:]
+
+    call_log = os.environ.get("FAKE_RC_CALL_LOG")
+    if call_log:
+        with open(call_log, "a") as call_log_file:
+            call_log_file.write(json.dumps(arguments) + "\n")
+
+    # Contents of unsaved files are fed through the standard input, as rc
+    # expects them
+    for argument in arguments:
+        if argument.startswith("--unsaved-file="):
+            size = int(argument.rsplit(":", 1)[1])
+            sys.stdin.buffer.read(size)
+
+    latency = float(os.environ.get("FAKE_RC_LATENCY", "0"))
+    if latency:
+        time.sleep(latency)
+
+    indexing = os.environ.get("FAKE_RC_INDEXING", "0")
+    if time.time() < float(os.environ.get("FAKE_RC_INDEXING_UNTIL", "0")):
+        indexing = "1"
+
+    output = output_for(
+        arguments,
+        references=int(os.environ.get("FAKE_RC_REFERENCES", "10")),
+        files=int(os.environ.get("FAKE_RC_FILES", "10")),
+        indexing=indexing,
+        symbols=int(os.environ.get("FAKE_RC_SYMBOLS", "10")),
+        indexed=os.environ.get("FAKE_RC_IS_INDEXED", "indexed"))
+    if output:
+        sys.stdout.write(output + "\n")
+    sys.stdout.flush()
+
+    sys.exit(int(os.environ.get("FAKE_RC_EXIT_CODE", "0")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+Headless benchmarks of the plugin's end-to-end flows.
+
+The plugin is loaded against a stand-in of the Sublime Text API
+(sublime_stub/), and talks to a scriptable fake "rc" (fake_rc.py). Every
+scenario is measured for:
+
+    - End-to-end latency, from triggering a command until its results are
+      presented (median, min and max over all iterations).
+    - Amount of rc calls issued per iteration (spawned rc processes).
+    - Peak memory allocated by the plugin (by tracemalloc, in an extra
+      iteration, since tracing slows everything down).
+
+Usage:
+    python3 tools/benchmark/run_benchmarks.py
+    python3 tools/benchmark/run_benchmarks.py --scenario "references*"
+    python3 tools/benchmark/run_benchmarks.py --iterations 10 --json out.json
+"""
+
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+TOOLS_DIRECTORY = os.path.dirname(BENCHMARK_DIRECTORY)
+REPOSITORY_DIRECTORY = os.path.dirname(TOOLS_DIRECTORY)
+
+# Seconds to wait for a single iteration before giving up on it
+ITERATION_TIMEOUT = 60.0
+
+# Contents of the view commands are triggered from, with the cursor placed
+# at the beginning of the symbol
+SOURCE_TEXT = "int main() {\n    int value = symbol(0, 0);\n}\n"
+SOURCE_CURSOR = SOURCE_TEXT.index("symbol")
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Benchmark(object):
+    """ Environment the scenarios run in: a Sublime Text window with a single
+    C++ view, and a fake rc on PATH.
+    """
+
+    def __init__(self, work_directory, verbose=False):
+        self.work_directory = work_directory
+        self.call_log = os.path.join(work_directory, "rc_calls.log")
+        # Compilation database which results are cached persistently for
+        self.compile_commands_path = os.path.join(
+            work_directory, "compile_commands.json")
+
+        self._prepare_environment(verbose)
+
+        # The view commands are triggered from is saved
+        self.source_file_name = os.path.join(
+            os.environ["FAKE_RC_SOURCE_DIRECTORY"], "main.cpp")
+        os.makedirs(os.path.dirname(self.source_file_name), exist_ok=True)
+        with open(self.source_file_name, "w") as source_file:
+            source_file.write(SOURCE_TEXT)
+
+        import sublime
+        self.sublime = sublime
+        self.window = sublime.Window()
+        self.view = None
+        self.reset_view()
+
+    def _prepare_environment(self, verbose):
+        """ Put the Sublime Text API stub, the plugin package and the fake rc
+            where the plugin expects them.
+        """
+        # The plugin imports its modules through its package name
+        packages_directory = os.path.join(self.work_directory, "Packages")
+        os.mkdir(packages_directory)
+        os.symlink(
+            REPOSITORY_DIRECTORY, os.path.join(packages_directory, "RTags"))
+
+        bin_directory = os.path.join(self.work_directory, "bin")
+        os.mkdir(bin_directory)
+        rc_path = os.path.join(bin_directory, "rc")
+        with open(rc_path, "w") as rc_file:
+            rc_file.write("#!/bin/sh\nexec \"{}\" \"{}\" \"$@\"\n".format(
+                sys.executable, os.path.join(BENCHMARK_DIRECTORY, "fake_rc.py")))
+        os.chmod(rc_path, 0o755)
+
+        # rdm's socket file (~/.rdm) is resolved within the work directory
+        home_directory = os.path.join(self.work_directory, "home")
+        os.mkdir(home_directory)
+
+        os.environ["HOME"] = home_directory
+        os.environ["PATH"] = bin_directory + os.pathsep + os.environ["PATH"]
+        os.environ["FAKE_RC_CALL_LOG"] = self.call_log
+        os.environ["FAKE_RC_SOURCE_DIRECTORY"] = os.path.join(
+            self.work_directory, "src")
+        sys.path[:0] = [
+            os.path.join(BENCHMARK_DIRECTORY, "sublime_stub"),
+            packages_directory,
+            TOOLS_DIRECTORY]
+
+        import sublime
+        sublime.load_settings("RTags.sublime-settings").set("verbose", verbose)
+        sublime._cache_path = os.path.join(self.work_directory, "cache")
+
+        from RTags.rtags_modules import main_logger
+        main_logger.InitializeMainLogger()
+        if not verbose:
+            # Failure scenarios are expected to log errors
+            main_logger.logger.handlers[0].setLevel(logging.CRITICAL + 1)
+
+        # Register the plugin commands with the stub
+        import RTags.rtags  # noqa: F401
+
+    def reset_view(self):
+        """ Replace the view commands are triggered from with a pristine one.
+        """
+        for view in list(self.window.views):
+            view.close()
+        self.view = self.sublime.View(
+            self.window, self.source_file_name, SOURCE_TEXT)
+        self.view.sel().clear()
+        self.view.sel().add(SOURCE_CURSOR)
+        self.window.views.append(self.view)
+
+    def settings(self):
+        return self.sublime.load_settings("RTags.sublime-settings")
+
+    def wait_until(self, predicate, description):
+        """ Run the main thread until `predicate()` holds.
+        """
+        if not self.sublime.run_main_thread(predicate, ITERATION_TIMEOUT):
+            raise BenchmarkError("Timed out waiting for {}".format(
+                description))
+
+    def wait_for_rc_calls(self):
+        """ Wait for all rc calls of the plugin to complete, and for their
+            callbacks to be executed.
+        """
+        def _is_idle():
+            return not any(
+                thread.__class__.__name__ == "RCCall"
+                for thread in threading.enumerate())
+        self.wait_until(_is_idle, "rc calls to complete")
+        self.sublime.run_main_thread(lambda: False, 0.05)
+
+    def start_indexing(self, duration):
+        """ Let rdm report it is indexing for another `duration` seconds, and
+            wait until the plugin notices.
+        """
+        from RTags.rtags_modules.rdm_readiness import RdmReadiness
+        rdm_socket_file = self._get_rdm_socket_file()
+        os.environ["FAKE_RC_INDEXING_UNTIL"] = str(time.time() + duration)
+        RdmReadiness.check(rdm_socket_file)
+        self.wait_until(
+            lambda: RdmReadiness.is_indexing(rdm_socket_file),
+            "rdm to index")
+
+    def wait_for_indexing(self):
+        """ Wait until rdm is done indexing, and the queries held meanwhile
+            are released.
+        """
+        from RTags.rtags_modules.rdm_readiness import RdmReadiness
+        rdm_socket_file = self._get_rdm_socket_file()
+        self.wait_until(
+            lambda: not RdmReadiness.is_indexing(rdm_socket_file),
+            "rdm to be done indexing")
+        self.sublime.run_main_thread(lambda: False, 0.1)
+
+    def _get_rdm_socket_file(self):
+        from RTags.rtags_modules.rc_call import RCCall
+        return RCCall.socket_file_for(self.view.file_name())
+
+    def count_rc_calls(self):
+        """ Return the amount of rc calls issued so far.
+        """
+        try:
+            with open(self.call_log) as call_log_file:
+                return sum(1 for _ in call_log_file)
+        except IOError:
+            return 0
+
+    """ Command flows """
+
+    def status_messages(self):
+        return len(self.window.status_messages)
+
+    def follow_location(self):
+        """ Follow the symbol under cursor, until navigation completes or
+            fails.
+        """
+        views, messages = len(self.window.views), self.status_messages()
+        self.view.run_command("follow_location")
+        self.wait_until(
+            lambda: (len(self.window.views) > views or
+                     self.status_messages() > messages),
+            "follow location")
+
+    def follow_locations(self):
+        """ Follow the symbols under three cursors at once, until their
+            targets are presented or following fails.
+        """
+        self.view.sel().clear()
+        for word in ("int value", "value", "symbol"):
+            self.view.sel().add(SOURCE_TEXT.index(word))
+
+        panels, messages = (
+            len(self.window.quick_panels), self.status_messages())
+        self.view.run_command("follow_location")
+        self.wait_until(
+            lambda: (len(self.window.quick_panels) > panels or
+                     self.status_messages() > messages),
+            "follow locations")
+
+    def find_references(self):
+        """ Find references of the symbol under cursor, until all of them are
+            presented.
+        """
+        messages = self.status_messages()
+        self.view.run_command("find_references")
+        self.wait_until(
+            lambda: self.status_messages() > messages, "find references")
+
+        message = self.window.status_messages[-1]
+        if "Failed" not in message:
+            panel = self.window.find_output_panel("RTags - References")
+            if panel is None or not panel.size():
+                raise BenchmarkError("No references were presented")
+
+    def call_hierarchy(self):
+        """ Present the call hierarchy of the symbol under cursor, until all
+            of its eagerly expanded levels are resolved.
+        """
+        from RTags.rtags_commands import call_hierarchy
+        self.view.run_command("call_hierarchy")
+
+        # Callers are resolved as long as some rc call is awaited
+        hierarchy = call_hierarchy._hierarchies_by_window[self.window.id()]
+        self.wait_until(lambda: not hierarchy._waiters, "call hierarchy")
+
+        panel = self.window.find_output_panel("RTags - Call Hierarchy")
+        if panel is None or panel.size() == 0:
+            raise BenchmarkError("No call hierarchy was presented")
+
+    def rename_symbol(self):
+        """ Rename the symbol under cursor, until all of its references are
+            renamed.
+        """
+        messages = self.status_messages()
+        self.window.input_panel_text = "renamed_symbol"
+        try:
+            self.view.run_command("rename_symbol")
+            self.wait_until(
+                lambda: self.status_messages() > messages, "rename symbol")
+        finally:
+            self.window.input_panel_text = None
+
+        message = self.window.status_messages[-1]
+        if "Failed" not in message and "Skipped" in message:
+            raise BenchmarkError("Not all references were renamed")
+
+    def go_to_symbol(self):
+        """ Go to the first symbol of the project, until navigation completes
+            or fails.
+        """
+        views, messages = len(self.window.views), self.status_messages()
+        self.window.quick_panel_choice = 0
+        try:
+            self.view.run_command("go_to_symbol_in_project")
+            self.wait_until(
+                lambda: (len(self.window.views) > views or
+                         self.status_messages() > messages),
+                "go to symbol")
+        finally:
+            self.window.quick_panel_choice = -1
+
+
+class Scenario(object):
+    """ A flow to benchmark, and the environment to benchmark it in.
+    """
+
+    def __init__(self, name, description, run, fake_rc=None, settings=None,
+                 cached=False, persisted=False,
+                 indexing=False, rewritten=False):
+        """ Params:
+                name        - Name of the scenario
+                description - Short description of the scenario
+                run         - Callable accepting a Benchmark, running a single
+                              iteration to completion
+                fake_rc     - Dict configuring the fake rc (latency,
+                              references, files, symbols, exit_code), and
+                              whether its source files exist (sources)
+                settings    - Plugin settings to apply
+                cached      - Whether result caches are kept between
+                              iterations (an untimed iteration warms them)
+                persisted   - Whether results are cached persistently (as
+                              if in a former session, by an untimed
+                              iteration), while in-memory caches are not
+                indexing    - Whether rdm is indexing (for another 300 ms)
+                              once every iteration starts. Queries held
+                              meanwhile complete untimed.
+                rewritten   - Whether the flow modifies the source files of the
+                              fake rc, so they are written anew (untimed)
+                              before every iteration
+        """
+        self.name = name
+        self.description = description
+        self.run = run
+        self.fake_rc = fake_rc or {}
+        self.settings = settings or {}
+        self.cached = cached
+        self.persisted = persisted
+        self.indexing = indexing
+        self.rewritten = rewritten
+
+    def prepare(self, benchmark):
+        os.environ["FAKE_RC_LATENCY"] = str(self.fake_rc.get("latency", 0))
+        os.environ["FAKE_RC_REFERENCES"] = str(
+            self.fake_rc.get("references", 10))
+        os.environ["FAKE_RC_FILES"] = str(self.fake_rc.get("files", 10))
+        os.environ["FAKE_RC_SYMBOLS"] = str(self.fake_rc.get("symbols", 10))
+        os.environ["FAKE_RC_EXIT_CODE"] = str(self.fake_rc.get("exit_code", 0))
+
+        for key, value in self.settings.items():
+            benchmark.settings().set(key, value)
+
+        if self.fake_rc.get("sources"):
+            self._write_sources()
+
+        if self.persisted:
+            # Persistent results are only valid for the loaded database of
+            # the project
+            from RTags.rtags_modules.compile_commands_fingerprint import (
+                CompileCommandsFingerprint)
+            from RTags.rtags_modules.rc_call import RCCall
+            benchmark.window.set_folders([benchmark.work_directory])
+            CompileCommandsFingerprint.remember(CompileCommandsFingerprint(
+                RCCall.socket_file_for(), benchmark.compile_commands_path,
+                "benchmark", {}))
+
+        if self.cached or self.persisted:
+            self._run_iteration(benchmark)
+
+    def cleanup(self, benchmark):
+        for key in self.settings:
+            benchmark.settings().erase(key)
+        if self.persisted:
+            from RTags.rtags_modules.compile_commands_fingerprint import (
+                CompileCommandsFingerprint)
+            from RTags.rtags_modules.rc_call import RCCall
+            CompileCommandsFingerprint.forget(
+                RCCall.socket_file_for(), benchmark.compile_commands_path)
+            benchmark.window.set_folders([])
+
+    def measure(self, benchmark, iterations):
+        """ Run the scenario, and return its measurements.
+        """
+        self.prepare(benchmark)
+        try:
+            latencies = []
+            rc_calls = []
+            for _ in range(iterations):
+                calls_before = benchmark.count_rc_calls()
+                latencies.append(self._run_iteration(benchmark))
+                rc_calls.append(benchmark.count_rc_calls() - calls_before)
+
+            tracemalloc.start()
+            try:
+                self._run_iteration(benchmark)
+                _, peak_memory = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        finally:
+            self.cleanup(benchmark)
+
+        return {
+            "scenario": self.name,
+            "iterations": iterations,
+            "latency_median_ms": statistics.median(latencies) * 1000,
+            "latency_min_ms": min(latencies) * 1000,
+            "latency_max_ms": max(latencies) * 1000,
+            "rc_calls": statistics.mean(rc_calls),
+            "peak_memory_kib": peak_memory / 1024.0}
+
+    def _run_iteration(self, benchmark):
+        """ Run a single iteration, and return its latency in seconds.
+        """
+        from RTags.rtags_modules.result_cache import ResultCache
+        from RTags.rtags_modules.symbol_index import SymbolIndex
+        if not self.cached:
+            ResultCache.clear_all_caches()
+            SymbolIndex.clear()
+        if self.rewritten:
+            self._write_sources()
+        benchmark.reset_view()
+        if self.indexing:
+            benchmark.start_indexing(0.3)
+
+        start = time.perf_counter()
+        self.run(benchmark)
+        latency = time.perf_counter() - start
+
+        if self.indexing:
+            benchmark.wait_for_indexing()
+        benchmark.wait_for_rc_calls()
+        return latency
+
+    def _write_sources(self):
+        import fake_rc as fake_rc_module
+        fake_rc_module.write_sources(
+            self.fake_rc.get("references", 10),
+            self.fake_rc.get("files", 10))
+
+
+def _follow_location_superseded(benchmark):
+    """ Follow the same location repeatedly, as an impatient user would,
+        until the last request completes.
+    """
+    for _ in range(9):
+        benchmark.view.run_command("follow_location")
+    benchmark.follow_location()
+
+
+def _follow_location_while_indexing(benchmark):
+    """ Follow a location while rdm is indexing for another 500 ms, until
+        the query is released and completes.
+    """
+    benchmark.start_indexing(0.5)
+    benchmark.follow_location()
+
+
+SCENARIOS = [
+    Scenario(
+        "follow_location",
+        "Follow a location with a 50 ms rc",
+        Benchmark.follow_location,
+        fake_rc=dict(latency=0.05)),
+    Scenario(
+        "follow_location_cached",
+        "Follow an already followed location",
+        Benchmark.follow_location,
+        fake_rc=dict(latency=0.05),
+        cached=True),
+    Scenario(
+        "follow_location_persisted",
+        "Follow a location followed in a former session, while rdm indexes",
+        Benchmark.follow_location,
+        fake_rc=dict(latency=0.05, references=20, files=20, sources=True),
+        persisted=True,
+        indexing=True),
+    Scenario(
+        "follow_location_superseded",
+        "Follow a location 10 times in a row with a 200 ms rc",
+        _follow_location_superseded,
+        fake_rc=dict(latency=0.2)),
+    Scenario(
+        "follow_location_rc_error",
+        "Follow a location with a failing rc",
+        Benchmark.follow_location,
+        fake_rc=dict(latency=0.05, exit_code=32)),
+    Scenario(
+        "follow_location_indexing",
+        "Follow a location while rdm indexes for another 500 ms",
+        _follow_location_while_indexing,
+        fake_rc=dict(latency=0.05)),
+    Scenario(
+        "follow_locations_batch",
+        "Follow the locations of 3 cursors with a 50 ms rc",
+        Benchmark.follow_locations,
+        fake_rc=dict(latency=0.05)),
+    Scenario(
+        "references_1k",
+        "Find 1,000 references across 50 files",
+        Benchmark.find_references,
+        fake_rc=dict(references=1000, files=50)),
+    Scenario(
+        "references_20k",
+        "Find 20,000 references across 500 files",
+        Benchmark.find_references,
+        fake_rc=dict(references=20000, files=500)),
+    Scenario(
+        "references_100k",
+        "Find 100,000 references across 2,000 files",
+        Benchmark.find_references,
+        fake_rc=dict(references=100000, files=2000)),
+    Scenario(
+        "references_20k_unlimited",
+        "Find 20,000 references, presenting all of them",
+        Benchmark.find_references,
+        fake_rc=dict(references=20000, files=500),
+        settings=dict(references_panel_limit=1 << 30)),
+    Scenario(
+        "references_20k_local_context",
+        "Find 20,000 references, reading their context locally",
+        Benchmark.find_references,
+        fake_rc=dict(references=20000, files=500, sources=True),
+        settings=dict(references_local_context=True)),
+    Scenario(
+        "references_5k_persisted",
+        "Find 5,000 references found in a former session, while rdm "
+        "indexes",
+        Benchmark.find_references,
+        fake_rc=dict(references=5000, files=125, sources=True),
+        persisted=True,
+        indexing=True),
+    Scenario(
+        "references_rc_error",
+        "Find references with a failing rc",
+        Benchmark.find_references,
+        fake_rc=dict(exit_code=32)),
+    Scenario(
+        "call_hierarchy_depth_4",
+        "Expand 4 levels of callers, sharing callers, with a 50 ms rc",
+        Benchmark.call_hierarchy,
+        fake_rc=dict(files=50, latency=0.05),
+        settings=dict(call_hierarchy_depth=4)),
+    Scenario(
+        "rename_20k",
+        "Rename 20,000 references across 500 files",
+        Benchmark.rename_symbol,
+        fake_rc=dict(references=20000, files=500, sources=True),
+        rewritten=True),
+    Scenario(
+        "go_to_symbol_200k",
+        "Index 200,000 symbol names, and go to one of them",
+        Benchmark.go_to_symbol,
+        fake_rc=dict(symbols=100000)),
+    Scenario(
+        "go_to_symbol_indexed",
+        "Go to a symbol of an already built index",
+        Benchmark.go_to_symbol,
+        fake_rc=dict(symbols=100000),
+        cached=True),
+]
+
+
+def print_results(results):
+    header = ("{:<28} {:>6} {:>12} {:>12} {:>12} {:>9} {:>13}".format(
+        "scenario", "iters", "median [ms]", "min [ms]", "max [ms]",
+        "rc calls", "peak [KiB]"))
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print("{scenario:<28} {iterations:>6} {latency_median_ms:>12.1f} "
+              "{latency_min_ms:>12.1f} {latency_max_ms:>12.1f} "
+              "{rc_calls:>9.1f} {peak_memory_kib:>13.0f}".format(**result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        "--scenario", action="append",
+        help="Run only scenarios matching this pattern (may be repeated)")
+    parser.add_argument(
+        "--iterations", type=int, default=5,
+        help="Timed iterations per scenario (default: 5)")
+    parser.add_argument(
+        "--json", metavar="PATH",
+        help="Also write the results to PATH, for comparing runs")
+    parser.add_argument(
+        "--list", action="store_true", help="List scenarios and exit")
+    parser.add_argument(
+        "--stats", action="store_true",
+        help="Also print the plugin's own performance statistics")
+    parser.add_argument(
+        "--verbose", action="store_true", help="Show the plugin's log")
+    args = parser.parse_args()
+
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if not args.scenario or any(
+            fnmatch.fnmatch(scenario.name, pattern)
+            for pattern in args.scenario)]
+
+    if args.list:
+        for scenario in scenarios:
+            print("{:<28} {}".format(scenario.name, scenario.description))
+        return
+
+    work_directory = tempfile.mkdtemp(prefix="rtags-benchmark-")
+    try:
+        benchmark = Benchmark(work_directory, args.verbose)
+        results = []
+        for scenario in scenarios:
+            try:
+                results.append(scenario.measure(benchmark, args.iterations))
+            except BenchmarkError as e:
+                print("{}: {}".format(scenario.name, e), file=sys.stderr)
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    print_results(results)
+    if args.stats:
+        from RTags.rtags_modules.performance_stats import PerformanceStats
+        print("\n" + PerformanceStats.format_report())
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(results, json_file, indent=4)
+
+    if len(results) != len(scenarios):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
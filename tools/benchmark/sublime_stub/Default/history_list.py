@@ -0,0 +1,19 @@
+"""
+A headless stand-in for the jump history of Sublime Text's Default package.
+"""
+
+
+class JumpHistory(object):
+    def __init__(self):
+        self.selections = []
+
+    def push_selection(self, view):
+        self.selections.append(
+            (view.file_name(), [(r.a, r.b) for r in view.sel()]))
+
+
+_histories = {}
+
+
+def get_jump_history(window_id):
+    return _histories.setdefault(window_id, JumpHistory())
@@ -0,0 +1,567 @@
+"""
+A headless stand-in for Sublime Text's `sublime` module.
+
+Only the parts of the API used by the plugin are provided. Callbacks given
+to `set_timeout()` are queued for the emulated main thread, and executed by
+`run_main_thread()`. Callbacks given to `set_timeout_async()` are executed
+on a single emulated async thread, as in Sublime Text.
+"""
+
+import bisect
+import queue
+import re
+import threading
+import time
+
+
+CLASS_WORD_START = 1
+CLASS_WORD_END = 2
+CLASS_PUNCTUATION_START = 4
+CLASS_PUNCTUATION_END = 8
+CLASS_SUB_WORD_START = 16
+CLASS_SUB_WORD_END = 32
+CLASS_LINE_START = 64
+CLASS_LINE_END = 128
+CLASS_EMPTY_LINE = 256
+
+ENCODED_POSITION = 1
+TRANSIENT = 4
+FORCE_GROUP = 8
+
+DRAW_EMPTY = 1
+HIDE_ON_MINIMAP = 2
+DRAW_EMPTY_AS_OVERWRITE = 4
+DRAW_NO_FILL = 32
+DRAW_NO_OUTLINE = 256
+DRAW_SOLID_UNDERLINE = 512
+DRAW_STIPPLED_UNDERLINE = 1024
+DRAW_SQUIGGLY_UNDERLINE = 2048
+PERSISTENT = 16
+HIDDEN = 128
+
+HOVER_TEXT = 1
+HOVER_GUTTER = 2
+HOVER_MARGIN = 3
+
+COOPERATE_WITH_AUTO_COMPLETE = 2
+HIDE_ON_MOUSE_MOVE = 4
+HIDE_ON_MOUSE_MOVE_AWAY = 8
+
+MONOSPACE_FONT = 1
+KEEP_OPEN_ON_FOCUS_LOST = 2
+
+
+""" Emulated threads """
+
+_main_thread_queue = queue.Queue()
+_async_thread_queue = queue.Queue()
+
+
+def set_timeout(callback, delay=0):
+    if delay:
+        timer = threading.Timer(
+            delay / 1000.0, _main_thread_queue.put, [callback])
+        timer.daemon = True
+        timer.start()
+    else:
+        _main_thread_queue.put(callback)
+
+
+def set_timeout_async(callback, delay=0):
+    if delay:
+        timer = threading.Timer(
+            delay / 1000.0, _async_thread_queue.put, [callback])
+        timer.daemon = True
+        timer.start()
+    else:
+        _async_thread_queue.put(callback)
+
+
+def _run_async_thread():
+    while True:
+        _async_thread_queue.get()()
+
+
+_async_thread = threading.Thread(target=_run_async_thread)
+_async_thread.daemon = True
+_async_thread.start()
+
+
+def run_main_thread(until, timeout=30.0):
+    """ Execute main thread callbacks until `until()` returns True.
+
+    Returns whether `until()` was satisfied before `timeout` seconds passed.
+    """
+    deadline = time.time() + timeout
+    while not until():
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        try:
+            callback = _main_thread_queue.get(timeout=min(remaining, 0.01))
+        except queue.Empty:
+            continue
+        callback()
+    return True
+
+
+""" Settings """
+
+
+class Settings(object):
+    def __init__(self, values=None):
+        self._values = dict(values or {})
+        self._on_change = {}
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key, value):
+        self._values[key] = value
+        for callback in list(self._on_change.values()):
+            callback()
+
+    def erase(self, key):
+        self._values.pop(key, None)
+
+    def has(self, key):
+        return key in self._values
+
+    def add_on_change(self, tag, callback):
+        self._on_change[tag] = callback
+
+    def clear_on_change(self, tag):
+        self._on_change.pop(tag, None)
+
+
+_settings = {}
+
+
+def load_settings(base_name):
+    return _settings.setdefault(base_name, Settings())
+
+
+def save_settings(base_name):
+    pass
+
+
+""" Application """
+
+_windows = []
+_messages = []
+
+
+def active_window():
+    return _windows[0] if _windows else None
+
+
+def windows():
+    return list(_windows)
+
+
+def error_message(message):
+    _messages.append(("error", message))
+
+
+def message_dialog(message):
+    _messages.append(("message", message))
+
+
+def status_message(message):
+    _messages.append(("status", message))
+
+
+_cache_path = None
+
+
+def cache_path():
+    return _cache_path
+
+
+def packages_path():
+    return _cache_path
+
+
+def version():
+    return "3211"
+
+
+def platform():
+    return "linux"
+
+
+""" Regions """
+
+
+class Region(object):
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return abs(self.b - self.a)
+
+    def empty(self):
+        return self.a == self.b
+
+    def contains(self, x):
+        if isinstance(x, Region):
+            return self.begin() <= x.begin() and x.end() <= self.end()
+        return self.begin() <= x <= self.end()
+
+    def __eq__(self, other):
+        return (isinstance(other, Region) and
+                (self.a, self.b) == (other.a, other.b))
+
+    def __repr__(self):
+        return "Region({}, {})".format(self.a, self.b)
+
+
+class Selection(object):
+    def __init__(self):
+        self._regions = []
+
+    def clear(self):
+        del self._regions[:]
+
+    def add(self, region):
+        if not isinstance(region, Region):
+            region = Region(region)
+        self._regions.append(region)
+
+    def __len__(self):
+        return len(self._regions)
+
+    def __getitem__(self, index):
+        return self._regions[index]
+
+    def __iter__(self):
+        return iter(self._regions)
+
+
+""" Views and windows """
+
+_ids = iter(range(1, 1 << 30))
+
+
+class View(object):
+    """ A view of an in-memory buffer.
+    """
+
+    def __init__(self, window, file_name=None, text=""):
+        self._id = next(_ids)
+        self._window = window
+        self._file_name = file_name
+        self._text = text
+        self._line_offsets = None
+        self._change_count = 0
+        self._selection = Selection()
+        self._selection.add(0)
+        self._settings = Settings()
+        self._status = {}
+        self._regions = {}
+        self._valid = True
+        self._read_only = False
+        self.syntax = None
+        self.popups = []
+
+    def id(self):
+        return self._id
+
+    def buffer_id(self):
+        return self._id
+
+    def is_valid(self):
+        return self._valid
+
+    def close(self):
+        self._valid = False
+        if self in self._window.views:
+            self._window.views.remove(self)
+
+    def window(self):
+        return self._window
+
+    def file_name(self):
+        return self._file_name
+
+    def name(self):
+        return ""
+
+    def is_loading(self):
+        return False
+
+    def is_dirty(self):
+        return False
+
+    def change_count(self):
+        return self._change_count
+
+    def settings(self):
+        return self._settings
+
+    def is_read_only(self):
+        return self._read_only
+
+    def set_read_only(self, read_only):
+        self._read_only = read_only
+
+    def assign_syntax(self, syntax):
+        self.syntax = syntax
+
+    def sel(self):
+        return self._selection
+
+    def size(self):
+        return len(self._text)
+
+    def substr(self, x):
+        if isinstance(x, Region):
+            return self._text[x.begin():x.end()]
+        return self._text[x:x + 1]
+
+    def _get_line_offsets(self):
+        if self._line_offsets is None:
+            offsets = [0]
+            position = self._text.find("\n")
+            while position != -1:
+                offsets.append(position + 1)
+                position = self._text.find("\n", position + 1)
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    def rowcol(self, point):
+        offsets = self._get_line_offsets()
+        row = bisect.bisect_right(offsets, point) - 1
+        return row, point - offsets[row]
+
+    def text_point(self, row, col):
+        offsets = self._get_line_offsets()
+        if row >= len(offsets):
+            return len(self._text)
+        return min(offsets[row] + col, len(self._text))
+
+    def line(self, x):
+        point = x.begin() if isinstance(x, Region) else x
+        row, _ = self.rowcol(point)
+        begin = self._get_line_offsets()[row]
+        end = self._text.find("\n", begin)
+        return Region(begin, len(self._text) if end == -1 else end)
+
+    def word(self, x):
+        point = x.begin() if isinstance(x, Region) else x
+        begin = point
+        while begin > 0 and _is_word_char(self._text[begin - 1]):
+            begin -= 1
+        end = point
+        while end < len(self._text) and _is_word_char(self._text[end]):
+            end += 1
+        return Region(begin, end)
+
+    def find_all(self, pattern, flags=0):
+        return [Region(match.start(), match.end())
+                for match in re.finditer(pattern, self._text, re.MULTILINE)]
+
+    def classify(self, point):
+        classes = 0
+        before = self._text[point - 1] if point > 0 else ""
+        after = self._text[point] if point < len(self._text) else ""
+        if _is_word_char(after) and not _is_word_char(before):
+            classes |= CLASS_WORD_START
+        if _is_word_char(before) and not _is_word_char(after):
+            classes |= CLASS_WORD_END
+        return classes
+
+    def find_by_class(self, pt, forward, classes, separators=""):
+        step = 1 if forward else -1
+        point = pt + step
+        while 0 < point < len(self._text):
+            if self.classify(point) & classes:
+                return point
+            point += step
+        return max(0, min(point, len(self._text)))
+
+    def score_selector(self, point, selector):
+        file_name = self._file_name or ""
+        is_c_family = file_name.endswith(
+            (".c", ".cc", ".cpp", ".cxx", ".h", ".hh", ".hpp", ".hxx"))
+        return 1 if is_c_family and "source.c" in selector else 0
+
+    def match_selector(self, point, selector):
+        return self.score_selector(point, selector) > 0
+
+    def insert(self, edit, point, text):
+        self._text = self._text[:point] + text + self._text[point:]
+        self._modified()
+        return len(text)
+
+    def erase(self, edit, region):
+        self._text = self._text[:region.begin()] + self._text[region.end():]
+        self._modified()
+
+    def replace(self, edit, region, text):
+        self._text = (
+            self._text[:region.begin()] + text + self._text[region.end():])
+        self._modified()
+
+    def _modified(self):
+        self._line_offsets = None
+        self._change_count += 1
+
+    def set_status(self, key, value):
+        self._status[key] = value
+
+    def get_status(self, key):
+        return self._status.get(key, "")
+
+    def erase_status(self, key):
+        self._status.pop(key, None)
+
+    def add_regions(self, key, regions, scope="", icon="", flags=0):
+        self._regions[key] = list(regions)
+
+    def get_regions(self, key):
+        return list(self._regions.get(key, []))
+
+    def erase_regions(self, key):
+        self._regions.pop(key, None)
+
+    def show(self, x, show_surrounds=True):
+        pass
+
+    def show_at_center(self, x):
+        pass
+
+    def show_popup(self, content, flags=0, location=-1, max_width=320,
+                   max_height=240, on_navigate=None, on_hide=None):
+        self.popups.append(content)
+
+    def hide_popup(self):
+        pass
+
+    def is_popup_visible(self):
+        return bool(self.popups)
+
+    def run_command(self, cmd, args=None):
+        if cmd == "append":
+            self.insert(None, self.size(), args["characters"])
+            return
+        import sublime_plugin
+        sublime_plugin.run_text_command(self, cmd, args)
+
+
+def _is_word_char(char):
+    return bool(char) and (char.isalnum() or char == "_")
+
+
+class Window(object):
+    def __init__(self, folders=()):
+        self._id = next(_ids)
+        self._folders = list(folders)
+        self._panels = {}
+        self._active_panel = None
+        self.views = []
+        self.status_messages = []
+        # Items of every quick panel shown, and the index chosen in them
+        self.quick_panels = []
+        self.quick_panel_choice = -1
+        # Text entered in every input panel shown, unless None (canceled)
+        self.input_panel_text = None
+        _windows.append(self)
+
+    def id(self):
+        return self._id
+
+    def is_valid(self):
+        return self in _windows
+
+    def close(self):
+        _windows.remove(self)
+
+    def folders(self):
+        return list(self._folders)
+
+    def set_folders(self, folders):
+        self._folders = list(folders)
+
+    def project_data(self):
+        return {"folders": [{"path": folder} for folder in self._folders]}
+
+    def project_file_name(self):
+        return None
+
+    def extract_variables(self):
+        return {}
+
+    def active_view(self):
+        return self.views[0] if self.views else None
+
+    def focus_view(self, view):
+        if view in self.views:
+            self.views.remove(view)
+            self.views.insert(0, view)
+
+    def status_message(self, message):
+        self.status_messages.append(message)
+
+    def create_output_panel(self, name, unlisted=False):
+        self._panels[name] = View(self)
+        return self._panels[name]
+
+    def find_output_panel(self, name):
+        return self._panels.get(name)
+
+    def active_panel(self):
+        return self._active_panel
+
+    def new_file(self):
+        view = View(self)
+        self.views.insert(0, view)
+        return view
+
+    def find_open_file(self, file_name):
+        for view in self.views:
+            if view.file_name() == file_name:
+                return view
+        return None
+
+    def open_file(self, file_name, flags=0, group=-1):
+        if flags & ENCODED_POSITION:
+            file_name = file_name.split(":")[0]
+        view = self.find_open_file(file_name)
+        if view is None:
+            try:
+                with open(file_name) as opened_file:
+                    text = opened_file.read()
+            except (IOError, OSError):
+                text = ""
+            view = View(self, file_name, text)
+        self.views.insert(0, view) if view not in self.views else None
+        return view
+
+    def show_quick_panel(self, items, on_select, flags=0,
+                         selected_index=-1, on_highlight=None):
+        self.quick_panels.append(items)
+        on_select(self.quick_panel_choice if items else -1)
+
+    def show_input_panel(self, caption, initial_text, on_done, on_change,
+                         on_cancel):
+        if self.input_panel_text is not None:
+            on_done(self.input_panel_text)
+        return View(self)
+
+    def run_command(self, cmd, args=None):
+        args = args or {}
+        if cmd == "show_panel":
+            self._active_panel = args.get("panel")
+        elif cmd == "hide_panel":
+            self._active_panel = None
+        else:
+            import sublime_plugin
+            sublime_plugin.run_window_command(self, cmd, args)
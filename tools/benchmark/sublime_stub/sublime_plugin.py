@@ -0,0 +1,78 @@
+"""
+A headless stand-in for Sublime Text's `sublime_plugin` module.
+
+Commands are registered by subclassing, and can be run by name through
+`View.run_command()` and `Window.run_command()` of the `sublime` stub.
+"""
+
+import re
+
+
+_text_commands = {}
+_window_commands = {}
+
+
+def _command_name(cls):
+    """ Convert a class name such as "FollowLocationCommand" to the name the
+        command is run by ("follow_location"), as Sublime Text does.
+    """
+    name = cls.__name__
+    if name.endswith("Command"):
+        name = name[:-len("Command")]
+    return re.sub(r'(?<=[a-z0-9])([A-Z])', r'_\1', name).lower()
+
+
+class Command(object):
+    def name(self):
+        return _command_name(self.__class__)
+
+    def is_enabled(self, *args, **kwargs):
+        return True
+
+    def is_visible(self, *args, **kwargs):
+        return True
+
+
+class TextCommand(Command):
+    def __init__(self, view):
+        self.view = view
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _text_commands[_command_name(cls)] = cls
+
+
+class WindowCommand(Command):
+    def __init__(self, window):
+        self.window = window
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _window_commands[_command_name(cls)] = cls
+
+
+class ApplicationCommand(Command):
+    pass
+
+
+class EventListener(object):
+    pass
+
+
+class ViewEventListener(object):
+    def __init__(self, view):
+        self.view = view
+
+
+def run_text_command(view, name, args=None):
+    command_class = _text_commands.get(name)
+    if command_class is None:
+        return
+    command_class(view).run(None, **(args or {}))
+
+
+def run_window_command(window, name, args=None):
+    command_class = _window_commands.get(name)
+    if command_class is None:
+        return
+    command_class(window).run(**(args or {}))